@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+import sys, json
+import argparse
+
+
+# required arguments:
+#   layouting file (a JSON file, see sample_layout.json)
+#   GGB files, directories (searched recursively) or globs
+#
+# optional flags:
+# -j, --jobs: number of worker processes (default: number of CPUs)
+# --cache: Reuse the output of previous runs (kept in the given directory)
+#                 for GGB files that have not changed
+# --cache_size: Maximum size of the cache in MB (default: 512)
+# --stream: Layout geogebra.xml element by element while reading it,
+#                 without holding the whole document (for huge constructions)
+# --fast: Apply the layout straight to the parsed XML, without building
+#                 GGB objects (same document, without the default values)
+# --splice: Write geogebra.xml as a copy of the input in which only what
+#                 the layout changes is written anew (same document, in the
+#                 formatting of the input, without the default values)
+# --profile: Record time and memory per phase and layout rule for each
+#                 file; the aggregated JSON report is written to the
+#                 given file (or printed)
+# --pipeline: Read and write the archives in threads, overlapping with the
+#                 layouting in the worker processes (for slow storage), and
+#                 report the time spent on I/O vs. computing
+# --read_ahead: Number of archives read ahead of the workers (default: 2 per worker)
+# --write_queue: Number of layouted archives waiting to be written (default: 2 per worker)
+# --io_threads: Number of threads reading and writing archives (default: 4)
+# --watch: Keep running, and layout the files again when they or the
+#                 layout file change (see lib/watch.py)
+# --debounce: Seconds without further changes before a change is handled
+#                 in watch mode (default: 0.2)
+
+#sysarg parsing
+try:
+	parser = argparse.ArgumentParser()
+	parser.add_argument(
+	    "layout_file", help="path to layout file (JSON)"
+	)
+	parser.add_argument(
+	    "paths", nargs='+', help="GGB files, directories or globs"
+	)
+	parser.add_argument("-j", "--jobs", type=int)
+	parser.add_argument("--cache", help="directory of the output cache")
+	parser.add_argument("--cache_size", type=int, help="maximum size of the output cache in MB")
+	parser.add_argument("--stream", action="store_true")
+	parser.add_argument("--fast", action="store_true")
+	parser.add_argument("--splice", action="store_true")
+	parser.add_argument("--profile", nargs='?', const='-', help="file for the aggregated JSON profiling report (default: stdout)")
+	parser.add_argument("--pipeline", action="store_true")
+	parser.add_argument("--read_ahead", type=int)
+	parser.add_argument("--write_queue", type=int)
+	parser.add_argument("--io_threads", type=int, default=4)
+	parser.add_argument("--watch", action="store_true")
+	parser.add_argument("--debounce", type=float, default=0.2)
+	args = parser.parse_args()
+	if args.watch and (args.stream or args.fast or args.pipeline or args.cache or args.profile):
+		parser.error('--watch keeps the GGB objects in memory and cannot be combined with --stream, --fast, --pipeline, --cache or --profile')
+	if args.splice and (args.stream or args.fast):
+		parser.error('--splice keeps the formatting of the input and cannot be combined with --stream or --fast')
+
+except argparse.ArgumentError as err:
+	print(str(err))
+	sys.exit(2)
+
+# imported once the arguments are parsed (see layouting.py)
+if args.watch:
+	from lib.watch import Watcher, watch_summary
+	watcher = Watcher(args.layout_file, args.paths, splice=args.splice, debounce=args.debounce, on_update=lambda summary: print(watch_summary(summary), flush=True))
+	print('watching {} and {} (Ctrl-C to stop)'.format(args.layout_file, ', '.join(args.paths)))
+	try:
+		watcher.run()
+	except KeyboardInterrupt:
+		pass
+	sys.exit(0)
+
+from lib.batch import layout_batch
+from lib.pipeline import layout_batch_async, pipeline_summary
+from lib.profiling import aggregate_reports
+
+n_files = 0
+failed = []
+cache_stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+profile_reports = []
+
+def report_result(result):
+	global n_files
+	n_files += 1
+	for key, value in result.get('cache', {}).items():
+		cache_stats[key] += value
+	if 'profile' in result:
+		profile_reports.append(result['profile'])
+	if result['ok']:
+		print('layouted {} -> {} ({:.2f} s)'.format(result['file'], result['output'], result['seconds']))
+	else:
+		print('FAILED   {}: {}'.format(result['file'], result['error']))
+		failed.append(result['file'])
+
+options = dict(
+	max_workers=args.jobs,
+	cache_dir=args.cache,
+	cache_size=args.cache_size and args.cache_size * 1024 * 1024,
+	profile=args.profile is not None,
+	stream=args.stream,
+	fast=args.fast,
+	splice=args.splice
+)
+if args.pipeline:
+	pipeline_report = layout_batch_async(
+		args.layout_file,
+		args.paths,
+		report_result,
+		read_ahead=args.read_ahead,
+		write_queue_size=args.write_queue,
+		io_threads=args.io_threads,
+		**options
+	)
+else:
+	for result in layout_batch(args.layout_file, args.paths, **options):
+		report_result(result)
+
+print('{} files, {} layouted, {} failed'.format(n_files, n_files - len(failed), len(failed)))
+if args.pipeline:
+	print(pipeline_summary(pipeline_report))
+if args.cache:
+	print('cache: {hits} hits, {misses} misses, {bytes_saved} bytes saved'.format(**cache_stats))
+if args.profile:
+	report = json.dumps(aggregate_reports(profile_reports), indent=4)
+	if args.profile == '-':
+		print(report)
+	else:
+		with open(args.profile, 'w') as f:
+			f.write(report)
+if len(failed) > 0:
+	sys.exit(1)
@@ -0,0 +1,83 @@
+# Micro-benchmark for named child access (el.caption, el.lineStyle, ...)
+# on a construction with 10k elements: lookups through the per-node
+# child_index vs. the linear isinstance scan over all children that
+# was used before. Also named child assignment (el.caption = ...) on a
+# node with many children, finding the position of the child through
+# child_positions vs. scanning the children.
+#
+# Run inside the repo:
+#   python -m benchmarks.child_index [number of elements]
+
+from lib.curated_ggb_classes import *
+from lib import XMLObject
+import sys, time
+
+
+def linear_lookup(node, name):
+	child_class = node.child_classes[name]
+	children_of_that_class = [c for c in node.children if isinstance(c, child_class)]
+	if len(children_of_that_class) == 1:
+		return children_of_that_class[0]
+	return None
+
+def indexed_lookup(node, name):
+	return getattr(node, name)
+
+def linear_assignment(node, name, value):
+	old_child = getattr(node, name)
+	node[XMLObject.position_of(old_child, node.children)] = value
+
+def indexed_assignment(node, name, value):
+	setattr(node, name, value)
+
+def time_assignments(assign, node, values):
+	start = time.perf_counter()
+	for value in values:
+		assign(node, 'caption', value)
+	return time.perf_counter() - start
+
+def time_lookups(lookup, elements, names, repeat=3):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for el in elements:
+			for name in names:
+				lookup(el, name)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+if __name__ == '__main__':
+	n_elements = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	construction = Construction()
+	for i in range(n_elements):
+		construction.add_child(Point(label='A%i' % i))
+	elements = construction.children
+	names = ['caption', 'lineStyle', 'coords', 'show']
+
+	for el in elements[:100]:
+		for name in names:
+			assert indexed_lookup(el, name) is linear_lookup(el, name)
+
+	linear = time_lookups(linear_lookup, elements, names)
+	indexed = time_lookups(indexed_lookup, elements, names)
+	n_lookups = len(elements) * len(names)
+	print('{} elements, {} children each, {} named lookups'.format(n_elements, len(elements[0]), n_lookups))
+	print('linear scan:   {:8.3f} s ({:6.2f} us/lookup)'.format(linear, 1e6 * linear / n_lookups))
+	print('child_index:   {:8.3f} s ({:6.2f} us/lookup)'.format(indexed, 1e6 * indexed / n_lookups))
+	print('speedup:       {:8.1f}x'.format(linear / indexed))
+
+	# the caption after n_elements other children
+	point = Point(label='B')
+	caption = point.caption
+	del point[XMLObject.position_of(caption, point.children)]
+	for i in range(n_elements):
+		point.add_child(XMLObject(tag='extra'))
+	point.add_child(caption)
+	values = [type(caption)(val='caption %i' % i) for i in range(1000)]
+	linear = time_assignments(linear_assignment, point, values)
+	indexed = time_assignments(indexed_assignment, point, values)
+	assert point.caption is values[-1] and point.children[-1] is values[-1]
+	print('{} assignments of a named child after {} children'.format(len(values), n_elements))
+	print('linear scan:     {:8.3f} s ({:6.2f} us/assignment)'.format(linear, 1e6 * linear / len(values)))
+	print('child_positions: {:8.3f} s ({:6.2f} us/assignment)'.format(indexed, 1e6 * indexed / len(values)))
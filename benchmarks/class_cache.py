@@ -0,0 +1,70 @@
+# Benchmark for the persistent class cache (class_cache.py): getting the
+# extracted classes of a GGB file by extracting them and exec'ing the
+# generated code line by line (as before) vs. loading them from the cache,
+# for a file seen before and for another file with the same schema.
+# Checks that a file with the same schema but other values (coordinates,
+# captions) reuses the module of the first one: one miss, then one hit.
+#
+# Run inside the repo:
+#   python -m benchmarks.class_cache [GGB file] [--points 1000]
+
+from benchmarks.corpus import write_ggb
+from lib.class_cache import ClassCache
+from lib.ggb_class_extractor import extract_classes_from_ggb_file
+import argparse, os, shutil, sys, tempfile, time
+
+
+def exec_classes(input_name):
+	namespace = {}
+	exec('from lib.ggb_base_object import create_ggb_class', namespace)
+	for line in extract_classes_from_ggb_file(input_name):
+		exec(line, namespace)
+	return namespace
+
+def cached_classes(cache_dir, input_name):
+	# a fresh process would import the module again (from its bytecode)
+	for name in [name for name in sys.modules if name.startswith('ggb_classes_')]:
+		del sys.modules[name]
+	return ClassCache(cache_dir).load(input_name)
+
+def best_time(function, repeat=5):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('ggb_file', nargs='?')
+	parser.add_argument('--points', type=int, default=1000)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as work_dir:
+		ggb_file = args.ggb_file or write_ggb(os.path.join(work_dir, 'bench.ggb'), points=args.points, segments=args.points, views=2, caption_complexity=3)
+		input_name = os.path.join(work_dir, 'input')
+		shutil.copyfile(ggb_file, input_name + '.ggb')
+		cache_dir = os.path.join(work_dir, 'classes')
+		# the same schema with other values (one more point, other captions)
+		other_name = os.path.join(work_dir, 'other')
+		write_ggb(other_name + '.ggb', points=args.points + 1, segments=args.points, views=2, caption_complexity=2)
+
+		check_cache = ClassCache(os.path.join(work_dir, 'check'))
+		module = check_cache.load(input_name)
+		assert check_cache.load(other_name) is module, 'same schema, other module'
+		assert check_cache.stats() == {'hits': 1, 'misses': 1}, 'same schema not reused: {}'.format(check_cache.stats())
+
+		extracted = best_time(lambda: exec_classes(input_name))
+		start = time.perf_counter()
+		cached_classes(cache_dir, input_name)
+		first = time.perf_counter() - start
+		same_file = best_time(lambda: cached_classes(cache_dir, input_name))
+		# same schema, new file: drop the remembered schema fingerprints
+		same_schema = best_time(lambda: (shutil.rmtree(os.path.join(cache_dir, 'schemas')), cached_classes(cache_dir, other_name)))
+
+		print('extract and exec:         {:8.4f} s'.format(extracted))
+		print('cache, first run:         {:8.4f} s'.format(first))
+		print('cache, same schema:       {:8.4f} s ({:.1f}x)'.format(same_schema, extracted / same_schema))
+		print('cache, same file:         {:8.4f} s ({:.1f}x)'.format(same_file, extracted / same_file))
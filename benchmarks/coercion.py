@@ -0,0 +1,100 @@
+# Benchmark for reading attribute values: the typed parsers from the
+# class attrs (XMLObject.attr_parsers) vs. the former parse_string, which
+# tried float() on every value and caught the exception for non-numbers.
+# Times the conversion of all attribute values of a document and the
+# whole GeoGebra(node=root), and counts the values the former conversion
+# did not round-trip.
+#
+# Run inside the repo:
+#   python -m benchmarks.coercion [GGB file]
+
+from benchmarks.corpus import generate_geogebra
+from lib.ggb_archive import read_ggb_xml
+from lib.styling_logic import *
+import xml.etree.cElementTree as ET
+import sys, time
+
+
+def legacy_parse_string(s):
+	try:
+		x = float(s)
+		if int(x) == x:
+			return int(x)
+		else:
+			return x
+	except:
+		if s == 'true' or s == 'True':
+			return True
+		elif s == 'false' or s == 'False':
+			return False
+		elif type(s) == str:
+			return s.strip()
+		else:
+			return s
+
+def legacy_load_dict(self, xml_attrs, **kwargs):
+	xml_attrs = xml_attrs or {}
+	self.xml_attrs.update({key: legacy_parse_string(str(value)) for key, value in xml_attrs.items()})
+	self.xml_attrs.update(kwargs)
+
+def value_repr(value):
+	if type(value) == str:
+		return value
+	elif type(value) == bool:
+		return str(value).lower()
+	else:
+		return repr(value)
+
+# (parsers of the tag's class, attribute name, value) for all attributes
+def attributes_of(root):
+	attributes = []
+	for node in root.iter():
+		ggb_class = element_classes.get(node.attrib.get('type')) or ggb_classes.get(node.tag, GGBObject)
+		for (key, value) in node.attrib.items():
+			attributes.append((ggb_class.attr_parsers, key, value))
+	return attributes
+
+def typed_conversion(attributes):
+	for (parsers, key, value) in attributes:
+		if key in parsers:
+			parsers[key](value)
+
+def legacy_conversion(attributes):
+	for (parsers, key, value) in attributes:
+		legacy_parse_string(value)
+
+def best_time(function, repeat=5):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+if __name__ == '__main__':
+	if len(sys.argv) > 1:
+		root = ET.fromstring(read_ggb_xml(sys.argv[1]))
+	else:
+		root = ET.fromstring(generate_geogebra(points=1000, segments=1000, numerics=200).xml_repr())
+	attributes = attributes_of(root)
+
+	lossy = sum(1 for (parsers, key, value) in attributes if value_repr(legacy_parse_string(value)) != value)
+	for (parsers, key, value) in attributes:
+		assert value_repr(parsers[key](value) if key in parsers else value) == value
+
+	typed = best_time(lambda: typed_conversion(attributes))
+	legacy = best_time(lambda: legacy_conversion(attributes))
+	typed_objectify = best_time(lambda: GeoGebra(node=root))
+	load_dict = XMLObject.load_dict
+	XMLObject.load_dict = legacy_load_dict
+	legacy_objectify = best_time(lambda: GeoGebra(node=root))
+	XMLObject.load_dict = load_dict
+
+	print('{} attribute values, {} changed by the former conversion'.format(len(attributes), lossy))
+	print('conversion, former:  {:8.3f} s ({:6.2f} us/value)'.format(legacy, 1e6 * legacy / len(attributes)))
+	print('conversion, typed:   {:8.3f} s ({:6.2f} us/value)'.format(typed, 1e6 * typed / len(attributes)))
+	print('speedup:             {:8.1f}x'.format(legacy / typed))
+	print('objectify, former:   {:8.3f} s'.format(legacy_objectify))
+	print('objectify, typed:    {:8.3f} s'.format(typed_objectify))
+	print('speedup:             {:8.1f}x'.format(legacy_objectify / typed_objectify))
@@ -0,0 +1,121 @@
+# Synthetic GGB corpus: valid GeoGebra archives built from the curated
+# classes, parameterized by element counts, number of graphics views and
+# caption complexity.
+#
+# Run inside the repo to write a single applet:
+#   python -m benchmarks.corpus <output GGB file> [--points 1000 ...]
+
+from lib.styling_logic import *
+from zipfile import ZipFile, ZIP_DEFLATED
+import argparse
+
+
+default_counts = {
+	'points': 100,
+	'segments': 100,
+	'numerics': 20,
+	'lists': 10,
+	'text_fields': 10
+}
+
+# caption_complexity 0: no caption, 1: plain text,
+# 2 and higher: TeX with that many nested commands and characters
+# that need escaping in XML
+def caption_text(label, caption_complexity):
+	if caption_complexity <= 1:
+		return 'Label ' + label
+	text = label + ' < "' + label + "' > "
+	for i in range(caption_complexity - 1):
+		text = r'\boldsymbol{%s}' % text
+	return '$%s$' % text
+
+def set_caption(el, label, caption_complexity):
+	if caption_complexity == 0:
+		return
+	caption = Caption(val=caption_text(label, caption_complexity))
+	if 'caption' in el.child_classes:
+		el.caption = caption
+	else:
+		el.add_child(caption)
+
+def euclidian_view(view_number):
+	ev = EuclidianView()
+	ev.viewNumber.viewNo = view_number
+	for axis_id in [0, 1]:
+		ev.add_child(Axis(id=axis_id))
+	return ev
+
+def generate_geogebra(
+	points=default_counts['points'],
+	segments=default_counts['segments'],
+	numerics=default_counts['numerics'],
+	lists=default_counts['lists'],
+	text_fields=default_counts['text_fields'],
+	views=1,
+	caption_complexity=1
+):
+	ggb_root = GeoGebra()
+	for view_number in range(1, views + 1):
+		ggb_root.add_child(euclidian_view(view_number))
+	construction = ggb_root.construction
+
+	point_labels = []
+	for i in range(max(points, 2 if segments > 0 else 0)):
+		label = 'P_{%i}' % i
+		point = Point(label=label, type='point')
+		point.coords.x = i % 100
+		point.coords.y = i // 100
+		point.coords.z = 1
+		set_caption(point, label, caption_complexity)
+		construction.add_child(point)
+		point_labels.append(label)
+
+	for i in range(segments):
+		label = 's_{%i}' % i
+		start = point_labels[i % len(point_labels)]
+		end = point_labels[(i + 1) % len(point_labels)]
+		command = Command(name='Segment')
+		command.input.a0 = start
+		command.input.xml_attrs['a1'] = end
+		command.output.a0 = label
+		construction.add_child(command)
+		segment = Segment(label=label, type='segment')
+		segment.lineStyle.thickness = 5
+		segment.lineStyle.type = 0
+		segment.lineStyle.typeHidden = 1
+		set_caption(segment, label, caption_complexity)
+		construction.add_child(segment)
+
+	for i in range(numerics):
+		numeric = Numeric(label='n_{%i}' % i, type='numeric')
+		numeric.value.val = i
+		construction.add_child(numeric)
+
+	for i in range(lists):
+		construction.add_child(List(label='l_{%i}' % i, type='list'))
+
+	for i in range(text_fields):
+		construction.add_child(TextField(label='t_{%i}' % i, type='textfield'))
+
+	return ggb_root
+
+def write_ggb(ggb_file, **params):
+	ggb_root = generate_geogebra(**params)
+	with ZipFile(ggb_file, 'w', ZIP_DEFLATED) as archive:
+		archive.writestr('geogebra.xml', ggb_root.xml_repr().encode('utf-8'))
+		archive.writestr('geogebra_javascript.js', 'function ggbOnInit() {}')
+	return ggb_file
+
+def add_params(parser):
+	for name, count in default_counts.items():
+		parser.add_argument('--' + name, type=int, default=count)
+	parser.add_argument('--views', type=int, default=1)
+	parser.add_argument('--caption_complexity', type=int, default=1)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('ggb_file')
+	add_params(parser)
+	args = vars(parser.parse_args())
+	write_ggb(args.pop('ggb_file'), **args)
@@ -0,0 +1,102 @@
+# Stress benchmark for deep documents: an applet with a subtree nested
+# --depth levels deep (10k by default) in its construction, layouted by
+# each engine (tree, stream, fast) and read by the class extractor, a
+# caption with --tex_depth nested TeX commands, and JSON nested --depth
+# levels deep. The tree walks use explicit stacks, so the depth is not
+# limited by the recursion limit of the interpreter (which lib leaves
+# as it is). Checks that every engine writes the whole subtree, and that
+# the tree and stream engines write the same document. (The indented
+# output of the tree and stream engines grows with the square of the
+# depth, which dominates their times.)
+#
+# Run inside the repo:
+#   python -m benchmarks.deep_documents [--depth 10000] [--tex_depth 1000]
+
+from benchmarks.corpus import caption_text, generate_geogebra
+from lib import JSONObject
+from lib.ggb_archive import GGB_XML, layout_ggb_bytes
+from lib.etree_layout import ETreeLayout
+from lib.ggb_class_extractor import extract_schema, generate_class_code
+from lib.styling_logic import GeoGebra, compile_layout
+from zipfile import ZipFile, ZIP_DEFLATED
+import xml.etree.cElementTree as ET
+import argparse, io, os, sys, time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def deep_ggb_bytes(depth):
+	root = ET.fromstring(generate_geogebra(points=2, segments=1).xml_repr())
+	node = root.find('construction')
+	for i in range(depth):
+		node = ET.SubElement(node, 'group', {'level': str(i)})
+	buffer = io.BytesIO()
+	with ZipFile(buffer, 'w', ZIP_DEFLATED) as archive:
+		# (ET.tostring recurses)
+		archive.writestr(GGB_XML, ETreeLayout.xml_bytes(root))
+	return buffer.getvalue()
+
+def nested_lists(depth):
+	nested = innermost = []
+	for i in range(depth - 1):
+		innermost.append([])
+		innermost = innermost[0]
+	return nested
+
+def max_depth(root):
+	deepest = 0
+	stack = [(root, 1)]
+	while len(stack) > 0:
+		node, depth = stack.pop()
+		deepest = max(deepest, depth)
+		stack.extend((child, depth + 1) for child in node)
+	return deepest
+
+def output_xml(ggb_bytes):
+	with ZipFile(io.BytesIO(ggb_bytes), 'r') as archive:
+		return archive.read(GGB_XML)
+
+def timed(function):
+	start = time.perf_counter()
+	result = function()
+	return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--depth', type=int, default=10000)
+	parser.add_argument('--tex_depth', type=int, default=1000)
+	args = parser.parse_args()
+
+	layout = compile_layout(os.path.join(repo_dir, 'sample_layout.json'))
+	ggb_bytes = deep_ggb_bytes(args.depth)
+	print('{} levels deep (recursion limit {})'.format(args.depth, sys.getrecursionlimit()))
+
+	root, parse_time = timed(lambda: ET.fromstring(output_xml(ggb_bytes)))
+	ggb_root, objectify_time = timed(lambda: GeoGebra(node=root))
+	print('parse:                 {:7.3f} s'.format(parse_time))
+	print('objectify and index:   {:7.3f} s ({} elements)'.format(objectify_time, len(ggb_root.elements)))
+	xml, write_time = timed(lambda: ggb_root.xml_repr())
+	print('write_xml:             {:7.3f} s'.format(write_time))
+
+	outputs = {}
+	for engine in ['tree', 'stream', 'fast']:
+		output, seconds = timed(lambda: layout_ggb_bytes(ggb_bytes, layout, stream=(engine == 'stream'), fast=(engine == 'fast')))
+		outputs[engine] = output_xml(output)
+		assert max_depth(ET.fromstring(outputs[engine])) >= args.depth + 2, '{} engine lost levels'.format(engine)
+		print('layout, {:14} {:7.3f} s'.format(engine + ' engine:', seconds))
+	assert outputs['tree'] == outputs['stream'], 'tree and stream engines differ'
+
+	code, seconds = timed(lambda: generate_class_code(extract_schema(root)))
+	print('class extractor:       {:7.3f} s ({} classes)'.format(seconds, len(code)))
+
+	caption = caption_text('A', args.tex_depth + 1)
+	stripped, seconds = timed(lambda: GeoGebra.strip_tex(caption))
+	assert 'boldsymbol' not in stripped, 'TeX commands left'
+	print('strip_tex, {:>6} deep: {:7.3f} s'.format(args.tex_depth, seconds))
+
+	json_object, seconds = timed(lambda: JSONObject(attr_dict={'nested': nested_lists(args.depth)}))
+	print('JSON objects:          {:7.3f} s'.format(seconds))
+	# (the indentation alone grows with the square of the depth)
+	json_repr, seconds = timed(lambda: repr(JSONObject(attr_dict={'nested': nested_lists(min(args.depth, 1000))})))
+	print('JSON repr, {:>6} deep: {:7.3f} s'.format(min(args.depth, 1000), seconds))
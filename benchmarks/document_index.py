@@ -0,0 +1,123 @@
+# Consistency check and micro-benchmark for the document index
+# (document_index.py): after adding, replacing and removing nodes in all
+# the ways XMLObject allows (also with one node in several views), the
+# index must equal one built from scratch.
+# Then lookups of elements by label and type, of the graphics views and
+# of the axes of a view are timed against scans of the tree.
+#
+# Run inside the repo:
+#   python -m benchmarks.document_index [--points 10000]
+
+from benchmarks.corpus import generate_geogebra, euclidian_view
+from lib.document_index import DocumentIndex
+from lib.styling_logic import *
+import argparse, time
+
+
+def snapshot(index):
+	return (
+		{tag: list(nodes) for (tag, nodes) in index.tags.items()},
+		{node: index.parents_of(node) for node in index.parents},
+		list(index.element_nodes),
+		{element_type: list(nodes) for (element_type, nodes) in index.types.items()},
+		dict(index.labels),
+		{view: dict(axes) for (view, axes) in index.view_axes.items()}
+	)
+
+# compare as sets: nodes added later come last in the incremental index
+def same_index(index, fresh_index):
+	def unordered(value):
+		if isinstance(value, tuple):
+			return tuple(unordered(v) for v in value)
+		if isinstance(value, dict):
+			return {key: unordered(v) for (key, v) in value.items()}
+		if isinstance(value, list):
+			return set(value)
+		return value
+	return unordered(snapshot(index)) == unordered(snapshot(fresh_index))
+
+def check_consistency(ggb_root):
+	construction = ggb_root.construction
+	point = Point(label='Q', type='point')
+	construction.add_child(point)
+	assert ggb_root.element('Q') is point
+	construction[construction.children.index(point)] = Point(label='R', type='point')
+	assert ggb_root.element('Q') is None and ggb_root.element('R') is not None
+	del construction[-1]
+	assert ggb_root.element('R') is None
+	construction[0:2] = [Numeric(label='m', type='numeric')]
+	del construction[-3:]
+	construction.children = construction.children[::2]
+	view = euclidian_view(3)
+	ggb_root.add_child(view)
+	assert view in ggb_root.euclidianViews and view.y_axis.id == 1
+	view.x_axis.id = 1 # not tracked
+	ggb_root.reindex()
+	# one node in several views stays indexed until it is removed from all
+	views = ggb_root.euclidianViews
+	color = BGColor(1, 2, 3)
+	for view in views:
+		view.add_child(color)
+	del views[0][views[0].position_of_child(color)]
+	assert color in ggb_root.index.nodes('bgColor') and ggb_root.index.parent(color) in views[1:]
+	assert same_index(ggb_root.index, DocumentIndex(ggb_root)), 'index out of date (node in several views)'
+	for view in views[1:]:
+		del view[view.position_of_child(color)]
+	assert color not in ggb_root.index.nodes('bgColor') and color.owner_document() is None
+	# nodes of another document are refused
+	other_root = GeoGebra()
+	try:
+		ggb_root.add_child(other_root.euclidianView3D)
+		assert False, 'node of another document added'
+	except ValueError:
+		assert other_root.euclidianView3D not in ggb_root.children
+	ggb_root.construction = Construction()
+	assert point.owner_document() is None
+	assert same_index(ggb_root.index, DocumentIndex(ggb_root)), 'index out of date'
+
+def best_time(function, repeat=3):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--points', type=int, default=10000)
+	args = parser.parse_args()
+
+	check_consistency(generate_geogebra(points=100, segments=100, views=2))
+
+	ggb_root = generate_geogebra(points=args.points, segments=args.points, views=2)
+	labels = [el.label for el in ggb_root.elements[::100]]
+	views = ggb_root.euclidianViews
+
+	def scan_labels():
+		for label in labels:
+			next(el for el in ggb_root.construction if el.tag == 'element' and el.label == label)
+	def index_labels():
+		for label in labels:
+			ggb_root.element(label)
+	def scan_types():
+		[el for el in ggb_root.construction if el.tag == 'element' and el.type == 'numeric']
+	def index_types():
+		ggb_root.elements_of_type('numeric')
+	def scan_axes():
+		for view in [c for c in ggb_root if GeoGebra.is_view(c)]:
+			[c for c in view if isinstance(c, Axis) and c.id == 1]
+	def index_axes():
+		for view in ggb_root.euclidianViews:
+			view.y_axis
+
+	print('{} elements'.format(len(ggb_root.elements)))
+	for (name, scan, indexed) in [
+		('{} labels'.format(len(labels)), scan_labels, index_labels),
+		('elements of a type', scan_types, index_types),
+		('axes of the views', scan_axes, index_axes)
+	]:
+		scan_time = best_time(scan)
+		index_time = best_time(indexed)
+		print('{:20} scan {:9.6f} s, index {:9.6f} s, {:8.1f}x'.format(name, scan_time, index_time, scan_time / index_time))
@@ -0,0 +1,93 @@
+# Benchmark for serializing caption- and script-heavy applets: single-pass
+# escaping of attribute values on the write path vs. the former chain of
+# str.replace calls, which also wrote the escaped values back into the
+# nodes. Checks that the output parses back to the original values and
+# does not change when saved twice.
+#
+# Run inside the repo:
+#   python -m benchmarks.escaping [number of points]
+
+from benchmarks.corpus import generate_geogebra
+from lib.styling_logic import *
+import xml.etree.cElementTree as ET
+import sys, time
+
+
+script = '''function onUpdate() {
+	var label = "P_{1}";
+	if (ggbApplet.getValue(label) < 1 && ggbApplet.getValue('n') > 0) {
+		ggbApplet.setCaption(label, "<b>" + label + "</b>");
+	}
+}'''
+
+def legacy_html_string_repr(string):
+	replacement_dict = {
+		"'" : "&apos;",
+		"\n": "&#xa;",
+		"<": "&lt;",
+		">": "&gt;",
+		'"': "&quot;"
+	}
+	for key, value in replacement_dict.items():
+		string = string.replace(key, value)
+	return string
+
+def legacy_attr_repr_of(xml_attrs):
+	for key, value in xml_attrs.items():
+		if type(value) == str:
+			xml_attrs[key] = legacy_html_string_repr(value)
+	return XMLObject.attr_repr_of(xml_attrs)
+
+def generate(points):
+	ggb_root = generate_geogebra(points=points, segments=points, caption_complexity=6)
+	for el in ggb_root.construction:
+		if isinstance(el, Point):
+			el.javascript.val = script
+	return ggb_root
+
+def all_nodes(node):
+	nodes = [node]
+	for child in node:
+		nodes.extend(all_nodes(child))
+	return nodes
+
+def serialize_attributes(nodes):
+	for node in nodes:
+		node.attr_repr()
+
+def best_time(function, repeat=7):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+if __name__ == '__main__':
+	points = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+	ggb_root = generate(points)
+	xml = ggb_root.xml_repr()
+	assert ggb_root.xml_repr() == xml, 'output changed when saved twice'
+	for node in ET.fromstring(xml).iter('javascript'):
+		assert node.attrib['val'] == script
+	nodes = all_nodes(ggb_root)
+	single_pass_attributes = best_time(lambda: serialize_attributes(nodes))
+	single_pass = best_time(lambda: ggb_root.xml_repr())
+
+	attr_repr_of = GGBObject.attr_repr_of
+	GGBObject.attr_repr_of = staticmethod(legacy_attr_repr_of)
+	legacy_root = generate(points)
+	legacy_nodes = all_nodes(legacy_root)
+	legacy_attributes = best_time(lambda: serialize_attributes(legacy_nodes))
+	legacy = best_time(lambda: legacy_root.xml_repr())
+	GGBObject.attr_repr_of = attr_repr_of
+
+	print('{} points and segments with TeX captions, {} scripts, {} bytes of XML'.format(points, points, len(xml)))
+	print('attributes, replace chain: {:8.3f} s'.format(legacy_attributes))
+	print('attributes, single pass:   {:8.3f} s'.format(single_pass_attributes))
+	print('speedup:                   {:8.1f}x'.format(legacy_attributes / single_pass_attributes))
+	print('document, replace chain:   {:8.3f} s'.format(legacy))
+	print('document, single pass:     {:8.3f} s'.format(single_pass))
+	print('speedup:                   {:8.1f}x'.format(legacy / single_pass))
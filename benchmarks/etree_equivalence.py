@@ -0,0 +1,111 @@
+# Equivalence check of the ElementTree engine (etree_layout.py, --fast)
+# with GeoGebra.apply_layout: both outputs are parsed and compared node by
+# node, as written (no GGB objects, nothing sorted), with the public
+# ElementTree API only (the ElementTree output is serialized with
+# ET.tostring). It has to be the output of apply_layout without the
+# defaults the GGB classes add:
+# - its children are those of the apply_layout output, in the same
+#   order; the apply_layout output may have more (default) children, of
+#   tags that are not among them, or after all of those of the same tag
+#   (the GGB classes add a default lineStyle to a view next to the one
+#   read, which is of another class)
+# - its attributes have the values of the apply_layout output; that may
+#   have more (default) attributes
+# - the texts are the same (up to surrounding whitespace)
+# The apply_layout output without those defaults then has to be the same
+# canonical XML (ET.canonicalize) as the ElementTree output.
+# Checks the given GGB files, synthetic applets, and synthetic applets
+# with some of their attributes and property children removed (as written
+# by GeoGebra, which leaves out many defaults). Exits with status 1 on the
+# first difference.
+#
+# Run inside the repo:
+#   python -m benchmarks.etree_equivalence [GGB files] [--points 200] [--layout sample_layout.json]
+
+from benchmarks.corpus import generate_geogebra
+from benchmarks.etree_layout import object_engine
+from lib.ggb_archive import read_ggb_xml
+from lib.etree_layout import ETreeLayout
+from lib.styling_logic import compile_layout
+import xml.etree.cElementTree as ET
+from collections import Counter
+import argparse, random, sys
+
+
+# The first difference of fast (the ElementTree output) from objects (the
+# apply_layout output) without defaults, as (path, None), or else
+# (None, objects without the defaults)
+def difference(fast, objects):
+	without_defaults = ET.Element(objects.tag)
+	stack = [(fast, objects, objects.tag, without_defaults)]
+	while len(stack) > 0:
+		fast, objects, path, node = stack.pop()
+		if fast.tag != objects.tag:
+			return ('{}: <{}> vs. <{}>'.format(path, fast.tag, objects.tag), None)
+		for (key, value) in fast.items():
+			if objects.get(key) != value:
+				return ('{}: {}="{}" vs. {}'.format(path, key, value, objects.get(key)), None)
+		if (fast.text or '').strip() != (objects.text or '').strip():
+			return ('{}: text {!r} vs. {!r}'.format(path, fast.text, objects.text), None)
+		node.attrib = {key: objects.get(key) for key in fast.keys()}
+		node.text = objects.text
+		# tag -> the children of that tag not matched yet
+		unmatched = Counter(child.tag for child in fast)
+		object_children = iter(objects)
+		for (i, child) in enumerate(fast):
+			child_path = '{}/{}[{}]'.format(path, child.tag, i)
+			for object_child in object_children:
+				if object_child.tag == child.tag:
+					stack.append((child, object_child, child_path, ET.SubElement(node, child.tag)))
+					unmatched[child.tag] -= 1
+					break
+				if unmatched[object_child.tag] > 0:
+					return ('{}: <{}> out of order'.format(child_path, object_child.tag), None)
+			else:
+				return ('{}: missing from the apply_layout output'.format(child_path), None)
+	return (None, without_defaults)
+
+def canonical_xml(root):
+	return ET.canonicalize(ET.tostring(root, encoding='unicode'), strip_text=True)
+
+# xml with property children and attributes left out at random
+def sparse_xml(xml, seed):
+	rng = random.Random(seed)
+	root = ET.fromstring(xml)
+	for node in root.iter():
+		if node.tag in ['geogebra', 'construction', 'command', 'input', 'output']:
+			continue
+		for key in list(node.keys()):
+			if key not in ['label', 'type', 'id'] and rng.random() < 0.3:
+				del node.attrib[key]
+		for child in list(node):
+			if child.tag not in ['element', 'command', 'construction', 'euclidianView', 'euclidianView3D', 'axis'] and rng.random() < 0.3:
+				node.remove(child)
+	return ET.tostring(root, encoding='utf-8')
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('ggb_files', nargs='*')
+	parser.add_argument('--points', type=int, default=200)
+	parser.add_argument('--layout', default='sample_layout.json')
+	args = parser.parse_args()
+
+	layout = compile_layout(args.layout)
+	documents = [(ggb_file, read_ggb_xml(ggb_file)) for ggb_file in args.ggb_files]
+	for views in [1, 2]:
+		xml = generate_geogebra(points=args.points, segments=args.points, views=views, caption_complexity=3).xml_repr().encode('utf-8')
+		documents.append(('synthetic, {} views'.format(views), xml))
+		for seed in range(3):
+			documents.append(('sparse synthetic, {} views, seed {}'.format(views, seed), sparse_xml(xml, seed)))
+
+	for (name, xml) in documents:
+		fast = ET.fromstring(ET.tostring(ETreeLayout(layout).apply(ET.fromstring(xml)), encoding='utf-8'))
+		found, without_defaults = difference(fast, ET.fromstring(object_engine(xml, layout)))
+		if found is not None:
+			print('{}: outputs differ at {}'.format(name, found))
+			sys.exit(1)
+		if canonical_xml(fast) != canonical_xml(without_defaults):
+			print('{}: outputs differ as canonical XML'.format(name))
+			sys.exit(1)
+		print('{}: same document'.format(name))
@@ -0,0 +1,64 @@
+# Benchmark for the object-free layout engine (etree_layout.py) vs.
+# GeoGebra.apply_layout (benchmarks/etree_equivalence.py checks that the
+# outputs are the same). As a quick check, the output of the ElementTree
+# engine read into a GeoGebra tree (which adds the defaults) has to be
+# the same document as that of the object engine, with attributes and
+# the property children of a node in sorted order (the order of the
+# construction is kept).
+#
+# Run inside the repo:
+#   python -m benchmarks.etree_layout [GGB files] [--points 1000] [--layout sample_layout.json]
+
+from benchmarks.corpus import generate_geogebra
+from lib.ggb_archive import read_ggb_xml
+from lib.styling_logic import GeoGebra, compile_layout
+from lib.etree_layout import ETreeLayout
+import xml.etree.cElementTree as ET
+import argparse, time
+
+
+def object_engine(xml, layout):
+	ggb_root = GeoGebra(node=ET.fromstring(xml))
+	ggb_root.apply_layout(layout=layout)
+	return ggb_root.xml_repr().encode('utf-8')
+
+def etree_engine(xml, layout):
+	return ETreeLayout.xml_bytes(ETreeLayout(layout).apply(ET.fromstring(xml)))
+
+def canonical(node):
+	children = [canonical(child) for child in node]
+	if node.tag != 'construction':
+		children.sort()
+	return (node.tag, sorted(node.attrib.items()), (node.text or '').strip(), children)
+
+def with_defaults(xml):
+	return GeoGebra(node=ET.fromstring(xml)).xml_repr().encode('utf-8')
+
+def best_time(function, repeat=3):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('ggb_files', nargs='*')
+	parser.add_argument('--points', type=int, default=1000)
+	parser.add_argument('--layout', default='sample_layout.json')
+	args = parser.parse_args()
+
+	layout = compile_layout(args.layout)
+	documents = [(ggb_file, read_ggb_xml(ggb_file)) for ggb_file in args.ggb_files]
+	for views in [1, 2]:
+		ggb_root = generate_geogebra(points=args.points, segments=args.points, views=views, caption_complexity=3)
+		documents.append(('synthetic, {} points, {} views'.format(args.points, views), ggb_root.xml_repr().encode('utf-8')))
+
+	for (name, xml) in documents:
+		assert canonical(ET.fromstring(object_engine(xml, layout))) == canonical(ET.fromstring(with_defaults(etree_engine(xml, layout)))), \
+			'{}: outputs differ'.format(name)
+		objects = best_time(lambda: object_engine(xml, layout))
+		etree = best_time(lambda: etree_engine(xml, layout))
+		print('{}: same document; GGB objects {:.3f} s, ElementTree {:.3f} s, {:.1f}x'.format(name, objects, etree, objects / etree))
@@ -0,0 +1,73 @@
+# Benchmark for the import time of the GGB classes, measured with
+# python -X importtime in fresh processes (best of several runs): the
+# import of curated_ggb_classes.py (after the lib package), which builds
+# the curated classes and only declares those generated from ggb.xsd,
+# vs. the same import
+# followed by building all the declared classes, and the imports of
+# `layouting.py --help` vs. those of a layout run.
+#
+# Run inside the repo:
+#   python -m benchmarks.import_time [--runs 10]
+
+import argparse, os, subprocess, sys
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# module -> cumulative import time in us, and the total import time (of
+# the modules imported at top level)
+def import_times(command):
+	result = subprocess.run([sys.executable, '-X', 'importtime'] + command,
+		cwd=repo_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+	times = {}
+	total = 0
+	for line in result.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		self_time, cumulative, name = line[len('import time:'):].split('|')
+		times[name.strip()] = int(cumulative)
+		if not name[1:].startswith(' '):
+			total += int(cumulative)
+	return (times, total)
+
+def best_import_times(command, runs):
+	best_times, best_total = import_times(command)
+	for _ in range(runs - 1):
+		times, total = import_times(command)
+		best_total = min(best_total, total)
+		for (name, cumulative) in times.items():
+			best_times[name] = min(best_times.get(name, cumulative), cumulative)
+	return (best_times, best_total)
+
+build_all_classes = '; '.join([
+	'import lib.curated_ggb_classes as classes',
+	'import time',
+	'start = time.perf_counter()',
+	'n = len(classes.ggb_classes.declarations) + len(classes.element_classes.declarations)',
+	'classes.ggb_classes.build_all()',
+	'classes.element_classes.build_all()',
+	'print(n, round((time.perf_counter() - start) * 1e6))'
+])
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--runs', type=int, default=10)
+	args = parser.parse_args()
+
+	times, total = best_import_times(['-c', 'import lib, lib.curated_ggb_classes'], args.runs)
+	build_times = []
+	for _ in range(args.runs):
+		output = subprocess.run([sys.executable, '-c', build_all_classes],
+			cwd=repo_dir, stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+		n_declared, build_time = map(int, output.split())
+		build_times.append(build_time)
+	curated = times['lib.curated_ggb_classes']
+	print('import lib.curated_ggb_classes:    {:7} us (of which lib.xsd_ggb_classes {} us)'.format(curated, times['lib.xsd_ggb_classes']))
+	print('building the {} declared classes: {:7} us'.format(n_declared, min(build_times)))
+	print('import with all classes built:     {:7} us ({:.1f}x)'.format(curated + min(build_times), (curated + min(build_times)) / curated))
+
+	help_times, help_total = best_import_times(['layouting.py', '--help'], args.runs)
+	run_times, run_total = best_import_times(['-c', 'import lib.ggb_archive, lib.output_cache, lib.profiling'], args.runs)
+	print('imports of layouting.py --help:    {:7} us'.format(help_total))
+	print('imports of a layout run:           {:7} us'.format(run_total))
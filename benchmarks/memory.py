@@ -0,0 +1,43 @@
+# Memory benchmark: retained size of the GeoGebra object tree for a
+# GGB file, compared with the XML text and the ElementTree it is built
+# from. Only uses the public API, so it can be run unchanged on older
+# checkouts to compare node layouts on the same file.
+#
+# Run inside the repo:
+#   python -m benchmarks.memory <GGB file>
+
+import xml.etree.cElementTree as ET
+from zipfile import ZipFile
+import gc, sys, tracemalloc
+
+
+def retained_memory(build):
+	gc.collect()
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	result = build()
+	gc.collect()
+	after, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return result, after - before, peak - before
+
+def count_nodes(node):
+	return 1 + sum(count_nodes(child) for child in node)
+
+
+if __name__ == '__main__':
+	from lib.styling_logic import GeoGebra
+	sys.setrecursionlimit(10000)
+
+	with ZipFile(sys.argv[1], 'r') as archive:
+		xml_bytes = archive.read('geogebra.xml')
+	root, et_size, et_peak = retained_memory(lambda: ET.fromstring(xml_bytes))
+	ggb_root, ggb_size, ggb_peak = retained_memory(lambda: GeoGebra(node=root))
+
+	n_xml_nodes = count_nodes(root)
+	n_ggb_nodes = count_nodes(ggb_root)
+	print('geogebra.xml:    {:12,d} bytes'.format(len(xml_bytes)))
+	print('ElementTree:     {:12,d} bytes ({:6.0f} bytes/node, {} nodes)'.format(et_size, et_size / n_xml_nodes, n_xml_nodes))
+	print('GeoGebra tree:   {:12,d} bytes ({:6.0f} bytes/node, {} nodes)'.format(ggb_size, ggb_size / n_ggb_nodes, n_ggb_nodes))
+	print('  peak while building: {:,d} bytes'.format(ggb_peak))
+	print('  ratio to XML text:   {:.1f}x'.format(ggb_size / len(xml_bytes)))
@@ -0,0 +1,68 @@
+# Benchmark for the pipelined batch runner (pipeline.py) on slow storage:
+# every read and write of an archive is delayed by --latency seconds (as
+# on a network mount). Reading, layouting and writing one file after the
+# other (what a worker of batch.py does) vs. the pipeline, which overlaps
+# the I/O with the layouting. Checks that the pipeline writes the same
+# archives, and prints its report.
+#
+# Run inside the repo:
+#   python -m benchmarks.pipeline [--files 20] [--points 100] [--latency 0.1] [--jobs 1]
+
+from benchmarks.corpus import write_ggb
+from lib.ggb_archive import layout_ggb_bytes, layouted_name
+from lib.styling_logic import compile_layout
+import lib.pipeline as pipeline
+import argparse, os, tempfile, time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def slow(function, latency):
+	def slow_function(*args):
+		time.sleep(latency)
+		return function(*args)
+	return slow_function
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--files', type=int, default=20)
+	parser.add_argument('--points', type=int, default=100)
+	parser.add_argument('--latency', type=float, default=0.1)
+	parser.add_argument('--jobs', type=int, default=1)
+	parser.add_argument('--io_threads', type=int, default=4)
+	args = parser.parse_args()
+
+	read_archive = slow(pipeline.read_archive, args.latency)
+	write_archive = slow(pipeline.write_archive, args.latency)
+	layout_file = os.path.join(repo_dir, 'sample_layout.json')
+	layout = compile_layout(layout_file)
+
+	with tempfile.TemporaryDirectory() as work_dir:
+		ggb_files = [
+			write_ggb(os.path.join(work_dir, 'applet_{}.ggb'.format(i)), points=args.points, segments=args.points, views=2)
+			for i in range(args.files)
+		]
+
+		start = time.perf_counter()
+		expected = {}
+		for ggb_file in ggb_files:
+			expected[ggb_file] = layout_ggb_bytes(read_archive(ggb_file), layout)
+			write_archive(layouted_name(ggb_file), expected[ggb_file])
+		serial_time = time.perf_counter() - start
+		for ggb_file in ggb_files:
+			os.remove(layouted_name(ggb_file))
+
+		pipeline.read_archive = read_archive
+		pipeline.write_archive = write_archive
+		results = []
+		report = pipeline.layout_batch_async(layout_file, [work_dir], results.append, max_workers=args.jobs, io_threads=args.io_threads)
+		assert all(result['ok'] for result in results), 'pipeline failed'
+		for ggb_file in ggb_files:
+			with open(layouted_name(ggb_file), 'rb') as file:
+				assert file.read() == expected[ggb_file], 'pipeline output differs'
+
+	print('{} files of {} points, {} s per read and write'.format(args.files, args.points, args.latency))
+	print('read, layout, write in turn: {:7.3f} s'.format(serial_time))
+	print('pipelined:                   {:7.3f} s ({:.1f}x)'.format(report['wall'], serial_time / report['wall']))
+	print(pipeline.pipeline_summary(report))
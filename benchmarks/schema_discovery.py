@@ -0,0 +1,91 @@
+# Benchmark for schema discovery in the class extractor: the single
+# explicit-stack pass (discover_schema) vs. the former pair of recursive
+# walks, which merged fresh dicts and lists at every level and counted
+# every child tag among its siblings. Checks that both find the same
+# schema (in the same order), on applets of increasing size and on a
+# construction with wide fan-out; a 10k deep document is only handled by
+# the new pass.
+#
+# Run inside the repo:
+#   python -m benchmarks.schema_discovery [--sizes 100 1000 5000]
+
+from benchmarks.corpus import generate_geogebra
+from lib.ggb_class_extractor import discover_schema, extract_schema
+import xml.etree.cElementTree as ET
+import argparse, time
+
+
+def legacy_attr_dict_from_node(node):
+	found_tag_attribs = {node.tag: dict(node.attrib)}
+	for child in node:
+		for tag, attribs in legacy_attr_dict_from_node(child).items():
+			if tag in found_tag_attribs.keys():
+				for (attr, value) in attribs.items():
+					if attr not in found_tag_attribs[tag]:
+						found_tag_attribs[tag][attr] = value
+			else:
+				found_tag_attribs[tag] = attribs
+	return found_tag_attribs
+
+def legacy_child_tags_from_node(node):
+	child_tags = [c.tag for c in node]
+	found_child_tags = {node.tag: [t for t in child_tags if child_tags.count(t) == 1]}
+	for child in node:
+		for tag, child_tags in legacy_child_tags_from_node(child).items():
+			if tag in found_child_tags.keys():
+				for child_tag in child_tags:
+					if child_tag not in found_child_tags[tag]:
+						found_child_tags[tag].append(child_tag)
+			else:
+				found_child_tags[tag] = child_tags
+	return found_child_tags
+
+def legacy_schema(root):
+	tag_attr_dict = legacy_attr_dict_from_node(root)
+	tag_attr_dict.pop('element', None)
+	return (tag_attr_dict, legacy_child_tags_from_node(root))
+
+def ordered(schema):
+	tag_attr_dict, tag_children_dict = schema
+	return ([(tag, list(attribs.items())) for (tag, attribs) in tag_attr_dict.items()], list(tag_children_dict.items()))
+
+def deep_document(depth):
+	root = node = ET.Element('geogebra')
+	for i in range(depth):
+		node = ET.SubElement(node, 'group', {'level': str(i)})
+	return root
+
+def best_time(function, repeat=3):
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+	args = parser.parse_args()
+
+	for size in args.sizes:
+		root = ET.fromstring(generate_geogebra(points=size, segments=size, views=2).xml_repr())
+		assert ordered(extract_schema(root)) == ordered(legacy_schema(root)), 'schemas differ'
+		n_nodes = sum(1 for node in root.iter())
+		legacy = best_time(lambda: legacy_schema(root))
+		single_pass = best_time(lambda: discover_schema(root))
+		print('{:>6} points, {:>7} nodes: recursive {:7.3f} s, single pass {:7.3f} s, {:5.1f}x'.format(
+			size, n_nodes, legacy, single_pass, legacy / single_pass))
+
+	root = ET.Element('geogebra')
+	construction = ET.SubElement(root, 'construction')
+	for i in range(20000):
+		ET.SubElement(construction, 'expression', {'label': 'e%i' % i})
+	assert ordered(extract_schema(root)) == ordered(legacy_schema(root)), 'schemas differ'
+	print('20000 siblings: recursive {:7.3f} s, single pass {:7.3f} s'.format(
+		best_time(lambda: legacy_schema(root)), best_time(lambda: discover_schema(root))))
+
+	start = time.perf_counter()
+	tag_attr_dict, tag_children_dict, tag_multiplicities = discover_schema(deep_document(10000))
+	print('10000 levels deep: single pass {:.3f} s'.format(time.perf_counter() - start))
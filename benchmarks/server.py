@@ -0,0 +1,122 @@
+# Benchmark for the layout server (server.py): layouting applets one by
+# one with a layouting.py subprocess each (as a CMS calling the script
+# would) vs. sending them to a running server, one after another and from
+# several clients at once. Checks that the server returns the same
+# archives as layout_ggb_bytes, that a Content-Length that is not a
+# number or negative is answered with 400, that /health answers while the
+# worker pool is restarted, and that jobs beyond the capacity of the
+# server are rejected (503) rather than queued.
+#
+# Run inside the repo:
+#   python -m benchmarks.server [--files 20] [--points 50] [--jobs 2]
+
+from benchmarks.corpus import write_ggb
+from lib.ggb_archive import layout_ggb_bytes
+from lib.server import LayoutServer, LayoutRequestHandler, http_server
+from lib.styling_logic import compile_layout
+from concurrent.futures import ThreadPoolExecutor
+import argparse, http.client, json, os, shutil, subprocess, sys, tempfile, threading, time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def request(port, method, path, body=None, headers={}):
+	connection = http.client.HTTPConnection('127.0.0.1', port)
+	connection.request(method, path, body=body, headers=headers)
+	response = connection.getresponse()
+	result = (response.status, response.read())
+	connection.close()
+	return result
+
+def layout_with_subprocess(ggb_file, layout_file):
+	subprocess.run([sys.executable, 'layouting.py', layout_file, ggb_file], cwd=repo_dir, stdout=subprocess.DEVNULL, check=True)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--files', type=int, default=20)
+	parser.add_argument('--points', type=int, default=50)
+	parser.add_argument('--jobs', type=int, default=2)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as work_dir:
+		layout_dir = os.path.join(work_dir, 'layouts')
+		os.makedirs(layout_dir)
+		layout_file = os.path.join(layout_dir, 'sample_layout.json')
+		shutil.copyfile(os.path.join(repo_dir, 'sample_layout.json'), layout_file)
+		ggb_files = [
+			write_ggb(os.path.join(work_dir, 'applet_{}.ggb'.format(i)), points=args.points, segments=args.points, views=2)
+			for i in range(args.files)
+		]
+		ggb_bytes = []
+		for ggb_file in ggb_files:
+			with open(ggb_file, 'rb') as file:
+				ggb_bytes.append(file.read())
+
+		start = time.perf_counter()
+		for ggb_file in ggb_files:
+			layout_with_subprocess(ggb_file, layout_file)
+		subprocess_time = time.perf_counter() - start
+
+		# no request log
+		LayoutRequestHandler.log_message = lambda handler, format, *args: None
+		start = time.perf_counter()
+		layout_server = LayoutServer(layout_dir, max_workers=args.jobs)
+		server = http_server(layout_server, port=0)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		port = server.server_port
+		startup_time = time.perf_counter() - start
+
+		layout = compile_layout(layout_file)
+		for data in ggb_bytes[:3]:
+			status, output = request(port, 'POST', '/layout/sample_layout', data)
+			assert status == 200 and output == layout_ggb_bytes(data, layout), 'server output differs'
+		for length in ['abc', '-1']:
+			status, output = request(port, 'POST', '/layout/sample_layout', b'', headers={'Content-Length': length})
+			assert status == 400, 'Content-Length {} not rejected'.format(length)
+		# a pool that takes a while to warm up
+		def slow_start_pool():
+			executor = LayoutServer.start_pool(layout_server)
+			time.sleep(0.5)
+			return executor
+		layout_server.start_pool = slow_start_pool
+		done = {}
+		def restart():
+			layout_server.restart_pool(layout_server.executor)
+			done['restart'] = time.perf_counter()
+		restart_thread = threading.Thread(target=restart)
+		restart_thread.start()
+		time.sleep(0.1)
+		status, output = request(port, 'GET', '/health')
+		done['health'] = time.perf_counter()
+		restart_thread.join()
+		del layout_server.start_pool
+		assert status == 200 and done['health'] < done['restart'], '/health blocked by the pool restart'
+
+		start = time.perf_counter()
+		for data in ggb_bytes:
+			request(port, 'POST', '/layout/sample_layout', data)
+		sequential_time = time.perf_counter() - start
+
+		start = time.perf_counter()
+		with ThreadPoolExecutor(args.jobs) as clients:
+			statuses = list(clients.map(lambda data: request(port, 'POST', '/layout/sample_layout', data)[0], ggb_bytes))
+		concurrent_time = time.perf_counter() - start
+		assert statuses == [200] * len(ggb_bytes), 'jobs within the capacity were rejected'
+
+		# twice the capacity at once: the excess is rejected
+		capacity = layout_server.max_workers + layout_server.queue_size
+		with ThreadPoolExecutor(2 * capacity) as clients:
+			statuses = list(clients.map(lambda data: request(port, 'POST', '/layout/sample_layout', data)[0], [ggb_bytes[0]] * (2 * capacity)))
+		metrics = json.loads(request(port, 'GET', '/metrics')[1])
+		server.shutdown()
+		server.server_close()
+		layout_server.close()
+
+	print('{} files of {} points'.format(args.files, args.points))
+	print('subprocess per file:       {:8.3f} s ({:.3f} s per file)'.format(subprocess_time, subprocess_time / args.files))
+	print('server startup:            {:8.3f} s'.format(startup_time))
+	print('server, one client:        {:8.3f} s ({:.3f} s per file, {:.1f}x)'.format(sequential_time, sequential_time / args.files, subprocess_time / sequential_time))
+	print('server, {} clients:         {:8.3f} s ({:.1f}x)'.format(args.jobs, concurrent_time, subprocess_time / concurrent_time))
+	print('{} jobs at once, capacity {}: {} done, {} rejected'.format(2 * capacity, capacity, statuses.count(200), statuses.count(503)))
+	print('metrics:', json.dumps(metrics['jobs']))
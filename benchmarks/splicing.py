@@ -0,0 +1,67 @@
+# Benchmark for the splicing writer (splicing.py, --splice) on applets of
+# increasing size: the time to write geogebra.xml after a few edits (the
+# background color of a view, the caption of one point, a new point, an
+# input of a command changed in its xml_attrs in place) and after the
+# whole sample layout, writing the GeoGebra tree (xml_repr) vs. splicing
+# the source. Checks that an unchanged document is written byte
+# for byte as its source, and that the spliced output is the same
+# document as the tree written by xml_repr (compared as in
+# benchmarks.etree_layout).
+#
+# Run inside the repo:
+#   python -m benchmarks.splicing [--sizes 100 1000 3000]
+
+from benchmarks.corpus import generate_geogebra
+from benchmarks.etree_layout import best_time, canonical, with_defaults
+from lib.splicing import parse_with_offsets, SourceXML
+from lib.styling_logic import GeoGebra, compile_layout
+from lib.curated_ggb_classes import Point
+import xml.etree.cElementTree as ET
+import argparse, os
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def few_edits(ggb_root):
+	ggb_root.euclidianViews[0].bgColor.r = 0
+	ggb_root.element('P_{1}').caption.val = 'first'
+	point = Point(label='Q', type='point')
+	point.coords.x = -1
+	ggb_root.construction.add_child(point)
+	# changed in place, not through the objects
+	ggb_root.index.nodes('command')[0].input.xml_attrs['a1'] = 'Q'
+
+def sample_layout(ggb_root):
+	ggb_root.apply_layout(layout=layout)
+
+def spliced_document(xml_bytes, edit):
+	root, offsets = parse_with_offsets(xml_bytes)
+	ggb_root = GeoGebra(node=root)
+	source = SourceXML(xml_bytes, root, offsets, ggb_root)
+	edit(ggb_root)
+	return ggb_root, source
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 3000])
+	args = parser.parse_args()
+	layout = compile_layout(os.path.join(repo_dir, 'sample_layout.json'))
+
+	print('{:>7} {:>9} {:22} {:>10} {:>10} {:>8}'.format('points', 'KB', 'edits', 'xml_repr', 'spliced', 'changes'))
+	for size in args.sizes:
+		xml_bytes = generate_geogebra(points=size, segments=size, views=2).xml_repr().encode('utf-8')
+		ggb_root, source = spliced_document(xml_bytes, lambda ggb_root: None)
+		assert source.spliced_xml() == xml_bytes, 'unchanged document not copied as it is'
+
+		for (name, edit) in [('few edits', few_edits), ('sample layout', sample_layout)]:
+			ggb_root, source = spliced_document(xml_bytes, edit)
+			tree_root = GeoGebra(node=ET.fromstring(xml_bytes))
+			edit(tree_root)
+			tree_xml = tree_root.xml_repr()
+			assert canonical(ET.fromstring(with_defaults(source.spliced_xml()))) == canonical(ET.fromstring(tree_xml)), \
+				'spliced output differs ({}, {} points)'.format(name, size)
+			tree_time = best_time(lambda: tree_root.xml_repr())
+			splice_time = best_time(lambda: source.spliced_xml())
+			print('{:7} {:9.0f} {:22} {:9.4f}s {:9.4f}s {:8}'.format(
+				size, len(xml_bytes) / 1024, name, tree_time, splice_time, len(ggb_root.index.changes)))
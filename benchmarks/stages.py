@@ -0,0 +1,90 @@
+# Benchmark suite for the layouting pipeline. Generates synthetic applets
+# (see corpus.py) and times each stage separately:
+# unzip, ET.parse, GeoGebra(node=root), apply_layout, xml_repr and re-zip.
+# Results are written as JSON, so runs can be compared across releases.
+#
+# Run inside the repo:
+#   python -m benchmarks.stages [--sizes 100 1000] [-o results.json]
+
+from benchmarks.corpus import write_ggb, add_params, default_counts
+from lib.ggb_archive import GGB_XML, open_ggb_file, write_ggb_file
+from lib.styling_logic import GeoGebra, compile_layout
+import xml.etree.cElementTree as ET
+import lib
+import argparse, json, os, platform, sys, tempfile, time
+
+
+stages = ['unzip', 'parse', 'objectify', 'apply_layout', 'serialize', 'rezip']
+
+def time_stages(ggb_file, layout, output_file):
+	times = {}
+	def timed(stage, function):
+		start = time.perf_counter()
+		result = function()
+		times[stage] = time.perf_counter() - start
+		return result
+
+	def unzip():
+		source_archive = open_ggb_file(ggb_file)
+		return source_archive, source_archive.read(GGB_XML)
+
+	source_archive, xml_bytes = timed('unzip', unzip)
+	root = timed('parse', lambda: ET.fromstring(xml_bytes))
+	ggb_root = timed('objectify', lambda: GeoGebra(node=root))
+	timed('apply_layout', lambda: ggb_root.apply_layout(layout=layout))
+	layouted_xml = timed('serialize', lambda: ggb_root.xml_repr().encode('utf-8'))
+	timed('rezip', lambda: write_ggb_file(output_file, layouted_xml, source_archive))
+	return times, len(xml_bytes)
+
+# best time per stage over repeat runs
+def run_config(params, layout, work_dir, repeat=3):
+	ggb_file = write_ggb(os.path.join(work_dir, 'bench.ggb'), **params)
+	output_file = os.path.join(work_dir, 'bench_layouted.ggb')
+	best = {}
+	for _ in range(repeat):
+		times, xml_size = time_stages(ggb_file, layout, output_file)
+		for stage, seconds in times.items():
+			best[stage] = min(seconds, best.get(stage, float('inf')))
+	best['total'] = sum(best[stage] for stage in stages)
+	return {
+		'params': params,
+		'xml_bytes': xml_size,
+		'seconds': best
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000],
+		help='number of points per configuration (other counts are scaled along)')
+	parser.add_argument('--layout', default='sample_layout.json')
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('-o', '--output', help='JSON file for the results (default: stdout)')
+	add_params(parser)
+	args = parser.parse_args()
+
+	layout = compile_layout(args.layout)
+	results = {
+		'version': lib.__version__,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'layout': args.layout,
+		'configs': []
+	}
+	with tempfile.TemporaryDirectory() as work_dir:
+		for size in args.sizes:
+			scale = size / default_counts['points']
+			params = {name: int(getattr(args, name) * scale) for name in default_counts.keys()}
+			params['views'] = args.views
+			params['caption_complexity'] = args.caption_complexity
+			config = run_config(params, layout, work_dir, repeat=args.repeat)
+			results['configs'].append(config)
+			print('{:>6} points: '.format(size) + ', '.join(
+				'{} {:.3f} s'.format(stage, config['seconds'][stage]) for stage in stages + ['total']
+			), file=sys.stderr)
+
+	if args.output:
+		with open(args.output, 'w') as file:
+			json.dump(results, file, indent=4)
+	else:
+		print(json.dumps(results, indent=4))
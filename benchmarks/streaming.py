@@ -0,0 +1,47 @@
+# Benchmark for the streaming layout mode (streaming.py) on synthetic
+# applets of increasing size: peak traced memory and time of
+# layout_ggb_file with the whole GeoGebra tree vs. with stream=True.
+# Checks that both write the same geogebra.xml.
+#
+# Run inside the repo:
+#   python -m benchmarks.streaming [--sizes 100 1000] [--layout sample_layout.json]
+
+from benchmarks.corpus import write_ggb, default_counts
+from lib.ggb_archive import layout_ggb_file, read_ggb_xml
+from lib.styling_logic import compile_layout
+import argparse, os, tempfile, time, tracemalloc
+
+
+def measure(ggb_file, layout, output_file, stream):
+	tracemalloc.start()
+	start = time.perf_counter()
+	layout_ggb_file(ggb_file, layout, output_file, stream=stream)
+	seconds = time.perf_counter() - start
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return seconds, peak
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000],
+		help='number of points per applet (other counts are scaled along)')
+	parser.add_argument('--layout', default='sample_layout.json')
+	args = parser.parse_args()
+
+	layout = compile_layout(args.layout)
+	with tempfile.TemporaryDirectory() as work_dir:
+		for size in args.sizes:
+			scale = size / default_counts['points']
+			params = {name: int(count * scale) for (name, count) in default_counts.items()}
+			ggb_file = write_ggb(os.path.join(work_dir, 'bench.ggb'), views=2, caption_complexity=3, **params)
+			tree_file = os.path.join(work_dir, 'tree.ggb')
+			stream_file = os.path.join(work_dir, 'stream.ggb')
+			tree_seconds, tree_peak = measure(ggb_file, layout, tree_file, stream=False)
+			stream_seconds, stream_peak = measure(ggb_file, layout, stream_file, stream=True)
+			assert read_ggb_xml(tree_file) == read_ggb_xml(stream_file), 'streamed output differs'
+			print('{:>6} points, {:>9} bytes of XML: tree {:7.2f} s {:8.1f} MB, stream {:7.2f} s {:8.1f} MB'.format(
+				size, len(read_ggb_xml(ggb_file)),
+				tree_seconds, tree_peak / 2**20,
+				stream_seconds, stream_peak / 2**20
+			))
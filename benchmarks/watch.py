@@ -0,0 +1,114 @@
+# Benchmark for watch mode (watch.py) on a folder of applets: the time
+# from saving a change (of the layout file or of an applet) until all the
+# outputs are written, for a change of the background color and of the
+# axes (applied again to the trees in memory), of a value that no rule
+# reads and of a single applet, vs. layouting the whole folder again. Checks after every change that the outputs are
+# those of a fresh layout, and that watching a glob (or the files by name)
+# does not layout the outputs again.
+#
+# Run inside the repo:
+#   python -m benchmarks.watch [--files 200] [--points 5]
+
+from benchmarks.corpus import write_ggb
+from lib.ggb_archive import GGB_XML, layout_ggb_bytes, layout_ggb_file, layouted_name, read_ggb_xml
+from lib.styling_logic import compile_layout
+from lib.watch import Watcher
+from zipfile import ZipFile
+import argparse, glob, io, json, os, shutil, tempfile, threading, time
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Edits:
+
+	def __init__(self, layout_file, ggb_files, debounce, paths=None):
+		self.layout_file = layout_file
+		self.ggb_files = ggb_files
+		self.updated = threading.Event()
+		self.watcher = Watcher(layout_file, paths or [os.path.dirname(layout_file)], debounce=debounce, on_update=self.on_update)
+		self.thread = threading.Thread(target=self.watcher.run)
+		self.thread.start()
+		self.updated.wait()
+
+	def on_update(self, summary):
+		self.summary = summary
+		self.updated.set()
+
+	# time from the change until the watcher has handled it
+	def time(self, change):
+		self.updated.clear()
+		start = time.perf_counter()
+		change()
+		self.updated.wait()
+		return time.perf_counter() - start
+
+	def edit_layout(self, edit):
+		with open(self.layout_file, 'r') as file:
+			layout = json.load(file)
+		edit(layout)
+		with open(self.layout_file, 'w') as file:
+			json.dump(layout, file)
+
+	def check(self):
+		layout = compile_layout(self.layout_file)
+		for ggb_file in self.ggb_files:
+			with open(ggb_file, 'rb') as file:
+				expected = ZipFile(io.BytesIO(layout_ggb_bytes(file.read(), layout))).read(GGB_XML)
+			assert read_ggb_xml(layouted_name(ggb_file)) == expected, 'output of {} differs'.format(ggb_file)
+
+	def stop(self):
+		self.watcher.stop()
+		self.thread.join()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--files', type=int, default=200)
+	parser.add_argument('--points', type=int, default=5)
+	parser.add_argument('--debounce', type=float, default=0.2)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as work_dir:
+		layout_file = os.path.join(work_dir, 'layout.json')
+		shutil.copyfile(os.path.join(repo_dir, 'sample_layout.json'), layout_file)
+		ggb_files = [
+			write_ggb(os.path.join(work_dir, 'applet_{}.ggb'.format(i)), points=args.points, segments=args.points, views=2)
+			for i in range(args.files)
+		]
+
+		start = time.perf_counter()
+		layout = compile_layout(layout_file)
+		for ggb_file in ggb_files:
+			layout_ggb_file(ggb_file, layout)
+		full_time = time.perf_counter() - start
+
+		start = time.perf_counter()
+		edits = Edits(layout_file, ggb_files, args.debounce)
+		initial_time = time.perf_counter() - start
+		print('{} files of {} points, debounce {} s'.format(args.files, args.points, args.debounce))
+		print('layouting all files:          {:7.3f} s'.format(full_time))
+		print('watch, first layout:          {:7.3f} s'.format(initial_time))
+
+		changes = [
+			('background color', lambda: edits.edit_layout(lambda layout: layout.update(background_color='white'))),
+			('axes', lambda: edits.edit_layout(lambda layout: layout['axes'].update(show_ticks=False))),
+			('font size (no rule)', lambda: edits.edit_layout(lambda layout: layout.update(font_size=12))),
+			('one applet', lambda: write_ggb(ggb_files[0], points=args.points + 1, segments=args.points, views=2))
+		]
+		for (name, change) in changes:
+			latency = edits.time(change)
+			edits.check()
+			print('watch, {:22} {:7.3f} s (handled in {:.3f} s; {} rules, {} rewritten, {} layouted)'.format(
+				name + ':', latency, edits.summary['seconds'], len(edits.summary['rules']), edits.summary['rewritten'], len(edits.summary['layouted'])))
+		edits.stop()
+
+		# the outputs match the glob too (and are passed by name by a shell)
+		for paths in [[os.path.join(work_dir, '*.ggb')], glob.glob(os.path.join(work_dir, '*.ggb'))]:
+			edits = Edits(layout_file, ggb_files, args.debounce, paths)
+			edits.time(lambda: edits.edit_layout(lambda layout: layout.update(background_color='black')))
+			time.sleep(5 * args.debounce)
+			edits.stop()
+			edits.check()
+			assert len(glob.glob(os.path.join(work_dir, '*_layouted_layouted.ggb'))) == 0, 'outputs layouted again'
+			assert sorted(edits.watcher.documents) == sorted(ggb_files), 'outputs watched'
+		print('watch, glob and file names:   outputs not layouted again')
@@ -0,0 +1,103 @@
+# Benchmark for writing the output archive of image-heavy applets: the
+# members other than geogebra.xml (images, thumbnail, scripts, defaults)
+# copied as they are stored (ggb_archive.copy_member) vs. the former
+# decompressing and compressing of each of them, for write_ggb_file alone
+# and for layouting a whole file (with the tree and the fast engine).
+# Checks that every member has the same content as in the source, that
+# the copied members have the same compressed bytes, that geogebra.xml is
+# deflated (also if it is stored in the source) and that the source
+# archive still reads all its members after the output is written.
+#
+# Run inside the repo:
+#   python -m benchmarks.zip_members [--files 10] [--images 8] [--image_kb 400] [--points 100]
+
+from benchmarks.corpus import generate_geogebra
+from benchmarks.etree_layout import best_time
+import lib.ggb_archive as ggb_archive
+from lib.ggb_archive import GGB_XML, layout_ggb_bytes, raw_member_data, write_ggb_file
+from lib.styling_logic import compile_layout
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+import argparse, io, os, random
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# an applet with images (of little redundancy, as in PNG or JPEG files)
+# and the usual other members
+def image_ggb_bytes(images, image_kb, points, seed, xml_compression=ZIP_DEFLATED):
+	rng = random.Random(seed)
+	buffer = io.BytesIO()
+	with ZipFile(buffer, 'w', ZIP_DEFLATED) as archive:
+		archive.writestr(GGB_XML, generate_geogebra(points=points, segments=points).xml_repr(), compress_type=xml_compression)
+		archive.writestr('geogebra_thumbnail.png', rng.randbytes(32 * 1024))
+		for i in range(images):
+			# mostly random bytes, with runs that deflate does compress
+			image = b''.join(rng.randbytes(64) + bytes(16) for _ in range(image_kb * 1024 // 80))
+			archive.writestr('{:032x}/image_{}.png'.format(rng.getrandbits(128), i), image)
+		archive.writestr('geogebra_javascript.js', 'function ggbOnInit() {}')
+		archive.writestr('geogebra_defaults2d.xml', generate_geogebra(points=20, segments=20).xml_repr())
+	return buffer.getvalue()
+
+def former_copy_member(archive, source_archive, info):
+	archive.writestr(info, source_archive.read(info))
+
+def write_all(ggb_files, xml):
+	for ggb_bytes in ggb_files:
+		with ZipFile(io.BytesIO(ggb_bytes), 'r') as source_archive:
+			write_ggb_file(io.BytesIO(), xml, source_archive)
+
+def layout_all(ggb_files, layout, fast):
+	for ggb_bytes in ggb_files:
+		layout_ggb_bytes(ggb_bytes, layout, fast=fast)
+
+def check(ggb_bytes, output):
+	with ZipFile(io.BytesIO(ggb_bytes), 'r') as source_archive, ZipFile(io.BytesIO(output), 'r') as archive:
+		assert archive.testzip() is None, 'corrupt output'
+		assert archive.namelist() == source_archive.namelist(), 'members differ'
+		assert archive.getinfo(GGB_XML).compress_type == ZIP_DEFLATED, 'geogebra.xml not deflated'
+		for info in source_archive.infolist():
+			if info.filename == GGB_XML:
+				continue
+			assert archive.read(info.filename) == source_archive.read(info), '{} differs'.format(info.filename)
+			output_info = archive.getinfo(info.filename)
+			assert output_info.date_time == info.date_time, '{} has another date'.format(info.filename)
+			assert raw_member_data(archive, output_info) == raw_member_data(source_archive, info), '{} compressed again'.format(info.filename)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--files', type=int, default=10)
+	parser.add_argument('--images', type=int, default=8)
+	parser.add_argument('--image_kb', type=int, default=400)
+	parser.add_argument('--points', type=int, default=100)
+	args = parser.parse_args()
+
+	layout = compile_layout(os.path.join(repo_dir, 'sample_layout.json'))
+	ggb_files = [image_ggb_bytes(args.images, args.image_kb, args.points, seed) for seed in range(args.files)]
+	for ggb_bytes in ggb_files:
+		check(ggb_bytes, layout_ggb_bytes(ggb_bytes, layout))
+		check(ggb_bytes, layout_ggb_bytes(ggb_bytes, layout, fast=True))
+	stored_xml = image_ggb_bytes(1, 1, args.points, 0, xml_compression=ZIP_STORED)
+	check(stored_xml, layout_ggb_bytes(stored_xml, layout))
+	with ZipFile(io.BytesIO(stored_xml), 'r') as source_archive:
+		write_ggb_file(io.BytesIO(), b'<geogebra/>', source_archive)
+		assert source_archive.testzip() is None, 'source archive changed by writing'
+	xml = b'<geogebra/>'
+	print('{} files, {} images of {} KB, {} points ({:.1f} MB per file)'.format(
+		args.files, args.images, args.image_kb, args.points, len(ggb_files[0]) / 1024 / 1024))
+
+	timings = {}
+	for (name, copy_member) in [('former', former_copy_member), ('raw', ggb_archive.copy_member)]:
+		original_copy_member = ggb_archive.copy_member
+		ggb_archive.copy_member = copy_member
+		try:
+			timings[name] = [
+				best_time(lambda: write_all(ggb_files, xml)),
+				best_time(lambda: layout_all(ggb_files, layout, False)),
+				best_time(lambda: layout_all(ggb_files, layout, True))
+			]
+		finally:
+			ggb_archive.copy_member = original_copy_member
+	for (i, step) in enumerate(['write_ggb_file', 'layout, tree engine', 'layout, fast engine']):
+		former, raw = timings['former'][i], timings['raw'][i]
+		print('{:20} former {:7.3f} s, raw copy {:7.3f} s ({:.1f}x)'.format(step + ':', former, raw, former / raw))
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+import sys, signal, threading
+import argparse
+
+
+# required arguments:
+#   directory of the layout files (JSON); a layout is requested by its
+#   file name without '.json' (e.g. sample_layout)
+#
+# optional flags:
+# --port: Port on localhost (default: 8765)
+# --socket: Listen on this Unix socket instead
+# -j, --jobs: number of worker processes (default: number of CPUs)
+# --queue_size: number of jobs that may wait for a worker (default: the
+#                 number of workers); further jobs are rejected with 503
+# --timeout: seconds a client waits for a job (default: 60)
+# --max_size: Maximum size of a GGB file in MB (default: 64)
+# --cache: Reuse the output of previous jobs (kept in the given directory)
+# --cache_size: Maximum size of the cache in MB (default: 512)
+
+#sysarg parsing
+try:
+	parser = argparse.ArgumentParser()
+	parser.add_argument(
+	    "layout_dir", help="directory of the layout files (JSON)"
+	)
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--socket", help="path of a Unix socket to listen on instead")
+	parser.add_argument("-j", "--jobs", type=int)
+	parser.add_argument("--queue_size", type=int)
+	parser.add_argument("--timeout", type=float, default=60)
+	parser.add_argument("--max_size", type=int, default=64, help="maximum size of a GGB file in MB")
+	parser.add_argument("--cache", help="directory of the output cache")
+	parser.add_argument("--cache_size", type=int, help="maximum size of the output cache in MB")
+	args = parser.parse_args()
+
+except argparse.ArgumentError as err:
+	print(str(err))
+	sys.exit(2)
+
+# imported once the arguments are parsed (see layouting.py)
+from lib.server import LayoutServer, http_server
+
+layout_server = LayoutServer(
+	args.layout_dir,
+	max_workers=args.jobs,
+	queue_size=args.queue_size,
+	job_timeout=args.timeout,
+	max_bytes=args.max_size * 1024 * 1024,
+	cache_dir=args.cache,
+	cache_size=args.cache_size and args.cache_size * 1024 * 1024
+)
+for stylesheet_id, error in layout_server.stylesheets.compile_all().items():
+	print(error)
+server = http_server(layout_server, port=args.port, socket_path=args.socket)
+
+# stop serving on SIGTERM as on Ctrl-C (shutdown waits for serve_forever,
+# so it is called from another thread)
+signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+
+print('layout server with {} workers on {}'.format(layout_server.max_workers, args.socket or 'http://127.0.0.1:{}'.format(server.server_port)))
+try:
+	server.serve_forever()
+except KeyboardInterrupt:
+	pass
+finally:
+	server.server_close()
+	layout_server.close()
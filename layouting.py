@@ -1,10 +1,5 @@
 #!/usr/bin/python3
-from lib.ggb_class_extractor import extract_classes_from_ggb_file
-import xml.etree.cElementTree as ET
-from lib.curated_ggb_classes import *
-from lib.styling_logic import GeoGebra
-import os, sys, shutil
-from zipfile import ZipFile
+import os, sys, json, shutil
 import argparse
 
 
@@ -19,6 +14,23 @@ import argparse
 #                 native Python classes for all the elements.
 #                 Otherwise, use a list of curated GGB classes
 # -c, --keep_classes: Keep the generated Python code for the extracted classes
+# --class_cache: Directory of the generated class modules, one per schema
+#                 (default: ~/.cache/ggb-style-sheets/classes); a file with
+#                 a schema seen before skips the code generation
+# --compact: Write the XML without indentation and line breaks
+# --stream: Layout geogebra.xml element by element while reading it,
+#                 without holding the whole document (for huge constructions)
+# --fast: Apply the layout straight to the parsed XML, without building
+#                 GGB objects (same document, without the default values)
+# --splice: Write geogebra.xml as a copy of the input in which only what
+#                 the layout changes is written anew (same document, in the
+#                 formatting of the input, without the default values)
+# --cache: Reuse the output of previous runs (kept in the given directory)
+#                 if neither the GGB file nor the layout have changed
+# --cache_size: Maximum size of the cache in MB (default: 512)
+# --profile: Record wall time, CPU time and peak memory for each phase
+#                 and each layout rule; the JSON report is written to the
+#                 given file (or printed)
 
 #sysarg parsing
 try:
@@ -36,8 +48,19 @@ try:
 	]
 	for short_arg, long_arg in optional_args:
 		parser.add_argument(short_arg, long_arg, action="store_true")
+	parser.add_argument("--class_cache", default=os.path.join(os.path.expanduser('~'), '.cache', 'ggb-style-sheets', 'classes'),
+		help="directory of the generated class modules")
+	parser.add_argument("--compact", action="store_true")
+	parser.add_argument("--stream", action="store_true")
+	parser.add_argument("--fast", action="store_true")
+	parser.add_argument("--splice", action="store_true")
+	parser.add_argument("--cache", help="directory of the output cache")
+	parser.add_argument("--cache_size", type=int, help="maximum size of the output cache in MB")
+	parser.add_argument("--profile", nargs='?', const='-', help="file for the JSON profiling report (default: stdout)")
 	parser.add_argument("-o", "--output_name")
 	args = parser.parse_args()
+	if args.splice and (args.compact or args.stream or args.fast):
+		parser.error('--splice keeps the formatting of the input and cannot be combined with --compact, --stream or --fast')
 	input_name = '.'.join(args.ggb_file.split('.')[:-1]) # remove file ending
 	output_name =  input_name + '_layouted'
 	layout_file = args.layout_file
@@ -49,61 +72,59 @@ except argparse.ArgumentError as err:
 	print(str(err))
 	sys.exit(2)
 
+# the GGB classes are only imported once the arguments are parsed, so that
+# --help and usage errors do not pay for them
+from lib.ggb_archive import GGB_XML, layout_ggb_file, read_ggb_xml
+from lib.output_cache import OutputCache
+from lib.profiling import Profiler, no_profiler
+
+profiler = Profiler() if args.profile else no_profiler
+
 # GGB class extraction
 if extract_classes:
 	print("extracting GGB classes...")
-	code = extract_classes_from_ggb_file(input_name)
-	ggb_dir = os.path.dirname(input_name)
+	from lib.class_cache import ClassCache
+	class_cache = ClassCache(args.class_cache)
+	with profiler.phase('extract_classes'):
+		class_module = class_cache.load(input_name)
+	print('class cache: {hits} hits, {misses} misses'.format(**class_cache.stats()))
+	ggb_dir = os.path.dirname(input_name) or '.'
 	if keep_classes:
-		with open(ggb_dir + '/extracted_ggb_classes.py', 'w') as f:
-			f.write('from lib.ggb_base_object import create_ggb_class\n')
-			for line in sorted(code):
-				f.write(line)
+		shutil.copyfile(class_module.__file__, ggb_dir + '/extracted_ggb_classes.py')
 	else:
 		try:
 			os.remove(ggb_dir + '/extracted_ggb_classes.py')
 		except:
 			pass
 
-	for line in code:
-		exec(line)
+	for (name, value) in vars(class_module).items():
+		if not name.startswith('_'):
+			globals()[name] = value
 # or use the curated ones
 else:
 	from lib.curated_ggb_classes import *
 
- # remove remnant outputs from previous run
-if os.path.isdir(input_name):
-	shutil.rmtree(input_name)
-if os.path.isfile(output_name + '.ggb'):
-	os.remove(output_name + '.ggb')
-if os.path.isdir(output_name):
-	shutil.rmtree(output_name)
-
-# unzip GGB file into a folder and make a copy
-os.rename(input_name + '.ggb', input_name + '.zip')
-ZipFile(input_name + '.zip', 'r').extractall(input_name)
-os.rename(input_name + '.zip', input_name + '.ggb')
-os.mkdir(output_name)
-for file in os.listdir(input_name):
-	shutil.copy(input_name + '/' + file, output_name)
-
-# read XML
-et = ET.parse(input_name + '/geogebra.xml')
-root = et.getroot()
-ggb_root = GeoGebra(node=root)
-
-# apply the layout and save
-ggb_root.apply_layout(filename=layout_file)
-ggb_root.save(output_name + '/geogebra.xml')
-shutil.make_archive(output_name, 'zip', output_name)
-os.rename(output_name + '.zip', output_name + '.ggb')
-
-if not keep_xml:
-	shutil.rmtree(input_name)
-	shutil.rmtree(output_name)
-
-
-
-
-
-
+# the cache does not know about extracted classes, so only use it with the curated ones
+cache = None
+if args.cache and not extract_classes:
+	cache = OutputCache(args.cache, args.cache_size and args.cache_size * 1024 * 1024)
+
+# read the GGB file in memory, apply the layout and write the output archive
+layout_ggb_file(args.ggb_file, layout_file, output_name + '.ggb', compact=args.compact, cache=cache, profiler=profiler, stream=args.stream, fast=args.fast, splice=args.splice)
+if cache is not None:
+	print('cache: {hits} hits, {misses} misses, {bytes_saved} bytes saved'.format(**cache.stats()))
+
+if args.profile:
+	profiler.stop()
+	report = json.dumps(profiler.report(file=args.ggb_file), indent=4)
+	if args.profile == '-':
+		print(report)
+	else:
+		with open(args.profile, 'w') as f:
+			f.write(report)
+
+if keep_xml:
+	for name, ggb_file in [(input_name, args.ggb_file), (output_name, output_name + '.ggb')]:
+		os.makedirs(name, exist_ok=True)
+		with open(name + '/' + GGB_XML, 'wb') as f:
+			f.write(read_ggb_xml(ggb_file))
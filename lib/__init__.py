@@ -1,10 +1,128 @@
+__version__ = '0.1.0'
+
 import json
+import io
 import xml.etree.cElementTree as ET
-import sys
-sys.setrecursionlimit(100)
+
+# JSON conversion and representation, without any instance state
+# (so that slotted XML objects can share it, see JXObject)
+class JSONBase:
+
+	__slots__ = ()
+
+	# The nested dicts and lists are converted with an explicit stack
+	# (so that any depth is fine), each into its place in the parent:
+	# (container, key, value) with container a list or the __dict__ of
+	# a JSONObject
+	@staticmethod
+	def convert_to_object(v):
+		result = [None]
+		stack = [(result, 0, v)]
+		while len(stack) > 0:
+			container, key, value = stack.pop()
+			if type(value) in [str, int, float, bool] or value is None:
+				container[key] = value
+			elif type(value) == dict:
+				obj = JSONObject()
+				obj.attr_dict = value or None
+				# the keys in their order, the values are filled in below
+				obj.__dict__.update(dict.fromkeys(value))
+				container[key] = obj
+				stack.extend((obj.__dict__, k, w) for (k, w) in value.items())
+			elif type(value) == list:
+				container[key] = [None] * len(value)
+				stack.extend((container[key], i, w) for (i, w) in enumerate(value))
+			else:
+				container[key] = None
+		return result[0]
+
+	# JSON-like representation: dicts and JSONObjects one entry per line,
+	# lists on one line if that fits into 80 characters, otherwise one
+	# item per line. The parts are written in order from an explicit stack
+	# (so that any depth is fine) of values and strings; the one-line
+	# representation of a list is written as it is and taken back if it
+	# does not fit (captures holds where it starts).
+	@staticmethod
+	def indented_repr(v, indent=0):
+		parts = []
+		captures = []
+		stack = [('value', v, indent)]
+		while len(stack) > 0:
+			step, v, indent = stack.pop()
+
+			if step == 'string':
+				parts.append(v)
+
+			elif step == 'value':
+				if type(v) is dict or isinstance(v, JSONObject):
+					d = v if type(v) is dict else v.__dict__
+					JSONBase.push_long_repr(stack, '{', '}', [('    ' * (indent + 1) + '"' + key + '" : ', value) for (key, value) in d.items()], indent)
+				elif type(v) == list and JSONBase.has_more_values_than(v, 80):
+					JSONBase.push_long_repr(stack, '[', ']', [('    ' * (indent + 1), w) for w in v], indent)
+				elif type(v) == list:
+					captures.append(len(parts))
+					stack.append(('fit', v, indent))
+					stack.append(('short', v, indent))
+				else:
+					stack.append(('short', v, indent))
+
+			elif step == 'short':
+				if type(v) == str:
+					parts.append(repr(v).replace("'", '"'))
+				elif type(v) == list:
+					stack.append(('string', ']', indent))
+					for (i, w) in reversed(list(enumerate(v))):
+						stack.append(('short', w, indent))
+						if i > 0:
+							stack.append(('string', ', ', indent))
+					stack.append(('string', '[', indent))
+				elif type(v) == bool:
+					parts.append('true' if v else 'false')
+				elif isinstance(v, JSONObject):
+					stack.extend([('string', '"', indent), ('value', v, 0), ('string', '"', indent)])
+				else:
+					parts.append('"' + repr(v) + '"')
+
+			elif step == 'fit':
+				start = captures.pop()
+				if sum(len(part) for part in parts[start:]) > 80:
+					del parts[start:]
+					JSONBase.push_long_repr(stack, '[', ']', [('    ' * (indent + 1), w) for w in v], indent)
+
+			# the last part is the comma after the last item (or the
+			# opening bracket, if there are none)
+			elif step == 'close':
+				parts[-1] = '\n'
+				parts.append('    ' * indent + v)
+
+		return ''.join(parts)
+
+	@staticmethod
+	def push_long_repr(stack, opening, closing, items, indent):
+		stack.append(('close', closing, indent))
+		for (prefix, value) in reversed(items):
+			stack.extend([('string', ',\n', indent), ('value', value, indent + 1), ('string', prefix, indent)])
+		stack.append(('string', opening + '\n', indent))
+
+	# Every value (a list and each of its items) takes at least one
+	# character in the one-line representation: more than 80 values
+	# do not fit, whatever they are.
+	@staticmethod
+	def has_more_values_than(v, n):
+		count = 0
+		stack = [v]
+		while len(stack) > 0:
+			w = stack.pop()
+			count += 1
+			if count > n:
+				return True
+			if type(w) == list:
+				stack.extend(w)
+		return False
+
 
 # Python object that is described by a JSON file
-class JSONObject:
+class JSONObject(JSONBase):
 
 	def __init__(self, filename='', attr_dict=None):
 		super(JSONObject, self).__init__()
@@ -13,17 +131,6 @@ class JSONObject:
 			self.load_json(filename)
 		self.load_dict(attr_dict)
 
-	@staticmethod
-	def convert_to_object(v):
-		if type(v) in [str, int, float, bool] or v is None:
-			return v
-		elif type(v) == dict:
-			return JSONObject(attr_dict=v)
-		elif type(v) == list:
-			return [JSONObject.convert_to_object(w) for w in v]
-		else:
-			return None
-
 	def load_dict(self, attr_dict):
 		if attr_dict is None:
 			return
@@ -42,60 +149,6 @@ class JSONObject:
 	def __repr__(self):
 		return JSONObject.indented_repr(self)
 
-	@staticmethod
-	def indented_repr(v, indent=0):
-
-		def static_short_repr(v):
-			if type(v) == str:
-				return repr(v).replace("'", '"')
-			elif type(v) == list:
-				return '[' + ', '.join([static_short_repr(w) for w in v]) + ']'
-			elif type(v) == bool:
-				if v:
-					return 'true'
-				else:
-					return 'false'
-			else:
-				return '"' + repr(v) + '"'
-
-
-		def static_long_repr(v, indent=0):
-
-			def long_repr_of_dict(d):
-				string = '{\n'
-				for key, value in d.items():
-					prefix = '    ' * (indent + 1) + '"' + key + '" : '
-					string += prefix + JSONObject.indented_repr(value, indent=indent + 1) + ',\n'
-				# remove trailing comma
-				string = string[:-2] + '\n'
-				string += '    ' * indent + '}'
-				return string
-
-			def long_repr_of_list(l):
-				string = '[\n'
-				for w in v:
-					string += '    ' * (indent + 1) + JSONObject.indented_repr(w, indent=indent + 1) + ',\n'
-				# remove trailing comma
-				string = string[:-2] + '\n'
-				string += '    ' * indent + ']'
-				return string
-
-			if type(v) == dict:
-				return long_repr_of_dict(v)
-			if isinstance(v, JSONObject):
-				return long_repr_of_dict(v.__dict__)
-			elif type(v) == list:
-				return long_repr_of_list(v)
-			else:
-				return repr(v)
-
-		if type(v) is not dict and not isinstance(v, JSONObject):
-			short_repr = static_short_repr(v)
-			if len(short_repr) <= 80:
-				return short_repr
-		else:
-			return static_long_repr(v, indent=indent)
-
 
 
 
@@ -107,11 +160,25 @@ class JSONObject:
 
 
 # Python object that is described by an XML tag
+# Nodes are slotted: the XML attributes are stored once, in xml_attrs,
+# and read through __getattr__ (or the generated __getattribute__, see
+# create_xml_class). The instance __dict__ is only allocated if some
+# other attribute is set on the node.
 class XMLObject:
 
+	__slots__ = ('tag', 'xml_attrs', 'children', 'content', 'child_classes', 'child_index', 'child_positions', 'document_ref', '__dict__')
+
+	# attribute name -> parser for the XML string value (see create_xml_class);
+	# attributes without a parser are kept as strings
+	attr_parsers = {}
+
 	def __init__(self, *args, filename='', node=None, tag='', xml_attrs=None, content=None, children=None, **kwargs):
 		super(XMLObject, self).__init__(*args)
+		self.document_ref = None
 		self.xml_attrs = xml_attrs or {}
+		self.child_classes = {}
+		self.child_index = None
+		self.child_positions = None
 		self.children = children or []
 		self.content = content
 		if filename != '':
@@ -119,8 +186,16 @@ class XMLObject:
 		elif node is not None:
 			self.tag = node.tag
 			self.load_dict(node.attrib, **kwargs)
-			self.content = XMLObject.parse_string(node.text)
-			self.children = [XMLObject(node=child) for child in node]
+			self.content = XMLObject.parse_content(node.text)
+			# the subtree is read with an explicit stack (any depth is fine)
+			stack = [(self, node)]
+			while len(stack) > 0:
+				parent, parent_node = stack.pop()
+				parent.children = [
+					XMLObject(tag=child.tag, xml_attrs=dict(child.attrib), content=XMLObject.parse_content(child.text))
+					for child in parent_node
+				]
+				stack.extend(zip(parent.children, parent_node))
 		else:
 			if tag == '':
 				tag = type(self).__name__
@@ -130,11 +205,26 @@ class XMLObject:
 			self.load_dict(self.xml_attrs, **kwargs)
 			self.content = content
 
+	# String values (as read from XML) are converted by the parser for that
+	# attribute, other values are taken as they are.
 	def load_dict(self, xml_attrs, **kwargs):
 		xml_attrs = xml_attrs or {}
-		self.__dict__.update({key: XMLObject.parse_string(str(value)) for key, value in xml_attrs.items()})
-		self.__dict__.update(kwargs)
-		self.register_xml_attrs(*(tuple(xml_attrs.keys()) + tuple(kwargs.keys())))
+		parsers = type(self).attr_parsers
+		own_attrs = self.xml_attrs
+		for key, value in xml_attrs.items():
+			if key in parsers and type(value) is str:
+				value = parsers[key](value)
+			own_attrs[key] = value
+		own_attrs.update(kwargs)
+
+	def __getattr__(self, name):
+		# only called if the regular lookup fails
+		if name in XMLObject.__slots__:
+			raise AttributeError(name)
+		try:
+			return self.xml_attrs[name]
+		except KeyError:
+			raise AttributeError(name)
 
 	def load_xml(self, filename):
 		et = ET.parse(filename)
@@ -146,29 +236,162 @@ class XMLObject:
 		self.children = parsed_object.children
 
 	def add_child(self, new_child):
+		if self.document_ref is not None:
+			self.check_new_children([new_child])
 		self.children.append(new_child)
+		self.index_child(new_child)
+		if self.child_positions is not None:
+			self.child_positions[new_child] = len(self.children) - 1
+		if self.document_ref is not None:
+			self.update_document_index(added=[new_child])
+
+	# The document (GeoGebra root) this node belongs to, if it has been
+	# indexed as part of one (see document_index.py). Adding and removing
+	# children updates the index of that document.
+	def owner_document(self):
+		document_ref = self.document_ref
+		if document_ref is None:
+			return None
+		return document_ref()
+
+	def update_document_index(self, removed=(), added=()):
+		document = self.owner_document()
+		if document is None:
+			return
+		for child in removed:
+			document.index.remove(self, child)
+		for child in added:
+			document.index.add(self, child)
+		document.index.changed(self, added=added)
+
+	# A node is only ever part of one document: adding a node of another
+	# document raises ValueError, before anything is changed (see
+	# document_index.py)
+	def check_new_children(self, children):
+		document = self.owner_document()
+		if document is not None:
+			document.index.check_new_nodes(children)
+
+	# The attributes or the content of this node have changed: recorded
+	# by the document, if it keeps track of changes (see splicing.py).
+	# Assigning attributes (or xml_attrs) does this, and so does changing
+	# xml_attrs in place in a document read for splicing (TrackedAttrs).
+	def note_change(self):
+		document = self.owner_document()
+		if document is not None:
+			document.index.changed(self, attrs=True)
+
+	# Named children (see child_classes in create_xml_class) are looked up
+	# through child_index, which maps each name to the children that are
+	# instances of the corresponding class, in order. It is built on the
+	# first named lookup, kept up to date by add_child, __setitem__ and
+	# __delitem__, and dropped whenever the children are replaced as a whole.
+	def index_children(self):
+		self.child_index = {
+			name: [c for c in self.children if isinstance(c, child_class)]
+			for (name, child_class) in self.child_classes.items()
+		}
+		return self.child_index
+
+	def index_child(self, child):
+		if self.child_index is None:
+			return
+		for (name, child_class) in self.child_classes.items():
+			if isinstance(child, child_class):
+				self.child_index[name].append(child)
+
+	def reindex_child(self, old_child, new_child):
+		if self.child_index is None:
+			return
+		for (name, child_class) in self.child_classes.items():
+			indexed_children = self.child_index[name]
+			position = XMLObject.position_of(old_child, indexed_children)
+			if position is None:
+				if new_child is not None and isinstance(new_child, child_class):
+					indexed_children.append(new_child)
+			elif new_child is not None and isinstance(new_child, child_class):
+				indexed_children[position] = new_child
+			else:
+				del indexed_children[position]
+
+	# The position of a child in children, through child_positions (child ->
+	# position), which is built on the first lookup and kept up to date by
+	# add_child and __setitem__. Every position is checked before it is
+	# used, and the map built again if it is out of date (after children
+	# have been removed, inserted or replaced as a whole).
+	def position_of_child(self, child):
+		children = self.children
+		positions = self.child_positions
+		position = None if positions is None else positions.get(child)
+		if position is None or position >= len(children) or children[position] is not child:
+			positions = self.child_positions = {c: i for (i, c) in enumerate(children)}
+			position = positions.get(child)
+		return position
+
+	@staticmethod
+	def position_of(child, children):
+		for (i, c) in enumerate(children):
+			if c is child:
+				return i
+		return None
 		
+	# Attribute values are only converted if they are written exactly the
+	# way they are serialized again (see attr_repr_of), so that every value
+	# round-trips unchanged: '5' and '0.5' become numbers, '5.0' becomes
+	# a float, '05' or '1E-4' stay strings. Non-numbers are recognized
+	# from their characters, without raising exceptions.
+	bool_values = {'true': True, 'false': False}
+
 	@staticmethod
-	def parse_string(s):
-		try:
-			x = float(s)
-			if int(x) == x:
-				return int(x)
-			else:
-				return x
-		except:
-			if s == 'true' or s == 'True':
-				return True
-			elif s == 'false' or s == 'False':
-				return False
-			elif type(s) == str:
-				return s.strip()
-			else:
+	def parse_number(s):
+		digits = s[1:] if s[:1] == '-' else s
+		if digits.isdigit():
+			if not digits.isascii() or len(digits) > 18:
 				return s
+			x = int(s)
+		else:
+			integer, point, fraction = digits.partition('.')
+			if not (integer.isdigit() and fraction.isdigit() and digits.isascii()):
+				return s
+			x = float(s)
+		if repr(x) == s:
+			return x
+		return s
 
-	def save(self, filename):
+	@staticmethod
+	def parse_bool(s):
+		return XMLObject.bool_values.get(s, s)
+
+	# parser for the attributes with the same type as default
+	@staticmethod
+	def parser_for(default):
+		if type(default) == bool:
+			return XMLObject.parse_bool
+		elif type(default) in [int, float]:
+			return XMLObject.parse_number
+		else:
+			return None
+
+	# untyped conversion, for values without a schema
+	@staticmethod
+	def parse_string(s):
+		if type(s) != str:
+			return s
+		value = XMLObject.parse_bool(s)
+		if value is s:
+			value = XMLObject.parse_number(s)
+		return value
+
+	# text content is kept as a string, without the surrounding whitespace
+	@staticmethod
+	def parse_content(s):
+		if s is None:
+			return None
+		return s.strip()
+
+	def save(self, filename, compact=False):
 		with open(filename, 'w') as f:
-			f.write(self.xml_repr())
+			self.write_xml(f, compact=compact)
 
 	def __iter__(self):
 		return iter(self.children)
@@ -180,13 +403,44 @@ class XMLObject:
 		return self.children[i]
 
 	def __setitem__(self, i, child):
-		self.children[i] = child
+		if type(i) == slice:
+			old_children = self.children[i]
+			child = list(child)
+			if self.document_ref is not None:
+				self.check_new_children(child)
+			self.children[i] = child
+			self.index_children()
+			if self.document_ref is not None:
+				self.update_document_index(removed=old_children, added=child)
+		else:
+			old_child = self.children[i]
+			if self.document_ref is not None:
+				self.check_new_children([child])
+			self.children[i] = child
+			self.reindex_child(old_child, child)
+			positions = self.child_positions
+			if positions is not None:
+				positions.pop(old_child, None)
+				positions[child] = i % len(self.children)
+			if self.document_ref is not None:
+				self.update_document_index(removed=[old_child], added=[child])
 
 	def __missing__(self, i):
 		self.children.__missing__(i)
 
 	def __delitem__(self, i):
-		del self.children[i]
+		if type(i) == slice:
+			old_children = self.children[i]
+			del self.children[i]
+			self.index_children()
+			if self.document_ref is not None:
+				self.update_document_index(removed=old_children)
+		else:
+			old_child = self.children[i]
+			del self.children[i]
+			self.reindex_child(old_child, None)
+			if self.document_ref is not None:
+				self.update_document_index(removed=[old_child])
 
 	def __reversed__(self, i):
 		return reversed(self.children)
@@ -194,31 +448,75 @@ class XMLObject:
 	def __contains__(self, child):
 		return (child in self.children)
 
-	def xml_repr(self):
+	def xml_declaration(self):
 		if self.__class__.__name__ == 'GeoGebra':
-			prefix = '<?xml version="1.0" encoding="utf-8"?>\n'
+			return '<?xml version="1.0" encoding="utf-8"?>\n'
 		else:
-			prefix = ''
-		return prefix + self.indented_xml_repr()
+			return ''
 
-	def indented_xml_repr(self, indent=0):
-		if len(self.children) == 0 and self.content is None:
-			string = indent * '    ' + '<{}{}/>\n'.format(self.tag, self.attr_repr())
-		else:
-			string = indent * '    ' + '<{}{}>'.format(self.tag, self.attr_repr())
-			if len(self.children) == 0:
-				string += str(self.content) + '</{}>\n'.format(self.tag)
-				return string
-			string += '\n'
-			if self.content is not None and self.content != '':
-				string += indent * '    ' + repr(self.content) + '\n'
-			for child in self:
-				string += child.indented_xml_repr(indent=indent + 1)
-			string += indent * '    ' + '</{}>\n'.format(self.tag)
-		return string
-		
+	def xml_repr(self, compact=False):
+		buffer = io.StringIO()
+		self.write_xml(buffer, compact=compact)
+		return buffer.getvalue()
+
+	def indented_xml_repr(self, indent=0, compact=False):
+		buffer = io.StringIO()
+		self.write_indented_xml(buffer, indent=indent, compact=compact)
+		return buffer.getvalue()
+
+	# Serialize into any file-like object with a (text) write method,
+	# chunk by chunk, without building the whole document as one string.
+	# compact=True leaves out indentation and line breaks.
+	def write_xml(self, sink, compact=False):
+		sink.write(self.xml_declaration())
+		self.write_indented_xml(sink, compact=compact)
+
+	# The subtree is written from an explicit stack (any depth is fine) of
+	# (node, indent, end): end is True for the end tag of a node whose
+	# children are on the stack above it.
+	def write_indented_xml(self, sink, indent=0, compact=False):
+		stack = [(self, indent, False)]
+		while len(stack) > 0:
+			node, indent, end = stack.pop()
+			if end:
+				node.write_end_tag(sink, indent=indent, compact=compact)
+				continue
+			children = node.children
+			if len(children) == 0:
+				indentation, newline = XMLObject.whitespace(indent, compact)
+				if node.content is None:
+					sink.write('{}<{}{}/>{}'.format(indentation, node.tag, node.attr_repr(), newline))
+				else:
+					sink.write('{}<{}{}>'.format(indentation, node.tag, node.attr_repr()))
+					sink.write('{}</{}>{}'.format(node.content, node.tag, newline))
+				continue
+			node.write_start_tag(sink, indent=indent, compact=compact)
+			stack.append((node, indent, True))
+			stack.extend((child, indent + 1, False) for child in reversed(children))
+
+	# Opening and closing tag of a node with children, so that the
+	# children can also be written one by one (see streaming.py)
+	def write_start_tag(self, sink, indent=0, compact=False):
+		indentation, newline = XMLObject.whitespace(indent, compact)
+		sink.write('{}<{}{}>{}'.format(indentation, self.tag, self.attr_repr(), newline))
+		if self.content is not None and self.content != '':
+			sink.write(indentation + repr(self.content) + newline)
+
+	def write_end_tag(self, sink, indent=0, compact=False):
+		indentation, newline = XMLObject.whitespace(indent, compact)
+		sink.write('{}</{}>{}'.format(indentation, self.tag, newline))
+
+	# indentation and line break (compact=True leaves out both)
+	@staticmethod
+	def whitespace(indent, compact):
+		if compact:
+			return '', ''
+		return indent * '    ', '\n'
+
+	# escape (if given) is applied to string values on the way out;
+	# xml_attrs itself is left untouched
 	@staticmethod
-	def attr_repr_of(xml_attrs):
+	def attr_repr_of(xml_attrs, escape=None):
 		if len(xml_attrs) == 0:
 			return ''
 		else:
@@ -227,20 +525,30 @@ class XMLObject:
 				if value is None:
 					continue
 				elif type(value) == str:
-					value_repr = value
-				elif type(value) == bool:
-					value_repr = str(value).lower()
+					value_repr = escape(value) if escape else value
 				else:
-					value_repr = repr(value)
+					value_repr = XMLObject.value_repr(value)
 				string += ' {}="{}"'.format(key.replace('_', ':'), value_repr)
 			return string
 
+	# XML string of an attribute value (before escaping)
+	@staticmethod
+	def value_repr(value):
+		if type(value) == str:
+			return value
+		elif type(value) == bool:
+			return str(value).lower()
+		else:
+			return repr(value)
+
 	def attr_repr(self):
 		return self.__class__.attr_repr_of(self.xml_attrs)
 
 	def register_xml_attrs(self, *attrs):
 		for attr in attrs:
-			self.xml_attrs[attr] = self.__dict__[attr]
+			self.xml_attrs[attr] = getattr(self, attr)
+		if self.document_ref is not None:
+			self.note_change()
 
 	def update_xml_attrs(self, *attrs):
 		self.register_xml_attrs(*attrs)
@@ -252,13 +560,15 @@ class XMLObject:
 
 
 
-class JXObject(XMLObject, JSONObject):
-	pass
+class JXObject(XMLObject, JSONBase):
+	__slots__ = ()
 
 
 # Subclass XMLObject to represent a specific tag
 # NB: child_classes refers to nodes, not further subclasses
-def create_xml_class(name, superclass=XMLObject, tag=None, attrs=None, child_classes=None):
+# attr_types gives the types (bool, int, float or str) of attributes
+# without a typed default (see xsd_class_extractor.py)
+def create_xml_class(name, superclass=XMLObject, tag=None, attrs=None, child_classes=None, attr_types=None):
 	attrs = attrs or {}
 	child_classes = child_classes or {}
 	def camel_case(string):
@@ -268,49 +578,64 @@ def create_xml_class(name, superclass=XMLObject, tag=None, attrs=None, child_cla
 			tag = camel_case(name)
 		else:
 			tag = camel_case(superclass.__name__)
-	A = type(name, (superclass,), {'children': [], 'content': None, 'tag': tag})
+	A = type(name, (superclass,), {'__slots__': ()})
 	class B(A):
+
+		__slots__ = ()
+
+		# child classes of this class and all generated superclasses
+		default_child_classes = dict(getattr(superclass, 'default_child_classes', {}), **child_classes)
+
+		# attribute types are those of the (non-None) defaults, or else
+		# those in attr_types
+		attr_parsers = dict(superclass.attr_parsers)
+		for (key, attr_type) in (attr_types or {}).items():
+			attr_parsers[key] = XMLObject.parser_for(attr_type())
+		for (key, value) in attrs.items():
+			if value is not None:
+				attr_parsers[key] = XMLObject.parser_for(value)
+		attr_parsers = {key: parser for (key, parser) in attr_parsers.items() if parser is not None}
+
 		def __init__(self, *args, node=None, additional_child_classes=None, **kwargs):
 
 			super().__init__(*args, node=node, **kwargs)
-			additional_child_classes = additional_child_classes or {}
-			self.__dict__['xml_attrs'] = self.__dict__['xml_attrs'] or {}
 			if attrs is not None:
 				for key, value in attrs.items():
-					if key not in self.__dict__['xml_attrs'].keys():
-						self.__dict__['xml_attrs'][key] = value
-			self.__dict__['children'] = self.__dict__['children'] or []
-			if 'child_classes' not in self.__dict__.keys():
-				self.__dict__['child_classes'] = {}
-			self.__dict__['child_classes'].update(dict(child_classes, **additional_child_classes))
-			for (child_name, child_class) in self.__dict__['child_classes'].items():
-				if child_class in [c.__class__ for c in self.__dict__['children']]:
-					child = [c for c in self.__dict__['children'] if c.__class__ == child_class][0]
-				else:
+					if key not in self.xml_attrs.keys():
+						self.xml_attrs[key] = value
+			if additional_child_classes or not self.child_classes.items() <= B.default_child_classes.items():
+				merged_child_classes = dict(self.child_classes)
+				merged_child_classes.update(B.default_child_classes)
+				merged_child_classes.update(additional_child_classes or {})
+				self.child_classes = merged_child_classes
+			else:
+				# share the class-level dict instead of copying it per instance
+				self.child_classes = B.default_child_classes
+			self.child_index = None
+			child_classes_present = set(c.__class__ for c in self.children)
+			for (child_name, child_class) in self.child_classes.items():
+				if child_class not in child_classes_present:
 					child = child_class.__new__(child_class)
 					child.__init__()
-					self.__dict__['children'].append(child)
+					self.add_child(child)
+					child_classes_present.add(child_class)
 
-			if node is not None:
-				self.load_dict(node.attrib)
 			if 'xml_attrs' in kwargs.keys():
 				del kwargs['xml_attrs'] # might be part of kwargs
+			if 'children' in kwargs.keys():
+				del kwargs['children'] # read by the superclass
 			self.xml_attrs.update(kwargs)
 			self.tag = tag
-			
+
 		def __getattribute__(self, name):
-			if name.startswith('__'):
+			if name.startswith('__') or name in XMLObject.__slots__:
 				return A.__getattribute__(self, name)
-			elif name == 'xml_attrs':
-				try:
-					return self.__dict__['xml_attrs']
-				except KeyError:
-					return {}
-			elif name in self.xml_attrs.keys():
-				return self.xml_attrs[name]
-			elif 'child_classes' in self.__dict__.keys() and name in self.__dict__['child_classes'].keys():
-				child_class = self.child_classes[name]
-				children_of_that_class = [c for c in self.children if isinstance(c, child_class)]
+			xml_attrs = A.__getattribute__(self, 'xml_attrs')
+			if name in xml_attrs:
+				return xml_attrs[name]
+			elif name in A.__getattribute__(self, 'child_classes'):
+				child_index = A.__getattribute__(self, 'child_index') or self.index_children()
+				children_of_that_class = child_index[name]
 				if len(children_of_that_class) == 0:
 					return None
 				elif len(children_of_that_class) == 1:
@@ -321,21 +646,34 @@ def create_xml_class(name, superclass=XMLObject, tag=None, attrs=None, child_cla
 				return A.__getattribute__(self, name)
 
 		def __setattr__(self, name, value):
-			if name.startswith('__'):
+			if name == 'children' and A.__getattribute__(self, 'document_ref') is not None:
+				old_children = self.children
+				self.check_new_children(value)
 				A.__setattr__(self, name, value)
-			elif name == 'xml_attrs':
-				self.__dict__['xml_attrs'] = value
-			elif name in self.xml_attrs.keys():
-				self.xml_attrs[name] = value
-			elif 'child_classes' in self.__dict__.keys() and name in self.__dict__['child_classes'].keys():
+				A.__setattr__(self, 'child_index', None)
+				self.update_document_index(removed=old_children, added=value)
+			elif name.startswith('__') or name in XMLObject.__slots__:
+				A.__setattr__(self, name, value)
+				if name == 'children':
+					A.__setattr__(self, 'child_index', None)
+				elif name in ['xml_attrs', 'content', 'tag'] and A.__getattribute__(self, 'document_ref') is not None:
+					self.note_change()
+			elif name in self.xml_attrs:
+				xml_attrs = self.xml_attrs
+				old_value = xml_attrs[name]
+				xml_attrs[name] = value
+				if A.__getattribute__(self, 'document_ref') is not None and (old_value != value or type(old_value) is not type(value)):
+					self.note_change()
+			elif name in self.child_classes:
 				child_class = self.child_classes[name]
-				for (i, c) in enumerate(self.children):
+				child_index = self.child_index or self.index_children()
+				for c in child_index[name]:
 					if c.__class__ == child_class:
-						self.children[i] = value
+						self[self.position_of_child(c)] = value
 						break
 			else:
 				A.__setattr__(self, name, value)
-			
+
 	B.__name__ = name
 
 	return B
@@ -0,0 +1,118 @@
+import os, glob, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from lib.ggb_archive import layout_ggb_file, layout_ggb_bytes, layouted_name
+from lib.styling_logic import compile_layout
+from lib.output_cache import OutputCache
+from lib.profiling import Profiler, no_profiler
+
+
+# Batch layouting: apply one layout to many GGB files.
+# The layout file is compiled into a LayoutPlan once, in the parent
+# process, and shipped to each worker process when it starts. Workers
+# import lib (and thus build the GGB classes) once, then process files
+# one after another, so the per-file cost is only the layouting itself.
+
+# the output of a previous run
+def is_layouted(ggb_file):
+	return ggb_file.endswith('_layouted.ggb')
+
+# The GGB files in paths (files, directories or globs); directories and
+# globs leave out the outputs of previous runs. The paths that match
+# nothing are appended to unmatched (if given).
+def find_ggb_files(paths, unmatched=None):
+	ggb_files = []
+	for path in paths:
+		if os.path.isdir(path):
+			for dir_path, dir_names, file_names in os.walk(path):
+				dir_names.sort()
+				for file_name in sorted(file_names):
+					if file_name.endswith('.ggb') and not is_layouted(file_name):
+						ggb_files.append(os.path.join(dir_path, file_name))
+		elif os.path.isfile(path):
+			ggb_files.append(path)
+		else:
+			matches = sorted(glob.glob(path, recursive=True))
+			if len(matches) == 0 and unmatched is not None:
+				unmatched.append(path)
+			ggb_files += [match for match in matches if not is_layouted(match)]
+	# remove duplicates, keep order
+	return list(dict.fromkeys(ggb_files))
+
+# the result (see layout_one) for a path that matches no file
+def unmatched_result(path):
+	return {
+		'file': path,
+		'output': None,
+		'ok': False,
+		'error': 'FileNotFoundError: no file matches {}'.format(path),
+		'seconds': 0.0
+	}
+
+
+worker_layout = None
+worker_cache = None
+worker_profile = False
+worker_stream = False
+worker_fast = False
+worker_splice = False
+
+def init_worker(layout, cache_dir=None, cache_size=None, profile=False, stream=False, fast=False, splice=False):
+	global worker_layout, worker_cache, worker_profile, worker_stream, worker_fast, worker_splice
+	worker_layout = layout
+	worker_profile = profile
+	worker_stream = stream
+	worker_fast = fast
+	worker_splice = splice
+	if cache_dir is not None:
+		worker_cache = OutputCache(cache_dir, cache_size)
+
+# layout ggb_file into its output file, or with ggb_bytes (the archive
+# read by the caller) into result['archive'], for the caller to write
+def layout_one(ggb_file, ggb_bytes=None):
+	result = {
+		'file': ggb_file,
+		'output': layouted_name(ggb_file),
+		'ok': True,
+		'error': None
+	}
+	if worker_cache is not None:
+		stats_before = worker_cache.stats()
+	profiler = Profiler() if worker_profile else no_profiler
+	start = time.perf_counter()
+	try:
+		if ggb_bytes is None:
+			layout_ggb_file(ggb_file, worker_layout, result['output'], cache=worker_cache, profiler=profiler, stream=worker_stream, fast=worker_fast, splice=worker_splice)
+		else:
+			result['archive'] = layout_ggb_bytes(ggb_bytes, worker_layout, cache=worker_cache, profiler=profiler, stream=worker_stream, fast=worker_fast, splice=worker_splice)
+	except Exception as err:
+		result['ok'] = False
+		result['error'] = '{}: {}'.format(type(err).__name__, err)
+	result['seconds'] = time.perf_counter() - start
+	if worker_profile:
+		profiler.stop()
+		result['profile'] = profiler.report(file=ggb_file)
+	if worker_cache is not None:
+		result['cache'] = {key: value - stats_before[key] for (key, value) in worker_cache.stats().items()}
+	return result
+
+# Layout all GGB files found in paths (files, directories or globs)
+# with max_workers processes (default: number of CPUs), optionally
+# sharing an OutputCache in cache_dir, profiling each file and streaming
+# geogebra.xml (see streaming.py), using the ElementTree engine
+# (see etree_layout.py) or splicing the output (see splicing.py).
+# Yields one result dict per file, in order of completion (and one
+# failed result for every path that matches no file, first).
+def layout_batch(layout_file, paths, max_workers=None, cache_dir=None, cache_size=None, profile=False, stream=False, fast=False, splice=False):
+	layout = compile_layout(layout_file)
+	unmatched = []
+	ggb_files = find_ggb_files(paths, unmatched)
+	for path in unmatched:
+		yield unmatched_result(path)
+	with ProcessPoolExecutor(
+		max_workers=max_workers,
+		initializer=init_worker,
+		initargs=(layout, cache_dir, cache_size, profile, stream, fast, splice)
+	) as executor:
+		futures = [executor.submit(layout_one, ggb_file) for ggb_file in ggb_files]
+		for future in as_completed(futures):
+			yield future.result()
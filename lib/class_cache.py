@@ -0,0 +1,93 @@
+import os, sys, hashlib
+import importlib.util
+from lib.ggb_class_extractor import read_geogebra_xml, parse_geogebra_xml, extract_schema, \
+	schema_fingerprint, generate_class_code, class_module_source
+
+
+# Persistent cache for the classes extracted from GGB files (see
+# ggb_class_extractor.py). The generated code is written once per schema,
+# as a module ggb_classes_<fingerprint>.py in cache_dir, and imported
+# like any other module, so its bytecode is cached in __pycache__ too.
+# Files with a schema that has been seen before skip code generation;
+# files that have been seen before (same geogebra.xml) also skip
+# extracting the schema: the fingerprint of their schema is remembered
+# in cache_dir/schemas.
+#
+# Files are written atomically, so several processes can share one cache.
+
+class ClassCache:
+
+	def __init__(self, cache_dir):
+		self.cache_dir = cache_dir
+		self.schema_dir = os.path.join(cache_dir, 'schemas')
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(self.schema_dir, exist_ok=True)
+
+	@staticmethod
+	def module_name(fingerprint):
+		return 'ggb_classes_' + fingerprint
+
+	def module_path(self, fingerprint):
+		return os.path.join(self.cache_dir, ClassCache.module_name(fingerprint) + '.py')
+
+	def schema_path(self, xml_bytes):
+		return os.path.join(self.schema_dir, hashlib.sha256(xml_bytes).hexdigest())
+
+	# the module with the classes for a GGB file (input_name without .ggb,
+	# as for extract_classes_from_ggb_file)
+	def load(self, input_name):
+		xml_bytes = read_geogebra_xml(input_name)
+		fingerprint = self.known_fingerprint(xml_bytes)
+		if fingerprint is not None:
+			self.hits += 1
+			return self.import_module(fingerprint)
+		schema = extract_schema(parse_geogebra_xml(xml_bytes))
+		fingerprint = schema_fingerprint(schema)
+		if os.path.exists(self.module_path(fingerprint)):
+			self.hits += 1
+		else:
+			self.misses += 1
+			source = class_module_source(generate_class_code(schema))
+			ClassCache.write_atomically(self.module_path(fingerprint), source)
+		ClassCache.write_atomically(self.schema_path(xml_bytes), fingerprint)
+		return self.import_module(fingerprint)
+
+	# fingerprint of the schema of a known geogebra.xml (whose module still
+	# exists), or None
+	def known_fingerprint(self, xml_bytes):
+		try:
+			with open(self.schema_path(xml_bytes), 'r') as file:
+				fingerprint = file.read()
+		except FileNotFoundError:
+			return None
+		if not os.path.exists(self.module_path(fingerprint)):
+			return None
+		return fingerprint
+
+	def import_module(self, fingerprint):
+		name = ClassCache.module_name(fingerprint)
+		if name in sys.modules:
+			return sys.modules[name]
+		spec = importlib.util.spec_from_file_location(name, self.module_path(fingerprint))
+		module = importlib.util.module_from_spec(spec)
+		sys.modules[name] = module
+		try:
+			spec.loader.exec_module(module)
+		except:
+			del sys.modules[name]
+			raise
+		return module
+
+	@staticmethod
+	def write_atomically(path, text):
+		temp_path = '{}.{}.tmp'.format(path, os.getpid())
+		with open(temp_path, 'w') as file:
+			file.write(text)
+		os.replace(temp_path, path)
+
+	def stats(self):
+		return {
+			'hits': self.hits,
+			'misses': self.misses
+		}
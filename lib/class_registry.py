@@ -0,0 +1,69 @@
+# A registry of classes by key (tag or element type) in which a class can
+# also be declared: the function that builds it is only called on the
+# first lookup of its key, so that the classes of tags that never occur
+# are never built (which keeps the import of the class modules cheap).
+# Assigning a class to a key replaces its declaration.
+
+class ClassRegistry(dict):
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.declarations = {}
+
+	def declare(self, key, build):
+		dict.pop(self, key, None)
+		self.declarations[key] = build
+
+	def is_built(self, key):
+		return dict.__contains__(self, key)
+
+	def __missing__(self, key):
+		cls = self.declarations[key]()
+		# the build may have registered the class (under this key) itself
+		if key in self.declarations:
+			self[key] = cls
+		return dict.__getitem__(self, key)
+
+	def __setitem__(self, key, cls):
+		self.declarations.pop(key, None)
+		dict.__setitem__(self, key, cls)
+
+	def __delitem__(self, key):
+		if key not in self:
+			raise KeyError(key)
+		self.declarations.pop(key, None)
+		dict.pop(self, key, None)
+
+	def __contains__(self, key):
+		return dict.__contains__(self, key) or key in self.declarations
+
+	def get(self, key, default=None):
+		if key in self:
+			return self[key]
+		return default
+
+	def setdefault(self, key, default=None):
+		if key not in self:
+			self[key] = default
+		return self[key]
+
+	# all the keys, built or declared
+	def keys(self):
+		return list(dict.keys(self)) + list(self.declarations)
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def __len__(self):
+		return len(self.keys())
+
+	# values and items build all the declared classes
+	def values(self):
+		return [self[key] for key in self.keys()]
+
+	def items(self):
+		return [(key, self[key]) for key in self.keys()]
+
+	def build_all(self):
+		for key in list(self.declarations):
+			self[key]
@@ -1,61 +1,100 @@
 from lib import *
+from lib.class_registry import ClassRegistry
 from math import pi
+import re
 
-ggb_classes = {}
-element_classes = {}
+# tag -> GGB class and element type -> GGB class (see class_registry.py)
+ggb_classes = ClassRegistry()
+element_classes = ClassRegistry()
+
+# name -> (registry, key) of the classes that are only declared (those
+# generated from ggb.xsd)
+declared_names = {}
 
 class GGBObject(JXObject):
 
-	def __init__(self, node=None, **kwargs):
-		super(GGBObject, self).__init__(node=node, **kwargs)
+	__slots__ = ()
+
+	# children: the objects of the children of node, if they are built
+	# already (see xml2ggb_object)
+	def __init__(self, node=None, children=None, **kwargs):
+		# the node is read here, with the GGB classes for the children,
+		# not as a generic XMLObject tree first
+		super(GGBObject, self).__init__(**kwargs)
 		if node is not None:
 			self.tag = node.tag
 			self.load_dict(node.attrib, **kwargs)
-			self.content = XMLObject.parse_string(node.text)
-			self.children = [GGBObject.xml2ggb_object(child) for child in node]
-		else:
-			self.children = []
-
-
+			self.content = XMLObject.parse_content(node.text)
+			if children is None:
+				children = [GGBObject.xml2ggb_object(child) for child in node]
+		self.children = children or []
+
+	# The subtree of node is objectified bottom-up, with an explicit stack
+	# (so that any depth is fine): every node once the objects of its
+	# children are built, which are taken from the end of built.
 	@staticmethod
 	def xml2ggb_object(node):
+		built = []
+		stack = [(node, False)]
+		while len(stack) > 0:
+			node, children_built = stack.pop()
+			if not children_built:
+				stack.append((node, True))
+				stack.extend((child, False) for child in reversed(node))
+				continue
+			children = built[len(built) - len(node):]
+			del built[len(built) - len(node):]
+			ggb_class = GGBObject.class_of(node)
+			ggb_obj = ggb_class.__new__(ggb_class)
+			ggb_obj.__init__(node=node, children=children)
+			ggb_obj.load_dict(node.attrib) # __init__ does not load XML attrs for some reason
+			built.append(ggb_obj)
+		return built[0]
+
+	# the GGB class for an XML node: by element type, otherwise by tag
+	@staticmethod
+	def class_of(node):
 		try:
-			ggb_class = element_classes[node.attrib['type']]
-			#print('found element of type', node.attrib['type'])
+			return element_classes[node.attrib['type']]
 		except KeyError:
-			#print("let's try the tag instead:", node.tag)
 			try:
-				ggb_class = ggb_classes[node.tag]
+				return ggb_classes[node.tag]
 			except KeyError:
-				print("Can't create GGBObject: unknown tag", node.tag)
-				raise
-		ggb_obj = ggb_class.__new__(ggb_class)
-		ggb_obj.__init__(node=node)
-		ggb_obj.load_dict(node.attrib) # __init__ does not load XML attrs for some reason
-		return ggb_obj
+				# neither curated nor declared in ggb.xsd (see the end of
+				# this file): kept as it is, with untyped attributes
+				return create_ggb_class(node.tag[0].upper() + node.tag[1:], tag=node.tag)
 
 	def __repr__(self):
 		return self.__class__.__name__
 
 	@staticmethod
 	def attr_repr_of(xml_attrs):
-		for key, value in xml_attrs.items():
-			if type(value) == str:
-				xml_attrs[key] = GGBObject.html_string_repr(value)
-		return XMLObject.attr_repr_of(xml_attrs)
-
-
+		return XMLObject.attr_repr_of(xml_attrs, escape=GGBObject.html_string_repr)
+
+	# escapes for XML attribute values ('&' first, so that the other
+	# entities are not escaped again)
+	html_escapes = {
+		"&": "&amp;",
+		"'" : "&apos;",
+		"\n": "&#xa;",
+		"\r": "&#xd;",
+		"\t": "&#x9;",
+		"<": "&lt;",
+		">": "&gt;",
+		'"': "&quot;"
+	}
+	html_escape_pattern = re.compile('[&\'\n\r\t<>"]')
+
+	# Most values have nothing to escape and are returned after a single
+	# scan. Otherwise only the characters that occur are replaced
+	# (str.replace is much faster than str.translate on long scripts).
 	@staticmethod
 	def html_string_repr(string):
-		replacement_dict = {
-			"'" : "&apos;",
-			"\n": "&#xa;",
-			"<": "&lt;",
-			">": "&gt;",
-			'"': "&quot;"
-		}
-		for key, value in replacement_dict.items():
-			string = string.replace(key, value)
+		if GGBObject.html_escape_pattern.search(string) is None:
+			return string
+		for (char, entity) in GGBObject.html_escapes.items():
+			if char in string:
+				string = string.replace(char, entity)
 		return string
 
 
@@ -63,9 +102,10 @@ def create_ggb_class(name,
 	tag=None,
 	superclass=GGBObject,
 	attrs=None,
-	child_classes=None
+	child_classes=None,
+	attr_types=None,
+	register=True
 ):
-	global ggb_classes
 	def camel_case(string):
 		return string[0].lower() + string[1:]
 	tag = tag or camel_case(name)
@@ -75,12 +115,25 @@ def create_ggb_class(name,
 		superclass=superclass,
 		tag=tag,
 		attrs=attrs,
-		child_classes=child_classes
+		child_classes=child_classes,
+		attr_types=attr_types
 	)
 
-	ggb_classes[tag] = ggb_class
+	if register:
+		ggb_classes[tag] = ggb_class
 	return ggb_class
 
+# The classes generated from ggb.xsd (see the end of this file) are only
+# declared: a class is built on the first lookup of its tag, and its name
+# is resolved by the module's __getattr__. All the curated classes are
+# built here, and are part of `import *`.
+def __getattr__(name):
+	try:
+		registry, key = declared_names[name]
+	except KeyError:
+		raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+	return registry[key]
+
 
 AbsoluteScreenLocation = create_ggb_class('AbsoluteScreenLocation',
 	attrs={
@@ -153,6 +206,8 @@ class Color(create_ggb_class('Color',
 		'b': 0
 	})
 ):
+	__slots__ = ()
+
 	def __init__(self, *args, **kwargs):
 		super().__init__(**kwargs)
 		if len(args) == 3:
@@ -493,6 +548,10 @@ ElementLineStyle = create_ggb_class('ElementLineStyle',
 )
 
 class LineStyle(ElementLineStyle, EVLineStyle):
+	__slots__ = ()
+
+	attr_parsers = dict(EVLineStyle.attr_parsers, **ElementLineStyle.attr_parsers)
+
 	def __init__(self, node=None, **kwargs):
 		if node is None:
 			super(LineStyle, self).__init__(node=node, **kwargs)
@@ -633,23 +692,38 @@ class EuclidianView3D(create_ggb_class('EuclidianView3D',
 		'coordSystem': CoordSystem
 	}
 )):
-	
+
+	__slots__ = ()
+
+	# axes are looked up in the index of the document (see
+	# document_index.py), or among the children of a view outside one
 	@property
 	def axes(self):
-		return [c for c in self in isinstance(c, Axis)]
+		document = self.owner_document()
+		if document is None:
+			return [c for c in self if isinstance(c, Axis)]
+		return document.index.axes(self)
+
+	def axis(self, axis_id):
+		document = self.owner_document()
+		if document is None:
+			return next((c for c in self if isinstance(c, Axis) and c.id == axis_id), None)
+		return document.index.axis(self, axis_id)
 
 	@property
 	def x_axis(self):
-		return [a for a in self.axes if a.id == 0][0]
-		
+		return self.axis(0)
+
 	@property
 	def y_axis(self):
-		return [a for a in self.axes if a.id == 1][0]
+		return self.axis(1)
 
 	@property
 	def z_axis(self):
-		return [a for a in self.axes if a.id == 2][0]
+		return self.axis(2)
 
+# parsed views are instances of the subclass (see GGBObject.class_of)
+ggb_classes['euclidianView3D'] = EuclidianView3D
 
 
 
@@ -851,17 +925,30 @@ class EuclidianView(create_ggb_class('EuclidianView',
 	}
 )):
 
+	__slots__ = ()
+
 	@property
 	def axes(self):
-		return [c for c in self in isinstance(c, Axis)]
+		document = self.owner_document()
+		if document is None:
+			return [c for c in self if isinstance(c, Axis)]
+		return document.index.axes(self)
+
+	def axis(self, axis_id):
+		document = self.owner_document()
+		if document is None:
+			return next((c for c in self if isinstance(c, Axis) and c.id == axis_id), None)
+		return document.index.axis(self, axis_id)
 
 	@property
 	def x_axis(self):
-		return [a for a in self.axes if a.id == 0][0]
+		return self.axis(0)
 
 	@property
 	def y_axis(self):
-		return [a for a in self.axes if a.id == 1][0]
+		return self.axis(1)
+
+ggb_classes['euclidianView'] = EuclidianView
 
 
 Views = create_ggb_class('Views')
@@ -902,7 +989,6 @@ GUI = create_ggb_class('GUI',
 
 
 def create_element_class(name, type=None, attrs=None, child_classes=None):
-	global element_classes, ggb_classes
 	attrs = attrs or {}
 	type = type or name.lower()
 	attrs['type'] = type
@@ -1017,9 +1103,6 @@ class GeoGebra(create_ggb_class('GeoGebra',
 )):
 	def __init__(self, *args, **kwargs):
 		super().__init__(*args, **kwargs)
-		if type(self.format) == int:
-		# correct misparsed version number ('5.0' not 5)
-			self.format = str(float(self.format))
 		self.elements = [c for c in self.construction if c.tag == 'element']
 		self.layout = JSONObject()
 		self.colors = {}
@@ -1107,23 +1190,22 @@ class GeoGebra(create_ggb_class('GeoGebra',
 
 	@staticmethod
 	def strip_tex_cmd(string, tag):
-		if tag not in string:
-			return string
-		start_index = string.find('\\' + tag + '{')
-		index_behind_tag = start_index + len(tag) + 2
-		string = string[index_behind_tag:]
-		brace_count = 0
-		close_brace_index = 0
-		for (i, char) in enumerate(string):
-			if char == '{':
-				brace_count += 1
-			elif char == '}':
-				brace_count -= 1
-			if brace_count == -1:
-				close_brace_index = i
-				break
-		string = string[:close_brace_index] + string[close_brace_index + 1:]
-		return GeoGebra.strip_tex_cmd(string, tag)
+		while tag in string:
+			start_index = string.find('\\' + tag + '{')
+			index_behind_tag = start_index + len(tag) + 2
+			string = string[index_behind_tag:]
+			brace_count = 0
+			close_brace_index = 0
+			for (i, char) in enumerate(string):
+				if char == '{':
+					brace_count += 1
+				elif char == '}':
+					brace_count -= 1
+				if brace_count == -1:
+					close_brace_index = i
+					break
+			string = string[:close_brace_index] + string[close_brace_index + 1:]
+		return string
 
 	@staticmethod
 	def strip_tex(string):
@@ -1132,3 +1214,8 @@ class GeoGebra(create_ggb_class('GeoGebra',
 			return GeoGebra.strip_tex_cmd(string, 'boldsymbol')
 		else:
 			return string
+
+
+# classes generated from ggb.xsd, for the tags without a curated class
+# (see xsd_class_extractor.py)
+import lib.xsd_ggb_classes
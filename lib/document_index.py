@@ -0,0 +1,211 @@
+import weakref
+from lib import XMLObject
+
+
+# Document-level index of a GeoGebra tree: tag -> nodes, node -> parent,
+# the elements of the construction (by type and by label) and, per view,
+# axis id -> axis. Elements of macros (custom tools) have their own
+# construction and are only indexed by tag.
+#
+# The index is built once, when the root is constructed, and kept up to
+# date by the XMLObject methods that add and remove children (add_child,
+# item assignment and deletion, assigning children): every indexed node
+# refers back to the root through document_ref, a weak reference (so
+# that nodes taken out of a document do not keep it alive). The root
+# itself is not stored in the index (the children of the root have parent
+# None), so that root and index are not a reference cycle.
+#
+# A node can be in several places of one document (the same object added
+# to several views, say): parents holds its first parent, extra_parents
+# the others, and the node stays indexed until it is removed from all of
+# them. A node cannot be in two documents, as it refers to one only:
+# adding a node of another document raises ValueError (see
+# XMLObject.check_new_children).
+#
+# Changing the label, type or id of an indexed node does not update the
+# index; call rebuild() (GeoGebra.reindex) after doing so. Nodes added
+# later come last in the index, whatever their position in the document.
+#
+# Once track_changes() has been called, the index also records which
+# nodes have changed since (for the splicing writer, see splicing.py).
+
+class DocumentIndex:
+
+	# the index visits every node of the document: its slots are read and
+	# written directly, bypassing the generated __getattribute__ and
+	# __setattr__ (see create_xml_class)
+	tag_of = XMLObject.tag.__get__
+	attrs_of = XMLObject.xml_attrs.__get__
+	children_of = XMLObject.children.__get__
+	document_ref_of = XMLObject.document_ref.__get__
+	set_document_ref = XMLObject.document_ref.__set__
+
+	def __init__(self, root):
+		self.document_ref = weakref.ref(root)
+		self.changes = None
+		self.rebuild()
+
+	def rebuild(self):
+		# dicts with None values are used as ordered sets
+		self.tags = {}
+		self.parents = {}
+		self.extra_parents = {}
+		self.element_nodes = {}
+		self.types = {}
+		self.labels = {}
+		self.view_axes = {}
+		root = self.document_ref()
+		DocumentIndex.set_document_ref(root, self.document_ref)
+		for child in DocumentIndex.children_of(root):
+			self.add(root, child)
+
+	# node (with its subtree) has been added to parent
+	def add(self, parent, node):
+		stack = [(self.stored_parent(parent), node)]
+		while len(stack) > 0:
+			parent, node = stack.pop()
+			self.add_node(parent, node)
+			stack.extend((node, child) for child in reversed(DocumentIndex.children_of(node)))
+
+	# node (with its subtree) has been removed from parent
+	def remove(self, parent, node):
+		stack = [(self.stored_parent(parent), node)]
+		while len(stack) > 0:
+			parent, node = stack.pop()
+			self.remove_node(parent, node)
+			stack.extend((node, child) for child in DocumentIndex.children_of(node))
+
+	# nodes about to be added to the document
+	def check_new_nodes(self, nodes):
+		for node in nodes:
+			document_ref = DocumentIndex.document_ref_of(node)
+			if document_ref is not None and document_ref is not self.document_ref and document_ref() is not None:
+				raise ValueError('<{}> is part of another document, add a copy of it'.format(DocumentIndex.tag_of(node)))
+
+	def stored_parent(self, parent):
+		return None if parent is self.document_ref() else parent
+
+	# changes: node -> True for the nodes whose attributes or content have
+	# changed, and for the nodes added (with their subtree), and node ->
+	# False for the nodes whose children (only) have changed
+	def track_changes(self):
+		self.changes = {}
+
+	def changed(self, node, added=(), attrs=False):
+		changes = self.changes
+		if changes is None:
+			return
+		changes[node] = attrs or changes.get(node, False)
+		for child in added:
+			changes[child] = True
+
+	# the nodes on the paths from the changed nodes up to the root
+	def changed_ancestors(self):
+		ancestors = {}
+		stack = list(self.changes or ())
+		while len(stack) > 0:
+			node = stack.pop()
+			for parent in self.parents_of(node):
+				if parent is not None and parent not in ancestors:
+					ancestors[parent] = None
+					stack.append(parent)
+		if self.changes:
+			ancestors[self.document_ref()] = None
+		return ancestors
+
+	def add_node(self, parent, node):
+		DocumentIndex.set_document_ref(node, self.document_ref)
+		tag = DocumentIndex.tag_of(node)
+		self.tags.setdefault(tag, {})[node] = None
+		if node in self.parents:
+			self.extra_parents.setdefault(node, []).append(parent)
+		else:
+			self.parents[node] = parent
+		if tag == 'element' and self.is_construction(parent):
+			xml_attrs = DocumentIndex.attrs_of(node)
+			self.element_nodes[node] = None
+			self.types.setdefault(xml_attrs.get('type'), {})[node] = None
+			label = xml_attrs.get('label')
+			if label is not None:
+				self.labels.setdefault(label, node)
+		elif tag == 'axis' and parent is not None:
+			self.view_axes.setdefault(parent, {}).setdefault(DocumentIndex.attrs_of(node).get('id'), node)
+
+	def remove_node(self, parent, node):
+		extra_parents = self.extra_parents.get(node)
+		if extra_parents is not None:
+			# still in other places: only this one is dropped
+			if self.parents[node] is parent:
+				self.parents[node] = extra_parents.pop(0)
+			else:
+				del extra_parents[XMLObject.position_of(parent, extra_parents)]
+			if len(extra_parents) == 0:
+				del self.extra_parents[node]
+			if DocumentIndex.tag_of(node) == 'axis' and parent is not None and parent not in self.parents_of(node):
+				DocumentIndex.discard(self.view_axes, DocumentIndex.attrs_of(node).get('id'), node, key=parent)
+			return
+		if DocumentIndex.document_ref_of(node) is self.document_ref:
+			DocumentIndex.set_document_ref(node, None)
+		tag = DocumentIndex.tag_of(node)
+		DocumentIndex.discard(self.tags, tag, node)
+		self.parents.pop(node, None)
+		if node in self.element_nodes:
+			del self.element_nodes[node]
+			xml_attrs = DocumentIndex.attrs_of(node)
+			DocumentIndex.discard(self.types, xml_attrs.get('type'), node)
+			label = xml_attrs.get('label')
+			if self.labels.get(label) is node:
+				del self.labels[label]
+		elif tag == 'axis' and parent is not None:
+			DocumentIndex.discard(self.view_axes, DocumentIndex.attrs_of(node).get('id'), node, key=parent)
+		self.view_axes.pop(node, None)
+
+	# all the parents of node (one for each place it is in)
+	def parents_of(self, node):
+		if node not in self.parents:
+			return []
+		return [self.parents[node]] + self.extra_parents.get(node, [])
+
+	# the <construction> of the document (not that of a macro)
+	def is_construction(self, node):
+		return node is not None and DocumentIndex.tag_of(node) == 'construction' and node in self.parents and self.parents[node] is None
+
+	# remove node from the set index[key] (or, with key, from the dict
+	# index[key], where it is stored under name)
+	@staticmethod
+	def discard(index, name, node, key=None):
+		if key is None:
+			nodes = index.get(name)
+			if nodes is not None:
+				nodes.pop(node, None)
+				if len(nodes) == 0:
+					del index[name]
+			return
+		named_nodes = index.get(key)
+		if named_nodes is not None and named_nodes.get(name) is node:
+			del named_nodes[name]
+			if len(named_nodes) == 0:
+				del index[key]
+
+	def nodes(self, tag):
+		return list(self.tags.get(tag, ()))
+
+	def parent(self, node):
+		if node not in self.parents:
+			return None
+		parent = self.parents[node]
+		return self.document_ref() if parent is None else parent
+
+	def elements(self, element_type=None):
+		if element_type is None:
+			return list(self.element_nodes)
+		return list(self.types.get(element_type, ()))
+
+	def element(self, label):
+		return self.labels.get(label)
+
+	def axes(self, view):
+		return list(self.view_axes.get(view, {}).values())
+
+	def axis(self, view, axis_id):
+		return self.view_axes.get(view, {}).get(axis_id)
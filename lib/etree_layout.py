@@ -0,0 +1,213 @@
+import xml.etree.cElementTree as ET
+from xml.etree import ElementTree
+import io
+from lib.styling_logic import GeoGebra, GGBObject, XMLObject, EuclidianView3D
+
+
+# Object-free layout engine: the style rules of GeoGebra.apply_layout
+# (see styling_logic.py), applied straight to the parsed ElementTree and
+# written with ET. Only the nodes the rules touch (bgColor, axesColor,
+# evSettings, axis, caption and lineStyle) are changed; no GGB objects
+# are built.
+#
+# Which nodes are styled is decided by the same GGB classes (class_of),
+# so the result is the same as that of apply_layout. The difference is
+# that the object engine also writes the default attributes and default
+# children of every node, which are left out here: the output is that of
+# apply_layout without them (children that are added are added in the
+# same place; see benchmarks/etree_equivalence.py).
+
+class ETreeLayout:
+
+	def __init__(self, layout):
+		self.layout = layout
+		self.bg_color = ETreeLayout.xml_values(layout.new_bg_color())
+		self.axes_color = ETreeLayout.xml_values(layout.new_axes_color())
+		self.axes_show = XMLObject.value_repr(layout.axes_show)
+		# axis.positiveAxisOnly is not an attribute of Axis and not written
+		self.axis_values = {
+			'show': XMLObject.value_repr(layout.axes_show),
+			'showNumbers': XMLObject.value_repr(layout.axes_show_numbers)
+		}
+		if layout.axes_tick_style is not None:
+			self.axis_values['tickStyle'] = XMLObject.value_repr(layout.axes_tick_style)
+		self.hidden_line_style = XMLObject.value_repr(layout.hidden_line_style)
+		self.caption_format = layout.caption_format
+		# GGB class -> (styles caption, styles lineStyle)
+		self.element_rules = {}
+		# GGB class -> tags of its default children, in order
+		self.child_tags = {}
+
+	# the attributes of a node in the plan, as XML strings
+	@staticmethod
+	def xml_values(ggb_object):
+		return {
+			key: XMLObject.value_repr(value)
+			for (key, value) in ggb_object.xml_attrs.items() if value is not None
+		}
+
+	def apply(self, root):
+		# the children added by the rules
+		self.added = set()
+		has_view_3d = False
+		for child in root:
+			ggb_class = GGBObject.class_of(child)
+			if ggb_class.__name__.startswith('EuclidianView'):
+				self.style_view(child, ggb_class)
+				has_view_3d = has_view_3d or issubclass(ggb_class, EuclidianView3D)
+		if not has_view_3d:
+			# the object engine adds a (styled) default 3D view
+			view = ET.Element('euclidianView3D')
+			self.style_view(view, EuclidianView3D)
+			self.add_child(root, view, GeoGebra)
+		construction = root.find('construction')
+		if construction is not None:
+			for el in construction:
+				self.style_construction_child(el)
+		return root
+
+	def style_view(self, view, view_class):
+		self.replace_child(view, view_class, 'bgColor', self.bg_color)
+		self.find_or_add_child(view, view_class, 'evSettings').set('axes', self.axes_show)
+		# only 2D views have an axesColor
+		if 'axesColor' in view_class.default_child_classes:
+			self.replace_child(view, view_class, 'axesColor', self.axes_color)
+		for axis in view.iterfind('axis'):
+			axis.attrib.update(self.axis_values)
+
+	def style_construction_child(self, el):
+		ggb_class = GGBObject.class_of(el)
+		styles_caption, styles_line_style = self.rules_for(el, ggb_class)
+		if styles_caption:
+			caption = self.find_or_add_child(el, ggb_class, 'caption')
+			caption.set('val', self.caption_format % GeoGebra.strip_tex(caption.get('val', '%n')))
+		if styles_line_style:
+			self.find_or_add_child(el, ggb_class, 'lineStyle').set('typeHidden', self.hidden_line_style)
+
+	# which rules apply depends on the GGB class of the node, as in
+	# GeoGebra.style_construction_child
+	def rules_for(self, el, ggb_class):
+		try:
+			return self.element_rules[ggb_class]
+		except KeyError:
+			child_classes = ggb_class.default_child_classes
+			rules = (el.tag == 'element' and 'caption' in child_classes, 'lineStyle' in child_classes)
+			self.element_rules[ggb_class] = rules
+			return rules
+
+	def find_or_add_child(self, node, ggb_class, tag):
+		child = node.find(tag)
+		if child is None:
+			child = ET.Element(tag)
+			self.add_child(node, child, ggb_class)
+		return child
+
+	# like setting a named child in the object engine: the child is
+	# replaced (or added) as a whole
+	def replace_child(self, node, ggb_class, tag, values):
+		child = self.find_or_add_child(node, ggb_class, tag)
+		child.attrib.clear()
+		child.attrib.update(values)
+
+	# Add child to node (of class ggb_class) where the object engine adds
+	# a missing default child: after the children of the node, with the
+	# added children in the order of the default children of the class.
+	def add_child(self, node, child, ggb_class):
+		ETreeLayout.append_child(node, child)
+		self.added.add(child)
+		start = len(node) - 1
+		while start > 0 and node[start - 1] in self.added:
+			start -= 1
+		order = self.default_child_tags(ggb_class)
+		rank = lambda added_child: order.index(added_child.tag) if added_child.tag in order else len(order)
+		# the tails (indentation) stay where they are
+		added_children = list(node[start:])
+		tails = [added_child.tail for added_child in added_children]
+		added_children.sort(key=rank)
+		for (i, added_child) in enumerate(added_children):
+			added_child.tail = tails[i]
+			node[start + i] = added_child
+
+	# (the names of the default children are not always their tags, e.g.
+	# settings is an evSettings node)
+	def default_child_tags(self, ggb_class):
+		try:
+			return self.child_tags[ggb_class]
+		except KeyError:
+			tags = [child_class().tag for child_class in ggb_class.default_child_classes.values()]
+			self.child_tags[ggb_class] = tags
+			return tags
+
+	# append, keeping the indentation of the siblings
+	@staticmethod
+	def append_child(node, child):
+		if len(node) > 0:
+			last = node[-1]
+			child.tail = last.tail
+			last.tail = node[-2].tail if len(node) > 1 else node.text
+		node.append(child)
+
+	# ET keeps the whitespace of the input; compact drops all of it
+	@staticmethod
+	def strip_whitespace(root):
+		for node in root.iter():
+			if node.text is not None and node.text.strip() == '':
+				node.text = None
+			if node.tail is not None and node.tail.strip() == '':
+				node.tail = None
+
+	# The XML (with declaration) of a root this layout has been applied
+	# to, written by ElementTree.write
+	@staticmethod
+	def xml_bytes(root, compact=False):
+		if compact:
+			ETreeLayout.strip_whitespace(root)
+		buffer = io.BytesIO()
+		try:
+			ET.ElementTree(root).write(buffer, encoding='utf-8', xml_declaration=True)
+		except RecursionError:
+			# ET serializes recursively, which fails on deep documents
+			return ETreeLayout.deep_xml_bytes(root)
+		return buffer.getvalue()
+
+	# The same as xml_bytes, but written from an explicit stack (any depth
+	# is fine), with the namespace prefixes and escapes of ET. These are
+	# private helpers of ElementTree (tested on Python 3.11): if
+	# they are missing, the RecursionError is raised again.
+	@staticmethod
+	def deep_xml_bytes(root):
+		if not all(hasattr(ElementTree, helper) for helper in ['_namespaces', '_escape_cdata', '_escape_attrib']):
+			raise RecursionError('document too deep for ElementTree.write')
+		qnames, namespaces = ElementTree._namespaces(root)
+		escape_cdata = ElementTree._escape_cdata
+		escape_attrib = ElementTree._escape_attrib
+		parts = ["<?xml version='1.0' encoding='utf-8'?>\n"]
+		# (node, end): end is True for the end tag of a node whose
+		# children are on the stack above it
+		stack = [(root, False)]
+		while len(stack) > 0:
+			node, end = stack.pop()
+			if end:
+				parts.append('</' + qnames[node.tag] + '>')
+			elif node.tag is ET.Comment:
+				parts.append('<!--%s-->' % node.text)
+			elif node.tag is ET.ProcessingInstruction:
+				parts.append('<?%s?>' % node.text)
+			else:
+				parts.append('<' + qnames[node.tag])
+				if node is root:
+					for (uri, prefix) in sorted(namespaces.items(), key=lambda item: item[1]):
+						parts.append(' xmlns%s="%s"' % (':' + prefix if prefix else '', escape_attrib(uri)))
+				for (key, value) in node.items():
+					parts.append(' %s="%s"' % (qnames[key], escape_attrib(value)))
+				if node.text or len(node) > 0:
+					parts.append('>')
+					if node.text:
+						parts.append(escape_cdata(node.text))
+					stack.append((node, True))
+					stack.extend((child, False) for child in reversed(node))
+					continue
+				parts.append(' />')
+			if node.tail:
+				parts.append(escape_cdata(node.tail))
+		return ''.join(parts).encode('utf-8', 'xmlcharrefreplace')
@@ -0,0 +1,217 @@
+import xml.etree.cElementTree as ET
+import io, struct, zipfile
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+from lib.styling_logic import GeoGebra, compile_layout
+from lib.profiling import no_profiler
+from lib.streaming import LayoutStream
+from lib.etree_layout import ETreeLayout
+from lib.splicing import parse_with_offsets, SourceXML
+
+
+# A GGB file is a zip archive holding the construction in geogebra.xml
+# alongside thumbnails, scripts, defaults etc.
+# The helpers below work on the archive in memory: the input file is read
+# once, geogebra.xml is parsed straight from the ZipFile, and the output
+# archive is written in one go. Nothing is unzipped to disk and the
+# input file is never renamed or modified.
+
+GGB_XML = 'geogebra.xml'
+
+
+# ggb_file is the path of the archive or its bytes
+def open_ggb_file(ggb_file):
+	if type(ggb_file) == bytes:
+		return ZipFile(io.BytesIO(ggb_file), 'r')
+	with open(ggb_file, 'rb') as file:
+		data = file.read()
+	return ZipFile(io.BytesIO(data), 'r')
+
+def read_ggb_xml(ggb_file):
+	with open_ggb_file(ggb_file) as archive:
+		return archive.read(GGB_XML)
+
+# zipfile has no public way to write compressed data, so members are
+# copied through the private state of ZipFile (as in CPython 3.11 and
+# 3.13, where this was tested). If any of it is missing, the members are
+# copied as read (decompressed and compressed again).
+zipfile_internals = ['sizeFileHeader', 'stringFileHeader', 'ZIP64_LIMIT']
+source_internals = ['_lock', 'fp']
+archive_internals = ['_lock', '_seekable', 'start_dir', '_writecheck', '_didModify', 'fp', 'filelist', 'NameToInfo']
+
+def can_copy_raw(archive, source_archive):
+	return (
+		all(hasattr(zipfile, name) for name in zipfile_internals) and hasattr(ZipInfo, 'FileHeader')
+		and all(hasattr(source_archive, name) for name in source_internals)
+		and all(hasattr(archive, name) for name in archive_internals)
+	)
+
+# the compressed data of the member info, as stored in source_archive
+# (None if it cannot be copied as it is)
+def raw_member_data(source_archive, info):
+	if max(info.file_size, info.compress_size, info.header_offset) >= zipfile.ZIP64_LIMIT:
+		# (the extra field holds the Zip64 sizes of the source)
+		return None
+	with source_archive._lock:
+		source = source_archive.fp
+		source.seek(info.header_offset)
+		header = source.read(zipfile.sizeFileHeader)
+		if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+			return None
+		name_length, extra_length = struct.unpack('<HH', header[26:30])
+		source.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+		data = source.read(info.compress_size)
+	return data if len(data) == info.compress_size else None
+
+# a new ZipInfo to write the member info of a source archive with:
+# writing changes the ZipInfo it is given (offset, CRC, sizes), which
+# the source archive still reads the member with
+def new_member_info(info, compress_type):
+	new_info = ZipInfo(info.filename, info.date_time)
+	new_info.compress_type = compress_type
+	new_info.external_attr = info.external_attr
+	return new_info
+
+# copy the member info of source_archive to archive without decompressing
+# and compressing it again (or as read, if it cannot be copied as it is):
+# the entry is written as ZipFile.mkdir does
+def copy_member(archive, source_archive, info):
+	data = raw_member_data(source_archive, info) if can_copy_raw(archive, source_archive) else None
+	if data is None:
+		archive.writestr(new_member_info(info, info.compress_type), source_archive.read(info))
+		return
+	# a fresh ZipInfo: writing changes the one it was read with
+	raw_info = ZipInfo(info.filename, info.date_time)
+	for attr in ['compress_type', 'comment', 'extra', 'create_system', 'create_version', 'extract_version',
+		'internal_attr', 'external_attr', 'CRC', 'compress_size', 'file_size']:
+		setattr(raw_info, attr, getattr(info, attr))
+	# the sizes are written in the header, not in a data descriptor
+	raw_info.flag_bits = info.flag_bits & ~0x08
+	with archive._lock:
+		if archive._seekable:
+			archive.fp.seek(archive.start_dir)
+		raw_info.header_offset = archive.fp.tell()
+		archive._writecheck(raw_info)
+		archive._didModify = True
+		archive.filelist.append(raw_info)
+		archive.NameToInfo[raw_info.filename] = raw_info
+		archive.fp.write(raw_info.FileHeader(False))
+		archive.fp.write(data)
+		archive.start_dir = archive.fp.tell()
+
+# write a copy of source_archive to ggb_file, with geogebra.xml replaced
+# by xml; all other members are copied over unchanged, as they are
+# stored (compressed) in source_archive, and geogebra.xml is deflated
+# (whatever its compression in source_archive). xml is either the GeoGebra root
+# (or a LayoutStream), which is streamed straight into the zip entry, or
+# the already serialized XML as bytes
+def write_ggb_file(ggb_file, xml, source_archive, compact=False):
+	with ZipFile(ggb_file, 'w', ZIP_DEFLATED) as archive:
+		for info in source_archive.infolist():
+			if info.filename != GGB_XML:
+				copy_member(archive, source_archive, info)
+			elif type(xml) == bytes:
+				archive.writestr(new_member_info(info, ZIP_DEFLATED), xml)
+			else:
+				with io.TextIOWrapper(archive.open(new_member_info(info, ZIP_DEFLATED), 'w'), encoding='utf-8', newline='') as entry:
+					xml.write_xml(entry, compact=compact)
+
+def layouted_name(ggb_file):
+	return '.'.join(ggb_file.split('.')[:-1]) + '_layouted.ggb'
+
+# ggb_file is the path of the GGB file or the archive as bytes, and
+# output_file a path or a binary file object (required for bytes).
+# layout is either the path to a layout file (JSON) or a LayoutPlan
+# that has already been compiled with compile_layout.
+# With an OutputCache, unchanged inputs reuse the stored output (and
+# None is returned instead of the GeoGebra root).
+# With a Profiler, each phase of the pipeline is recorded.
+# With stream=True, geogebra.xml is layouted element by element while it
+# is read (see streaming.py), without building the GeoGebra tree (None is
+# returned); with a cache, the input and output XML are still held in memory.
+# With fast=True, the layout is applied straight to the ElementTree
+# (see etree_layout.py), without GGB objects (None is returned).
+# With splice=True, geogebra.xml is written as a copy of the input in
+# which only the nodes changed by the layout are serialized (see
+# splicing.py); compact does not apply.
+def layout_ggb_file(ggb_file, layout, output_file=None, compact=False, cache=None, profiler=no_profiler, stream=False, fast=False, splice=False):
+	if type(layout) == str:
+		with profiler.phase('compile_layout'):
+			layout = compile_layout(layout)
+	output_file = output_file or layouted_name(ggb_file)
+	with profiler.phase('read'):
+		source_archive = open_ggb_file(ggb_file)
+		xml_bytes = None
+		if cache is not None or fast or not stream:
+			xml_bytes = source_archive.read(GGB_XML)
+	with source_archive:
+		if cache is not None:
+			key = cache.key(xml_bytes, layout, compact=compact, fast=fast, splice=splice)
+			cached_xml = cache.get(key)
+			if cached_xml is not None:
+				with profiler.phase('write'):
+					write_ggb_file(output_file, cached_xml, source_archive)
+				return None
+		if fast:
+			with profiler.phase('parse'):
+				root = ET.fromstring(xml_bytes)
+			with profiler.phase('apply_layout'):
+				ETreeLayout(layout).apply(root)
+			with profiler.phase('serialize'):
+				layouted_xml = ETreeLayout.xml_bytes(root, compact=compact)
+			if cache is not None:
+				cache.put(key, layouted_xml)
+			with profiler.phase('write'):
+				write_ggb_file(output_file, layouted_xml, source_archive)
+			return None
+		if stream:
+			if xml_bytes is None:
+				layout_stream = LayoutStream(source_archive.open(GGB_XML), layout)
+			else:
+				layout_stream = LayoutStream(io.BytesIO(xml_bytes), layout)
+			if cache is not None:
+				with profiler.phase('stream'):
+					layouted_xml = xml_string(layout_stream, compact=compact).encode('utf-8')
+				cache.put(key, layouted_xml)
+				with profiler.phase('write'):
+					write_ggb_file(output_file, layouted_xml, source_archive)
+			else:
+				with profiler.phase('stream'):
+					write_ggb_file(output_file, layout_stream, source_archive, compact=compact)
+			return None
+		with profiler.phase('parse'):
+			if splice:
+				root, offsets = parse_with_offsets(xml_bytes)
+			else:
+				root = ET.fromstring(xml_bytes)
+		with profiler.phase('objectify'):
+			ggb_root = GeoGebra(node=root)
+			if splice:
+				source = SourceXML(xml_bytes, root, offsets, ggb_root)
+		with profiler.phase('apply_layout'):
+			ggb_root.apply_layout(layout=layout, profiler=profiler)
+		if splice or cache is not None or profiler is not no_profiler:
+			# serialize separately, to store or time it
+			with profiler.phase('serialize'):
+				if splice:
+					layouted_xml = source.spliced_xml()
+				else:
+					layouted_xml = ggb_root.xml_repr(compact=compact).encode('utf-8')
+			if cache is not None:
+				cache.put(key, layouted_xml)
+			with profiler.phase('write'):
+				write_ggb_file(output_file, layouted_xml, source_archive)
+		else:
+			write_ggb_file(output_file, ggb_root, source_archive, compact=compact)
+	return ggb_root
+
+# layout the archive ggb_bytes in memory, returns the output archive
+# (options as for layout_ggb_file)
+def layout_ggb_bytes(ggb_bytes, layout, **options):
+	output = io.BytesIO()
+	layout_ggb_file(ggb_bytes, layout, output, **options)
+	return output.getvalue()
+
+def xml_string(xml, compact=False):
+	buffer = io.StringIO()
+	xml.write_xml(buffer, compact=compact)
+	return buffer.getvalue()
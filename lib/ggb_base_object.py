@@ -6,31 +6,47 @@ element_classes = {}
 # code common to all GGB objects (representing XML tags) at any level
 class GGBObject(JXObject):
 
-	def __init__(self, node=None, **kwargs):
+	# children: the objects of the children of node, if they are built
+	# already (see xml2ggb_object)
+	def __init__(self, node=None, children=None, **kwargs):
 		super(GGBObject, self).__init__(node=node, **kwargs)
 		if node is not None:
 			self.tag = node.tag
 			self.load_dict(node.attrib, **kwargs)
 			self.content = XMLObject.parse_string(node.text)
-			self.children = [GGBObject.xml2ggb_object(child) for child in node]
-		else:
-			self.children = []
+			if children is None:
+				children = [GGBObject.xml2ggb_object(child) for child in node]
+		self.children = children or []
 
 
+	# The subtree of node is objectified bottom-up, with an explicit stack
+	# (so that any depth is fine): every node once the objects of its
+	# children are built, which are taken from the end of built.
 	@staticmethod
 	def xml2ggb_object(node):
-		try:
-			ggb_class = element_classes[node.tag]
-		except KeyError:
+		built = []
+		stack = [(node, False)]
+		while len(stack) > 0:
+			node, children_built = stack.pop()
+			if not children_built:
+				stack.append((node, True))
+				stack.extend((child, False) for child in reversed(node))
+				continue
+			children = built[len(built) - len(node):]
+			del built[len(built) - len(node):]
 			try:
-				ggb_class = ggb_classes[node.tag]
+				ggb_class = element_classes[node.tag]
 			except KeyError:
-				print("Can't create GGBObject: unknown tag", node.tag)
-				raise
-		ggb_obj = ggb_class.__new__(ggb_class)
-		ggb_obj.__init__(node=node)
-		ggb_obj.load_dict(node.attrib) # __init__ does not load XML attrs for some reason
-		return ggb_obj
+				try:
+					ggb_class = ggb_classes[node.tag]
+				except KeyError:
+					print("Can't create GGBObject: unknown tag", node.tag)
+					raise
+			ggb_obj = ggb_class.__new__(ggb_class)
+			ggb_obj.__init__(node=node, children=children)
+			ggb_obj.load_dict(node.attrib) # __init__ does not load XML attrs for some reason
+			built.append(ggb_obj)
+		return built[0]
 
 	def __repr__(self):
 		return self.__class__.__name__
@@ -1,8 +1,7 @@
 import xml.etree.cElementTree as ET
-import os, sys, shutil
+import json, hashlib
 from zipfile import ZipFile
-from collections import OrderedDict
-from functools import cmp_to_key
+from collections import Counter, deque
 
 
 # The GGB class extractor parses a GGB file (as XML) and generates
@@ -13,125 +12,159 @@ from functools import cmp_to_key
 # class, see curated_ggb_classes.py) and the Python objects then
 # saved to XML again.
 
-def attr_dict_from_xml_element(el):
-	return {el.tag: el.attrib}
-
-def attr_dict_from_node(node):
-	found_tag_attribs = attr_dict_from_xml_element(node)
-	for child in node:
-		for tag, attribs in attr_dict_from_node(child).items():
-			if tag in found_tag_attribs.keys():
-				for (attr, value) in attribs.items():
-					if attr not in found_tag_attribs[tag]:
-						found_tag_attribs[tag][attr] = value
-			else:
-				found_tag_attribs[tag] = attribs
-	return found_tag_attribs
-
-def child_tags_from_xml_element(el):
-	child_tags = [c.tag for c in el]
-	unique_child_tags = [t for t in child_tags if child_tags.count(t) == 1]
-	return {el.tag: unique_child_tags}
-
-def child_tags_from_node(node):
-	found_child_tags = child_tags_from_xml_element(node)
-	for child in node:
-		for tag, child_tags in child_tags_from_node(child).items():
-			if tag in found_child_tags.keys():
-				for child_tag in child_tags:
-					if child_tag not in found_child_tags[tag]:
-						found_child_tags[tag].append(child_tag)
-			else:
-				found_child_tags[tag] = child_tags
-	return found_child_tags
-
-
-
-
-def extract_classes_from_ggb_file(input_name):
-
+# The schema of a document is discovered in a single pass over the tree,
+# with an explicit stack (so that any depth is fine): for every tag, its
+# attributes (with the first value found as default, in document order),
+# the tags of the children that are unique in some node with that tag,
+# and the multiplicity of each child tag (the most children with that
+# tag in one node).
+def discover_schema(root):
 	tag_attr_dict = {}
 	tag_children_dict = {}
-
-	os.rename(input_name + '.ggb', input_name + '.zip')
-	ZipFile(input_name + '.zip', 'r').extractall(input_name)
-	os.rename(input_name + '.zip', input_name + '.ggb')
-
-	with open(input_name + '/geogebra.xml', 'r') as file:
-		full_text = file.read()
-	full_text = full_text.replace('&#x8;', r'\b')
-	with open(input_name + '/geogebra.xml', 'w') as file:
-		file.write(full_text)
-
-	et = ET.parse(input_name + '/geogebra.xml')
-	root = et.getroot()
-
-	tag_attribs = attr_dict_from_node(root)
-	tag_children = child_tags_from_node(root)
-
-	for tag, attribs in tag_attribs.items():
-		if tag == 'element':
+	tag_multiplicities = {}
+	stack = [root]
+	while len(stack) > 0:
+		node = stack.pop()
+		tag = node.tag
+		attribs = tag_attr_dict.setdefault(tag, {})
+		for (attr, value) in node.attrib.items():
+			attribs.setdefault(attr, value)
+		# dicts with None values are used as ordered sets
+		unique_child_tags = tag_children_dict.setdefault(tag, {})
+		multiplicities = tag_multiplicities.setdefault(tag, {})
+		if len(node) == 0:
+			# most nodes are leaves, which need no counting
 			continue
-		if tag not in tag_attr_dict.keys():
-			tag_attr_dict[tag] = attribs
-		else:
-			tag_attr_dict[tag].update(attribs)
-
-	for tag, child_tags in tag_children.items():
-		if tag not in tag_children_dict.keys():
-			tag_children_dict[tag] = child_tags
-		else:
-			tag_children_dict[tag] = list(set(tag_children_dict[tag] + child_tags))
-
-	shutil.rmtree(input_name)
-
+		for (child_tag, count) in Counter(child.tag for child in node).items():
+			if count == 1:
+				unique_child_tags[child_tag] = None
+			if count > multiplicities.get(child_tag, 0):
+				multiplicities[child_tag] = count
+		stack.extend(reversed(node))
+	tag_children_dict = {tag: list(child_tags) for (tag, child_tags) in tag_children_dict.items()}
+	return (tag_attr_dict, tag_children_dict, tag_multiplicities)
+
+
+# bumped whenever the generated code changes, so that modules generated
+# by an older version are not reused (see class_cache.py)
+generator_version = 3
+
+def read_geogebra_xml(input_name):
+	# read geogebra.xml straight from the archive, without unzipping to disk
+	with ZipFile(input_name + '.ggb', 'r') as archive:
+		xml_bytes = archive.read('geogebra.xml')
+	return xml_bytes
+
+def parse_geogebra_xml(xml_bytes):
+	full_text = xml_bytes.decode('utf-8')
+	full_text = full_text.replace('&#x8;', r'\b')
+	return ET.fromstring(full_text)
+
+# The schema the classes are generated from: tag -> attributes (except
+# for <element>, whose attributes depend on its type) and tag -> tags of
+# unique children (see discover_schema)
+def extract_schema(root):
+	tag_attr_dict, tag_children_dict, tag_multiplicities = discover_schema(root)
+	tag_attr_dict.pop('element', None)
+	return (tag_attr_dict, tag_children_dict)
+
+# Documents with the same schema get the same classes: the fingerprint
+# is a hash of the schema (tags, attribute names and child tags, in a
+# canonical order) and the generator version. The attribute values are
+# left out, as the generated code does not depend on them.
+def schema_fingerprint(schema):
+	tag_attr_dict, tag_children_dict = schema
+	canonical_schema = {
+		'generator_version': generator_version,
+		'attrs': {tag: sorted(attribs) for (tag, attribs) in tag_attr_dict.items()},
+		'children': {tag: sorted(child_tags) for (tag, child_tags) in tag_children_dict.items()}
+	}
+	encoded_schema = json.dumps(canonical_schema, sort_keys=True, separators=(',', ':')).encode('utf-8')
+	return hashlib.sha256(encoded_schema).hexdigest()
 
+def extract_classes_from_ggb_file(input_name):
+	root = parse_geogebra_xml(read_geogebra_xml(input_name))
+	return generate_class_code(extract_schema(root))
+
+# Tags of the children of tag that are declared as its child classes:
+# only children with a generated class (all tags but <geogebra> and
+# <element>, see extract_schema)
+def class_child_tags(tag, tag_attr_dict, tag_children_dict):
+	return [
+		child_tag for child_tag in tag_children_dict.get(tag, [])
+		if child_tag in tag_attr_dict and child_tag != 'geogebra'
+	]
+
+# The order in which the classes are generated: every class after the
+# classes of its children (Kahn's algorithm on the graph of child
+# classes, with ties in schema order). A cycle (a tag that is, directly
+# or indirectly, a child of itself) is broken at the first tag on it, in
+# schema order, by dropping the child classes of that tag that are not
+# declared yet. Their nodes are still read, but are not default children
+# (which would otherwise be created over and over).
+# Returns the tags in order and tag -> dropped child tags.
+def class_order(tag_attr_dict, tag_children_dict):
+	tags = [tag for tag in tag_attr_dict if tag != 'geogebra']
+	parents = {tag: [] for tag in tags}
+	missing_children = {}
+	for tag in tags:
+		child_tags = set(class_child_tags(tag, tag_attr_dict, tag_children_dict))
+		missing_children[tag] = len(child_tags)
+		for child_tag in child_tags:
+			parents[child_tag].append(tag)
+
+	ordered_tags = []
+	dropped_child_tags = {}
+	ready = deque(tag for tag in tags if missing_children[tag] == 0)
+	unordered_tags = iter(tags)
+	while len(ordered_tags) < len(tags):
+		if len(ready) == 0:
+			# a cycle: break it at the first tag that is not ordered yet
+			tag = next(tag for tag in unordered_tags if missing_children[tag] > 0)
+			dropped_child_tags[tag] = [
+				child_tag for child_tag in class_child_tags(tag, tag_attr_dict, tag_children_dict)
+				if missing_children[child_tag] > 0
+			]
+			for child_tag in dropped_child_tags[tag]:
+				parents[child_tag].remove(tag)
+			missing_children[tag] = 0
+			ready.append(tag)
+		tag = ready.popleft()
+		ordered_tags.append(tag)
+		for parent in parents[tag]:
+			missing_children[parent] -= 1
+			if missing_children[parent] == 0:
+				ready.append(parent)
+	return (ordered_tags, dropped_child_tags)
+
+# Python source of a module declaring the classes of code
+def class_module_source(code):
+	return 'from lib.ggb_base_object import create_ggb_class\n' + ''.join(code)
+
+def generate_class_code(schema):
+
+	tag_attr_dict, tag_children_dict = schema
 
 	code = []
-	element_code = []
-
-	def get_child_tags(tag):
-		try:
-			return tag_children_dict[tag2]
-		except:
-			return []
-
-	# comparator to sort the classes according to dependencies
-	def compare(tag_attr_pair1, tag_attr_pair2):
-		tag1, attr1 = tag_attr_pair1
-		tag2, attr2 = tag_attr_pair2
-		child_tags1 = get_child_tags(tag1)
-		child_tags2 = get_child_tags(tag2)
-		if tag1 in child_tags2:
-			return 1
-		elif tag2 in child_tags1:
-			return -1
-		else:
-			return 0
-
-	tag_attrs = tag_attr_dict.items()
-	sorted_tag_attrs = sorted(tag_attrs, key=cmp_to_key(compare))
-	tag_attr_dict = OrderedDict(sorted_tag_attrs)
-
-
-	for (tag, attribs) in tag_attr_dict.items():
-
-		if tag == 'geogebra':
-			continue
+	ordered_tags, dropped_child_tags = class_order(tag_attr_dict, tag_children_dict)
 
-		child_tags = get_child_tags(tag)
-		attr_dict = attribs
+	for tag in ordered_tags:
 
-		# replacements for code generation
-		for (key, value) in attr_dict.items():
-			value = value.replace('\n', '&#xa;')
-			attr_dict[key] = '"' + value + '"'
+		attribs = tag_attr_dict[tag]
+		child_tags = class_child_tags(tag, tag_attr_dict, tag_children_dict)
+		child_tags = [child_tag for child_tag in child_tags if child_tag not in dropped_child_tags.get(tag, ())]
+		# every attribute defaults to None (and is not written if it is
+		# missing from a node), so that the classes are the same for all
+		# documents with this schema, whatever their values
+		attr_dict = {key: 'None' for key in attribs}
 
 		attr_dict_string = '{\n\t\t' + ',\n\t\t'.join(["'%s': %s" % item for item in attr_dict.items()]) + '\n\t}'
 		child_tag_dict = {child_tag : child_tag.capitalize() for child_tag in child_tags}
 		child_tag_dict_string = '{\n\t\t' + ',\n\t\t'.join(["'%s': %s" % item for item in child_tag_dict.items()]) + '\n\t}'
 
 		tag_cap = tag.capitalize()
+		for child_tag in dropped_child_tags.get(tag, ()):
+			code.append("# child class {} of {} left out to break a cycle\n".format(child_tag.capitalize(), tag_cap))
 		if len(attribs) != 0:
 			if len(child_tags) > 0:
 				code.append("{} = create_ggb_class('{}',\n\ttag='{}',\n\tattrs={},\n\tchildren={}\n)\n".format(tag_cap, tag_cap, tag, attr_dict_string, child_tag_dict_string))
@@ -139,9 +172,9 @@ def extract_classes_from_ggb_file(input_name):
 				code.append("{} = create_ggb_class('{}',\n\ttag='{}',\n\tattrs={})\n".format(tag_cap, tag_cap, tag, attr_dict_string))
 		else:
 			if len(child_tags) > 0:
-				code.append("{} = create_ggb_class('{}',\n\ttag='{}',\n\tchildren={}\n)\n".format(tag_cap, tag, tag_cap, child_tag_dict_string))
+				code.append("{} = create_ggb_class('{}',\n\ttag='{}',\n\tchildren={}\n)\n".format(tag_cap, tag_cap, tag, child_tag_dict_string))
 			else:
-				code.append("{} = create_ggb_class('{}',\n\ttag='{}')\n".format(tag_cap, tag_cap, tag, attr_dict_string))
+				code.append("{} = create_ggb_class('{}',\n\ttag='{}')\n".format(tag_cap, tag_cap, tag))
 
 	return code
 
@@ -0,0 +1,103 @@
+import os, json, hashlib
+import lib
+
+
+# Content-addressed cache for layouted geogebra.xml files.
+# An output is keyed on the hash of the input geogebra.xml, the normalized
+# layout (see LayoutPlan.source), the output options (compact, fast, splice) and
+# the tool version, so re-running a layout over unchanged applets skips
+# parsing, building the GeoGebra tree and serializing it. Only geogebra.xml is cached: the
+# other members of the output archive are always copied from the input.
+#
+# Entries are plain files in cache_dir, written atomically, so several
+# (batch) processes can share one cache. When the cache grows beyond
+# max_bytes, the least recently used entries are evicted.
+
+default_max_bytes = 512 * 1024 * 1024
+
+class OutputCache:
+
+	def __init__(self, cache_dir, max_bytes=None):
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes or default_max_bytes
+		self.hits = 0
+		self.misses = 0
+		self.bytes_saved = 0
+		os.makedirs(cache_dir, exist_ok=True)
+		self.size = sum(size for (path, size, mtime) in self.entries())
+
+	def entries(self):
+		entries = []
+		for entry in os.scandir(self.cache_dir):
+			if entry.name.endswith('.xml'):
+				try:
+					stat = entry.stat()
+				except FileNotFoundError: # evicted by another process
+					continue
+				entries.append((entry.path, stat.st_size, stat.st_mtime))
+		return entries
+
+	@staticmethod
+	def key(xml_bytes, layout, compact=False, fast=False, splice=False):
+		digest = hashlib.sha256()
+		digest.update(lib.__version__.encode('utf-8') + b'\0')
+		digest.update(json.dumps(layout.source, sort_keys=True, separators=(',', ':')).encode('utf-8') + b'\0')
+		digest.update(b'compact\0' if compact else b'indented\0')
+		# the ElementTree engine writes different (but equivalent) XML
+		if fast:
+			digest.update(b'etree\0')
+		if splice:
+			digest.update(b'splice\0')
+		digest.update(xml_bytes)
+		return digest.hexdigest()
+
+	def path(self, key):
+		return os.path.join(self.cache_dir, key + '.xml')
+
+	# cached output for key, or None
+	def get(self, key):
+		path = self.path(key)
+		try:
+			with open(path, 'rb') as file:
+				xml_bytes = file.read()
+		except FileNotFoundError:
+			self.misses += 1
+			return None
+		os.utime(path) # mark as recently used
+		self.hits += 1
+		self.bytes_saved += len(xml_bytes)
+		return xml_bytes
+
+	def put(self, key, xml_bytes):
+		path = self.path(key)
+		temp_path = '{}.{}.tmp'.format(path, os.getpid())
+		with open(temp_path, 'wb') as file:
+			file.write(xml_bytes)
+		# an entry that is already there (written by another process, say)
+		# is replaced, and only counted once
+		try:
+			replaced_size = os.path.getsize(path)
+		except FileNotFoundError:
+			replaced_size = 0
+		os.replace(temp_path, path)
+		self.size += len(xml_bytes) - replaced_size
+		if self.size > self.max_bytes:
+			self.evict()
+
+	def evict(self):
+		entries = sorted(self.entries(), key=lambda entry: entry[2])
+		self.size = sum(size for (path, size, mtime) in entries)
+		while self.size > self.max_bytes and len(entries) > 0:
+			path, size, mtime = entries.pop(0)
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+			self.size -= size
+
+	def stats(self):
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'bytes_saved': self.bytes_saved
+		}
@@ -0,0 +1,140 @@
+import os, time, asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from lib.batch import find_ggb_files, init_worker, layout_one, unmatched_result
+from lib.ggb_archive import layouted_name
+from lib.styling_logic import compile_layout
+
+
+# Pipelined batch layouting, for archives on slow (e.g. network mounted)
+# storage: reading, layouting and writing overlap instead of taking turns
+# in every worker (as in batch.py). An asyncio loop drives three stages:
+#
+#   readers (io_threads)  -> read_ahead queue  -> workers (max_workers
+#   processes: parse, objectify, apply_layout, serialize)  -> write_queue
+#   -> writers (io_threads)
+#
+# The archives are read and written in a pool of io_threads threads; the
+# bounded queues keep readers from running ahead of the workers (and
+# finished archives from piling up in memory if writes are slow). The
+# report tells the time spent reading and writing, and how the worker
+# slots spent the wall time: computing, waiting for reads (starved by
+# input) or waiting for writes (blocked on output).
+
+def read_archive(ggb_file):
+	with open(ggb_file, 'rb') as file:
+		return file.read()
+
+def write_archive(output_file, archive):
+	with open(output_file, 'wb') as file:
+		file.write(archive)
+
+def failed_result(ggb_file, err):
+	return {
+		'file': ggb_file,
+		'output': layouted_name(ggb_file),
+		'ok': False,
+		'error': '{}: {}'.format(type(err).__name__, err),
+		'seconds': 0.0
+	}
+
+# Layout all GGB files found in paths (as layout_batch in batch.py),
+# calling on_result with the result dict of each file once its output is
+# written. Returns the report of the pipeline (see above).
+async def layout_batch_pipelined(layout_file, paths, on_result, max_workers=None, read_ahead=None, write_queue_size=None, io_threads=4,
+	cache_dir=None, cache_size=None, profile=False, stream=False, fast=False, splice=False):
+	layout = compile_layout(layout_file)
+	unmatched = []
+	ggb_files = iter(find_ggb_files(paths, unmatched))
+	for path in unmatched:
+		on_result(unmatched_result(path))
+	max_workers = max_workers or os.cpu_count() or 1
+	read_queue = asyncio.Queue(read_ahead or 2 * max_workers)
+	write_queue = asyncio.Queue(write_queue_size or 2 * max_workers)
+	loop = asyncio.get_running_loop()
+	report = {
+		'files': 0,
+		'workers': max_workers,
+		'io_threads': io_threads,
+		'read': 0.0,
+		'write': 0.0,
+		'compute': 0.0,
+		'waiting_for_reads': 0.0,
+		'waiting_for_writes': 0.0
+	}
+	start = time.perf_counter()
+
+	with ThreadPoolExecutor(io_threads) as io_executor, ProcessPoolExecutor(
+		max_workers=max_workers,
+		initializer=init_worker,
+		initargs=(layout, cache_dir, cache_size, profile, stream, fast, splice)
+	) as compute_executor:
+
+		async def reader():
+			for ggb_file in ggb_files:
+				read_start = time.perf_counter()
+				try:
+					job = (ggb_file, await loop.run_in_executor(io_executor, read_archive, ggb_file), None)
+				except OSError as err:
+					job = (ggb_file, None, failed_result(ggb_file, err))
+				report['read'] += time.perf_counter() - read_start
+				await read_queue.put(job)
+
+		async def worker():
+			while True:
+				wait_start = time.perf_counter()
+				job = await read_queue.get()
+				report['waiting_for_reads'] += time.perf_counter() - wait_start
+				if job is None:
+					return
+				ggb_file, ggb_bytes, result = job
+				if result is None:
+					compute_start = time.perf_counter()
+					result = await loop.run_in_executor(compute_executor, layout_one, ggb_file, ggb_bytes)
+					report['compute'] += time.perf_counter() - compute_start
+				wait_start = time.perf_counter()
+				await write_queue.put(result)
+				report['waiting_for_writes'] += time.perf_counter() - wait_start
+
+		async def writer():
+			while True:
+				result = await write_queue.get()
+				if result is None:
+					return
+				if result['ok']:
+					write_start = time.perf_counter()
+					try:
+						await loop.run_in_executor(io_executor, write_archive, result['output'], result['archive'])
+					except OSError as err:
+						result.update(failed_result(result['file'], err), seconds=result['seconds'])
+					report['write'] += time.perf_counter() - write_start
+				result.pop('archive', None)
+				report['files'] += 1
+				on_result(result)
+
+		# every stage tells the next one that it is done
+		async def read_stage():
+			await asyncio.gather(*[reader() for _ in range(io_threads)])
+			for _ in range(max_workers):
+				await read_queue.put(None)
+
+		async def compute_stage():
+			await asyncio.gather(*[worker() for _ in range(max_workers)])
+			for _ in range(io_threads):
+				await write_queue.put(None)
+
+		await asyncio.gather(read_stage(), compute_stage(), *[writer() for _ in range(io_threads)])
+
+	report['wall'] = time.perf_counter() - start
+	return report
+
+def pipeline_summary(report):
+	slot_time = report['workers'] * report['wall']
+	return '\n'.join([
+		'pipeline: {files} files in {wall:.2f} s'.format(**report),
+		'  I/O ({io_threads} threads): reading {read:.2f} s, writing {write:.2f} s'.format(**report),
+		'  {workers} workers: computing {compute:.2f} s, waiting for reads {waiting_for_reads:.2f} s, waiting for writes {waiting_for_writes:.2f} s'.format(**report),
+		'  workers busy {:.0%} of the time'.format(report['compute'] / slot_time if slot_time > 0 else 0)
+	])
+
+def layout_batch_async(layout_file, paths, on_result, **options):
+	return asyncio.run(layout_batch_pipelined(layout_file, paths, on_result, **options))
@@ -0,0 +1,118 @@
+import time, tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# Per-phase instrumentation of the layouting pipeline.
+# Each phase records wall time, CPU time and the peak traced memory
+# (tracemalloc) above the memory in use when the phase started.
+# Phases nest (e.g. the single style rules inside apply_layout), and the
+# report is a JSON-serializable tree of phases.
+
+# tracemalloc.reset_peak is new in Python 3.9. Before, the peak cannot be
+# reset, so the memory in use at the start and end of the phases is
+# taken as their peak (the peaks in between are missed).
+can_reset_peak = hasattr(tracemalloc, 'reset_peak')
+
+def traced_memory():
+	current, peak = tracemalloc.get_traced_memory()
+	return (current, peak if can_reset_peak else current)
+
+def reset_peak():
+	if can_reset_peak:
+		tracemalloc.reset_peak()
+
+class Profiler:
+
+	def __init__(self, trace_memory=True):
+		self.trace_memory = trace_memory
+		self.started_tracing = False
+		if trace_memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+			self.started_tracing = True
+		self.phases = []
+		# open phases: (record, start memory, running peak)
+		self.stack = []
+
+	@contextmanager
+	def phase(self, name):
+		record = {'name': name, 'phases': []}
+		if len(self.stack) > 0:
+			self.stack[-1][0]['phases'].append(record)
+		else:
+			self.phases.append(record)
+		self.stack.append([record, self.enter_phase(), 0])
+		start_wall, start_cpu = time.perf_counter(), time.process_time()
+		try:
+			yield record
+		finally:
+			record['wall_time'] = time.perf_counter() - start_wall
+			record['cpu_time'] = time.process_time() - start_cpu
+			record, start_memory, peak = self.stack.pop()
+			peak = self.exit_phase(peak)
+			if self.trace_memory:
+				record['peak_memory'] = max(peak - start_memory, 0)
+			if len(record['phases']) == 0:
+				del record['phases']
+
+	# tracemalloc only has one peak, so it is reset at the start and end
+	# of every phase and the enclosing phases keep a running maximum
+	def enter_phase(self):
+		if not self.trace_memory:
+			return 0
+		current, peak = traced_memory()
+		if len(self.stack) > 0:
+			self.stack[-1][2] = max(self.stack[-1][2], peak)
+		reset_peak()
+		return current
+
+	def exit_phase(self, peak):
+		if not self.trace_memory:
+			return 0
+		peak = max(peak, traced_memory()[1])
+		if len(self.stack) > 0:
+			self.stack[-1][2] = max(self.stack[-1][2], peak)
+		reset_peak()
+		return peak
+
+	def stop(self):
+		if self.started_tracing:
+			tracemalloc.stop()
+			self.started_tracing = False
+
+	def report(self, **info):
+		report = dict(info)
+		report['phases'] = self.phases
+		return report
+
+
+# stand-in when not profiling, so that the pipeline does not need to check
+class NoProfiler:
+
+	def phase(self, name):
+		return nullcontext()
+
+no_profiler = NoProfiler()
+
+
+# Sum up the reports of several files (e.g. of a batch run): wall and
+# CPU times are added up per phase, peak memory is the maximum.
+def aggregate_reports(reports):
+	aggregate = {'files': len(reports), 'phases': []}
+	def merge(phases, aggregated_phases):
+		for phase in phases:
+			matches = [p for p in aggregated_phases if p['name'] == phase['name']]
+			if len(matches) == 0:
+				aggregated = {'name': phase['name'], 'count': 0, 'wall_time': 0, 'cpu_time': 0}
+				aggregated_phases.append(aggregated)
+			else:
+				aggregated = matches[0]
+			aggregated['count'] += 1
+			aggregated['wall_time'] += phase['wall_time']
+			aggregated['cpu_time'] += phase['cpu_time']
+			if 'peak_memory' in phase:
+				aggregated['peak_memory'] = max(aggregated.get('peak_memory', 0), phase['peak_memory'])
+			if 'phases' in phase:
+				merge(phase['phases'], aggregated.setdefault('phases', []))
+	for report in reports:
+		merge(report['phases'], aggregate['phases'])
+	return aggregate
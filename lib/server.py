@@ -0,0 +1,386 @@
+import os, io, re, json, stat, time, socket, socketserver, threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from zipfile import ZipFile, BadZipFile
+import xml.etree.cElementTree as ET
+from lib.ggb_archive import GGB_XML, layout_ggb_bytes
+from lib.styling_logic import compile_layout
+from lib.curated_ggb_classes import ggb_classes, element_classes
+from lib.output_cache import OutputCache
+
+
+# Layout server: a resident process that layouts GGB files sent to it
+# over HTTP, on localhost or on a Unix socket, so that a job does not pay
+# for the interpreter startup, the GGB classes and the style sheet again:
+#
+#   POST /layout/<style sheet id>[?compact=1|stream=1|fast=1|splice=1]
+#        body: the GGB file, response: the layouted GGB file
+#   GET  /stylesheets   ids of the style sheets
+#   GET  /health        status, jobs in flight and capacity
+#   GET  /metrics       job counts, times and sizes since the start
+#
+# The style sheets are the JSON files in one directory, the id being the
+# file name without '.json'. They are compiled when the server starts,
+# and again when a file has changed; the worker processes keep the
+# compiled plans (see run_job).
+# Jobs run in a pool of max_workers processes, which build all the GGB
+# classes when they start. At most max_workers jobs run and queue_size
+# jobs wait at any time; any further job is rejected right away (503,
+# with Retry-After), so that a burst of uploads does not pile up requests
+# and memory in the server.
+
+stylesheet_id_pattern = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*$')
+
+class UnknownStylesheet(Exception):
+	pass
+
+class InvalidStylesheet(Exception):
+	pass
+
+# style sheets by id, compiled once per version of their file
+class Stylesheets:
+
+	def __init__(self, directory):
+		self.directory = directory
+		self.lock = threading.Lock()
+		# id -> (mtime, LayoutPlan)
+		self.compiled = {}
+
+	def ids(self):
+		return sorted(
+			name[:-len('.json')] for name in os.listdir(self.directory)
+			if name.endswith('.json') and stylesheet_id_pattern.match(name[:-len('.json')])
+		)
+
+	# (version, LayoutPlan) of the style sheet
+	def get(self, stylesheet_id):
+		if stylesheet_id_pattern.match(stylesheet_id) is None:
+			raise UnknownStylesheet(stylesheet_id)
+		path = os.path.join(self.directory, stylesheet_id + '.json')
+		try:
+			mtime = os.stat(path).st_mtime_ns
+		except FileNotFoundError:
+			raise UnknownStylesheet(stylesheet_id)
+		with self.lock:
+			if stylesheet_id in self.compiled and self.compiled[stylesheet_id][0] == mtime:
+				return self.compiled[stylesheet_id]
+		try:
+			layout = compile_layout(path)
+		except Exception as err:
+			raise InvalidStylesheet('invalid style sheet {}: {}'.format(stylesheet_id, err))
+		with self.lock:
+			self.compiled[stylesheet_id] = (mtime, layout)
+		return (mtime, layout)
+
+	# compile all the style sheets, returns id -> error of the invalid ones
+	def compile_all(self):
+		errors = {}
+		for stylesheet_id in self.ids():
+			try:
+				self.get(stylesheet_id)
+			except InvalidStylesheet as err:
+				errors[stylesheet_id] = str(err)
+		return errors
+
+
+# state of a worker process
+worker_layouts = {}
+worker_cache = None
+
+def init_worker(cache_dir=None, cache_size=None):
+	global worker_cache
+	# build the declared classes up front (see class_registry.py), so
+	# that the first jobs do not pay for them
+	ggb_classes.build_all()
+	element_classes.build_all()
+	if cache_dir is not None:
+		worker_cache = OutputCache(cache_dir, cache_size)
+
+def warm_up():
+	return os.getpid()
+
+# the style sheet is sent as its source and compiled again only when its
+# version has changed; returns the layouted GGB file and the time taken
+def run_job(stylesheet_id, version, layout_source, ggb_bytes, options):
+	if stylesheet_id in worker_layouts and worker_layouts[stylesheet_id][0] == version:
+		layout = worker_layouts[stylesheet_id][1]
+	else:
+		layout = compile_layout(layout_source)
+		worker_layouts[stylesheet_id] = (version, layout)
+	start = time.perf_counter()
+	output = layout_ggb_bytes(ggb_bytes, layout, cache=worker_cache, **options)
+	return (output, time.perf_counter() - start)
+
+
+class ServerBusy(Exception):
+	pass
+
+class LayoutServer:
+
+	def __init__(self, stylesheet_dir, max_workers=None, queue_size=None, job_timeout=60, max_bytes=64 * 1024 * 1024, cache_dir=None, cache_size=None):
+		self.stylesheets = Stylesheets(stylesheet_dir)
+		self.max_workers = max_workers or os.cpu_count() or 1
+		self.queue_size = self.max_workers if queue_size is None else queue_size
+		self.job_timeout = job_timeout
+		self.max_bytes = max_bytes
+		self.cache_dir = cache_dir
+		self.cache_size = cache_size
+		# one slot per job that runs or waits
+		self.slots = threading.BoundedSemaphore(self.max_workers + self.queue_size)
+		self.lock = threading.Lock()
+		self.restart_lock = threading.Lock()
+		self.started = time.time()
+		self.in_flight = 0
+		self.counts = {
+			'accepted': 0,
+			'completed': 0,
+			'failed': 0,
+			'rejected': 0,
+			'timed_out': 0,
+			'pool_restarts': 0
+		}
+		self.seconds = {'layout': 0.0, 'layout_max': 0.0, 'waiting': 0.0}
+		self.bytes = {'received': 0, 'sent': 0}
+		self.executor = self.start_pool()
+
+	def start_pool(self):
+		executor = ProcessPoolExecutor(
+			max_workers=self.max_workers,
+			initializer=init_worker,
+			initargs=(self.cache_dir, self.cache_size)
+		)
+		# start all the workers now rather than with the first jobs
+		for future in [executor.submit(warm_up) for _ in range(self.max_workers)]:
+			future.result()
+		return executor
+
+	# a worker has died (e.g. killed for its memory): the pool is broken
+	# and is replaced, the jobs in it have failed. The new pool is started
+	# and warmed up without holding self.lock (which /health and /metrics
+	# take), only one restart at a time.
+	def restart_pool(self, broken_executor):
+		with self.restart_lock:
+			if self.executor is not broken_executor:
+				return
+			broken_executor.shutdown(wait=False)
+			executor = self.start_pool()
+			with self.lock:
+				self.executor = executor
+				self.counts['pool_restarts'] += 1
+
+	# takes a slot for a job, or raises ServerBusy
+	def reserve(self):
+		if not self.slots.acquire(blocking=False):
+			with self.lock:
+				self.counts['rejected'] += 1
+			raise ServerBusy()
+		with self.lock:
+			self.in_flight += 1
+
+	def release(self, future=None):
+		with self.lock:
+			self.in_flight -= 1
+		self.slots.release()
+
+	# runs a job in a reserved slot, with a style sheet from Stylesheets.get;
+	# the slot is released when the job has finished (even after a
+	# timeout, as the worker is still busy with it).
+	# Returns the layouted GGB file.
+	def layout(self, stylesheet_id, stylesheet, ggb_bytes, options):
+		start = time.perf_counter()
+		version, layout = stylesheet
+		job = (run_job, stylesheet_id, version, layout.source, ggb_bytes, options)
+		try:
+			executor = self.executor
+			try:
+				future = executor.submit(*job)
+			except BrokenProcessPool:
+				self.restart_pool(executor)
+				executor = self.executor
+				future = executor.submit(*job)
+		except BaseException:
+			self.release()
+			raise
+		future.add_done_callback(self.release)
+		with self.lock:
+			self.counts['accepted'] += 1
+			self.bytes['received'] += len(ggb_bytes)
+		try:
+			output, layout_time = future.result(timeout=self.job_timeout)
+		except TimeoutError:
+			with self.lock:
+				self.counts['timed_out'] += 1
+			raise
+		except BrokenProcessPool:
+			with self.lock:
+				self.counts['failed'] += 1
+			self.restart_pool(executor)
+			raise
+		except BaseException:
+			with self.lock:
+				self.counts['failed'] += 1
+			raise
+		with self.lock:
+			self.counts['completed'] += 1
+			self.seconds['layout'] += layout_time
+			self.seconds['layout_max'] = max(self.seconds['layout_max'], layout_time)
+			self.seconds['waiting'] += time.perf_counter() - start - layout_time
+			self.bytes['sent'] += len(output)
+		return output
+
+	def health(self):
+		with self.lock:
+			in_flight = self.in_flight
+		capacity = self.max_workers + self.queue_size
+		return {
+			'status': 'busy' if in_flight >= capacity else 'ok',
+			'in_flight': in_flight,
+			'capacity': capacity
+		}
+
+	def metrics(self):
+		with self.lock:
+			return {
+				'uptime': time.time() - self.started,
+				'workers': self.max_workers,
+				'queue_size': self.queue_size,
+				'in_flight': self.in_flight,
+				'jobs': dict(self.counts),
+				'seconds': dict(self.seconds),
+				'bytes': dict(self.bytes),
+				'stylesheets': sorted(self.stylesheets.compiled)
+			}
+
+	def close(self):
+		self.executor.shutdown(wait=True)
+
+
+class LayoutRequestHandler(BaseHTTPRequestHandler):
+
+	protocol_version = 'HTTP/1.1'
+
+	def address_string(self):
+		# clients of a Unix socket have no address
+		return self.client_address[0] if self.client_address else 'unix'
+
+	def send(self, status, body, content_type='application/json', headers=None):
+		if type(body) != bytes:
+			body = json.dumps(body).encode('utf-8')
+		self.send_response(status)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(body)))
+		for (name, value) in (headers or {}).items():
+			self.send_header(name, value)
+		if self.close_connection:
+			self.send_header('Connection', 'close')
+		self.end_headers()
+		self.wfile.write(body)
+
+	def send_error_json(self, status, message, headers=None):
+		self.send(status, {'error': message}, headers=headers)
+
+	def do_GET(self):
+		layout_server = self.server.layout_server
+		path = urlsplit(self.path).path
+		if path == '/health':
+			self.send(200, layout_server.health())
+		elif path == '/metrics':
+			self.send(200, layout_server.metrics())
+		elif path == '/stylesheets':
+			self.send(200, layout_server.stylesheets.ids())
+		else:
+			self.send_error_json(404, 'not found')
+
+	def do_POST(self):
+		layout_server = self.server.layout_server
+		url = urlsplit(self.path)
+		if not url.path.startswith('/layout/'):
+			self.close_connection = True
+			return self.send_error_json(404, 'not found')
+		stylesheet_id = url.path[len('/layout/'):]
+		query = parse_qs(url.query)
+		options = {option: query.get(option, ['0'])[0] in ['1', 'true'] for option in ['compact', 'stream', 'fast', 'splice']}
+		try:
+			stylesheet = layout_server.stylesheets.get(stylesheet_id)
+		except UnknownStylesheet:
+			self.close_connection = True
+			return self.send_error_json(404, 'no style sheet {}'.format(stylesheet_id))
+		except InvalidStylesheet as err:
+			self.close_connection = True
+			return self.send_error_json(422, str(err))
+		length = self.headers.get('Content-Length')
+		if length is None:
+			self.close_connection = True
+			return self.send_error_json(411, 'Content-Length required')
+		try:
+			length = int(length)
+		except ValueError:
+			length = -1
+		if length < 0:
+			# the body cannot be read
+			self.close_connection = True
+			return self.send_error_json(400, 'invalid Content-Length')
+		if length > layout_server.max_bytes:
+			self.close_connection = True
+			return self.send_error_json(413, 'GGB file larger than {} bytes'.format(layout_server.max_bytes))
+		try:
+			layout_server.reserve()
+		except ServerBusy:
+			# the body is not read
+			self.close_connection = True
+			return self.send_error_json(503, 'busy', headers={'Retry-After': '1'})
+		try:
+			ggb_bytes = self.rfile.read(length)
+			with ZipFile(io.BytesIO(ggb_bytes)) as archive:
+				archive.getinfo(GGB_XML)
+		except (BadZipFile, KeyError):
+			layout_server.release()
+			return self.send_error_json(400, 'not a GGB file')
+		except BaseException:
+			layout_server.release()
+			raise
+		try:
+			output = layout_server.layout(stylesheet_id, stylesheet, ggb_bytes, options)
+		except ET.ParseError as err:
+			return self.send_error_json(400, 'invalid {}: {}'.format(GGB_XML, err))
+		except TimeoutError:
+			return self.send_error_json(504, 'layout took longer than {} s'.format(layout_server.job_timeout))
+		except Exception as err:
+			return self.send_error_json(500, '{}: {}'.format(type(err).__name__, err))
+		self.send(200, output, content_type='application/vnd.geogebra.file')
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+
+	address_family = socket.AF_UNIX
+
+	def server_bind(self):
+		# replace the socket of a previous run
+		try:
+			if stat.S_ISSOCK(os.stat(self.server_address).st_mode):
+				os.remove(self.server_address)
+		except FileNotFoundError:
+			pass
+		socketserver.TCPServer.server_bind(self)
+		self.server_name = 'localhost'
+		self.server_port = 0
+
+	def server_close(self):
+		super().server_close()
+		try:
+			os.remove(self.server_address)
+		except FileNotFoundError:
+			pass
+
+# the HTTP server for layout_server, on a Unix socket at socket_path or
+# else on host:port (port 0 picks a free port)
+def http_server(layout_server, host='127.0.0.1', port=8765, socket_path=None):
+	if socket_path is not None:
+		server = UnixHTTPServer(socket_path, LayoutRequestHandler)
+	else:
+		server = ThreadingHTTPServer((host, port), LayoutRequestHandler)
+	server.daemon_threads = True
+	server.layout_server = layout_server
+	return server
@@ -0,0 +1,282 @@
+from lib import XMLObject
+import xml.parsers.expat
+import xml.etree.cElementTree as ET
+import io
+
+
+# Splicing writer: geogebra.xml is written as a copy of its source in
+# which only the nodes that have changed since it was read are
+# serialized again. So the time to write a document grows with the
+# changes the layout makes, not with the size of the document, and
+# everything else keeps its formatting byte for byte.
+#
+# - parse_with_offsets reads the source into an ElementTree (the same as
+#   ET.fromstring) and the byte offsets of every element in it
+# - SourceXML maps the GGB objects built from that tree to the offsets,
+#   and has the document index record the changes from then on (see
+#   DocumentIndex.track_changes); the attributes of its nodes are kept
+#   in TrackedAttrs, so that changing xml_attrs in place is recorded too
+# - SourceXML.spliced_xml copies the source, except along the paths from
+#   the root to the changed nodes: a node whose attributes have changed
+#   gets a new start tag, its children are written in the same way (with
+#   the whitespace before them in the source), and nodes that are not in
+#   the source (added, or default children that have been changed) are
+#   serialized compact, with the whitespace of their siblings before them
+#
+# Unlike the tree engine, the default attributes and default children
+# that the GGB classes add are not written where nothing has changed (as
+# in the fast engine, see etree_layout.py); read back into a GeoGebra
+# tree, both outputs give the same document.
+
+# The offsets of an element (a list, in this order):
+GAP_START = 0 # the end of the previous sibling (or of the start tag of the parent)
+START = 1
+START_TAG_END = 2
+END_TAG_START = 3 # (an empty element tag <a/> has no end tag: both are END)
+END = 4
+LAST_CHILD_END = 5 # (None if the element has no children)
+
+# The tree and the offsets of its elements, in document order
+def parse_with_offsets(xml_bytes):
+	builder = ET.TreeBuilder()
+	parser = xml.parsers.expat.ParserCreate(None, '}')
+	parser.ordered_attributes = True
+	offsets = []
+	open_offsets = []
+
+	# names in a namespace as ET writes them: '{uri}name'
+	def fix_name(name):
+		return '{' + name if '}' in name else name
+
+	# the start tag of an open element ends where its content starts
+	def content_starts(*args):
+		if len(open_offsets) > 0 and open_offsets[-1][START_TAG_END] is None:
+			open_offsets[-1][START_TAG_END] = parser.CurrentByteIndex
+
+	def start(tag, attr_list):
+		content_starts()
+		if len(open_offsets) > 0:
+			parent_offsets = open_offsets[-1]
+			gap_start = parent_offsets[LAST_CHILD_END] or parent_offsets[START_TAG_END]
+		else:
+			gap_start = 0
+		element_offsets = [gap_start, parser.CurrentByteIndex, None, None, None, None]
+		offsets.append(element_offsets)
+		open_offsets.append(element_offsets)
+		builder.start(fix_name(tag), {fix_name(attr_list[i]): attr_list[i + 1] for i in range(0, len(attr_list), 2)})
+
+	def end(tag):
+		element_offsets = open_offsets.pop()
+		index = parser.CurrentByteIndex
+		if element_offsets[START_TAG_END] is None and xml_bytes[index - 2:index] == b'/>':
+			# an empty element tag ends right before the end event
+			element_offsets[START_TAG_END:END + 1] = [index, index, index]
+		else:
+			if element_offsets[START_TAG_END] is None:
+				element_offsets[START_TAG_END] = index
+			element_offsets[END_TAG_START] = index
+			element_offsets[END] = xml_bytes.index(b'>', index) + 1
+		if len(open_offsets) > 0:
+			open_offsets[-1][LAST_CHILD_END] = element_offsets[END]
+		builder.end(fix_name(tag))
+
+	def data(text):
+		content_starts()
+		builder.data(text)
+
+	parser.StartElementHandler = start
+	parser.EndElementHandler = end
+	parser.CharacterDataHandler = data
+	parser.CommentHandler = content_starts
+	parser.ProcessingInstructionHandler = content_starts
+	parser.StartCdataSectionHandler = content_starts
+	parser.Parse(xml_bytes, True)
+	return builder.close(), offsets
+
+
+# The output: copied ranges of the source (adjacent ranges are copied as
+# one) and serialized strings
+class SplicedOutput:
+
+	def __init__(self, xml_bytes):
+		self.xml_bytes = xml_bytes
+		self.parts = []
+		self.start = self.end = 0
+
+	def copy(self, start, end):
+		if start != self.end:
+			self.flush()
+			self.start = start
+		self.end = end
+
+	def write(self, string):
+		self.flush()
+		self.parts.append(string.encode('utf-8'))
+
+	def flush(self):
+		if self.end > self.start:
+			self.parts.append(self.xml_bytes[self.start:self.end])
+		self.start = self.end
+
+	def getvalue(self):
+		self.flush()
+		return b''.join(self.parts)
+
+
+# The xml_attrs of a node of a SourceXML: changing the dict in place
+# records the change in the document, as assigning attributes does (see
+# XMLObject.note_change)
+class TrackedAttrs(dict):
+
+	__slots__ = ('node',)
+
+	def __init__(self, node, xml_attrs):
+		super().__init__(xml_attrs)
+		self.node = node
+
+	# (setting a value that is already there changes nothing)
+	def __setitem__(self, key, value):
+		changed = key not in self or self[key] != value or type(self[key]) is not type(value)
+		dict.__setitem__(self, key, value)
+		if changed:
+			self.node.note_change()
+
+	def __delitem__(self, key):
+		dict.__delitem__(self, key)
+		self.node.note_change()
+
+	def __ior__(self, other):
+		self.update(other)
+		return self
+
+	def update(self, *args, **kwargs):
+		dict.update(self, *args, **kwargs)
+		self.node.note_change()
+
+	def pop(self, *args):
+		value = dict.pop(self, *args)
+		self.node.note_change()
+		return value
+
+	def popitem(self):
+		item = dict.popitem(self)
+		self.node.note_change()
+		return item
+
+	def setdefault(self, key, default=None):
+		if key not in self:
+			self[key] = default
+		return dict.__getitem__(self, key)
+
+	def clear(self):
+		dict.clear(self)
+		self.node.note_change()
+
+
+class SourceXML:
+
+	set_attrs = XMLObject.xml_attrs.__set__
+	attrs_of = XMLObject.xml_attrs.__get__
+
+	# xml_bytes, root and offsets as read by parse_with_offsets, ggb_root
+	# the GeoGebra tree built from root (GeoGebra(node=root)), before any
+	# change. The children of a node that were read from the source come
+	# first, its default children after them (see create_xml_class).
+	def __init__(self, xml_bytes, root, offsets, ggb_root):
+		self.xml_bytes = xml_bytes
+		self.ggb_root = ggb_root
+		self.offsets = {}
+		element_offsets = iter(offsets)
+		stack = [(ggb_root, root)]
+		while len(stack) > 0:
+			node, element = stack.pop()
+			self.offsets[node] = next(element_offsets)
+			stack.extend(reversed(list(zip(node.children, element))))
+		# all the nodes, also the default children (that are not in the source)
+		stack = [ggb_root]
+		while len(stack) > 0:
+			node = stack.pop()
+			SourceXML.set_attrs(node, TrackedAttrs(node, SourceXML.attrs_of(node)))
+			stack.extend(node.children)
+		ggb_root.index.track_changes()
+
+	def spliced_xml(self):
+		offsets = self.offsets
+		changes = self.ggb_root.index.changes
+		changed_ancestors = self.ggb_root.index.changed_ancestors()
+		output = SplicedOutput(self.xml_bytes)
+		root_offsets = offsets[self.ggb_root]
+		# explicit stack (any depth is fine) of nodes, source ranges
+		# (tuples) and strings, written in this order
+		stack = [(root_offsets[END], len(self.xml_bytes)), self.ggb_root, (0, root_offsets[START])]
+		while len(stack) > 0:
+			item = stack.pop()
+			if type(item) is tuple:
+				output.copy(*item)
+				continue
+			if type(item) is str:
+				output.write(item)
+				continue
+			node = item
+			node_offsets = offsets.get(node)
+			if node_offsets is None or (changes.get(node) and node.content is not None):
+				output.write(SourceXML.compact_xml(node))
+			elif node not in changes and node not in changed_ancestors:
+				output.copy(node_offsets[START], node_offsets[END])
+			else:
+				stack.extend(reversed(self.node_items(node, node_offsets, changes, changed_ancestors)))
+		return output.getvalue()
+
+	# the start tag, children and end tag of a node that is in the source
+	# and on the path to a change
+	def node_items(self, node, node_offsets, changes, changed_ancestors):
+		offsets = self.offsets
+		children_items = []
+		# the whitespace before the last child in the source, written
+		# before the nodes that are not
+		gap = None
+		last_start = -1
+		for child in node.children:
+			child_offsets = offsets.get(child)
+			if child_offsets is not None:
+				if child_offsets[START] < last_start:
+					# the children have been reordered
+					return [SourceXML.compact_xml(node)]
+				last_start = child_offsets[START]
+				gap = (child_offsets[GAP_START], child_offsets[START])
+				children_items += [gap, child]
+			elif child in changes or child in changed_ancestors:
+				if gap is None:
+					gap = self.first_gap(node)
+				if gap is not None:
+					children_items.append(gap)
+				children_items.append(child)
+
+		if changes.get(node):
+			start_tag = '<' + node.tag + node.attr_repr()
+		else:
+			start_tag = (node_offsets[START], node_offsets[START_TAG_END])
+		if node_offsets[START_TAG_END] == node_offsets[END]:
+			# an empty element tag
+			if len(children_items) == 0:
+				return [start_tag + '/>' if type(start_tag) is str else start_tag]
+			if type(start_tag) is tuple:
+				start_tag = self.xml_bytes[node_offsets[START]:node_offsets[END] - 2].decode('utf-8')
+			return [start_tag + '>'] + children_items + ['</' + node.tag + '>']
+		if type(start_tag) is str:
+			start_tag += '>'
+		content_end = node_offsets[LAST_CHILD_END] or node_offsets[START_TAG_END]
+		return [start_tag] + children_items + [(content_end, node_offsets[END_TAG_START]), (node_offsets[END_TAG_START], node_offsets[END])]
+
+	def first_gap(self, node):
+		for child in node.children:
+			child_offsets = self.offsets.get(child)
+			if child_offsets is not None:
+				return (child_offsets[GAP_START], child_offsets[START])
+		return None
+
+	@staticmethod
+	def compact_xml(node):
+		buffer = io.StringIO()
+		node.write_indented_xml(buffer, compact=True)
+		return buffer.getvalue()
@@ -0,0 +1,92 @@
+import xml.etree.cElementTree as ET
+from lib.styling_logic import GeoGebra, GGBObject, XMLObject
+
+
+# Streaming layout for huge constructions: geogebra.xml is read with
+# ET.iterparse, and every child of <construction> (elements, commands,
+# expressions) is objectified, styled and written out on its own, then
+# dropped again. The other children of <geogebra> (views, kernel, gui, ...)
+# are small and are handled as a whole, in the same way. So the memory
+# in use is bounded by the largest single subtree, not by the document.
+#
+# The output is the same as that of GeoGebra(node=root).apply_layout(...)
+# and write_xml: the same classes and style rules are used
+# (see GeoGebra.style_view and GeoGebra.style_construction_child),
+# and the default children of <geogebra> are appended at the end.
+
+class LayoutStream:
+
+	def __init__(self, source, layout):
+		# source: file name or (binary) file object of geogebra.xml
+		self.source = source
+		self.layout = layout
+
+	# same interface as XMLObject.write_xml (see ggb_archive.write_ggb_file)
+	def write_xml(self, sink, compact=False):
+		ggb_root = None
+		root_started = False
+		construction = None # <construction>, while its children are streamed
+		present_classes = set()
+		open_nodes = []
+
+		# the opening tags are written once the text before the first
+		# child is known
+		def start_root():
+			root_node = open_nodes[0]
+			ggb_root.content = XMLObject.parse_content(root_node.text)
+			sink.write(ggb_root.xml_declaration())
+			ggb_root.write_start_tag(sink, indent=0, compact=compact)
+			return True
+
+		def start_construction(construction_node):
+			construction = GGBObject.xml2ggb_object(ET.Element(construction_node.tag, construction_node.attrib))
+			construction.content = XMLObject.parse_content(construction_node.text)
+			construction.write_start_tag(sink, indent=1, compact=compact)
+			return construction
+
+		def write_root_child(child):
+			if GeoGebra.is_view(child):
+				ggb_root.style_view(child)
+			child.write_indented_xml(sink, indent=1, compact=compact)
+			present_classes.add(child.__class__)
+
+		for (event, node) in ET.iterparse(self.source, events=('start', 'end')):
+			if event == 'start':
+				if len(open_nodes) == 0:
+					# the root without its children: attributes and default children
+					ggb_root = GeoGebra(node=ET.Element(node.tag, node.attrib))
+					ggb_root.layout = self.layout
+					ggb_root.colors = self.layout.colors
+				open_nodes.append(node)
+				continue
+
+			open_nodes.pop()
+			depth = len(open_nodes)
+			if depth == 2 and open_nodes[1].tag == 'construction':
+				if not root_started:
+					root_started = start_root()
+				if construction is None:
+					construction = start_construction(open_nodes[1])
+				el = GGBObject.xml2ggb_object(node)
+				ggb_root.style_construction_child(el)
+				el.write_indented_xml(sink, indent=2, compact=compact)
+				open_nodes[1].remove(node)
+			elif depth == 1:
+				if not root_started:
+					root_started = start_root()
+				if construction is not None:
+					construction.write_end_tag(sink, indent=1, compact=compact)
+					present_classes.add(construction.__class__)
+					construction = None
+				else:
+					write_root_child(GGBObject.xml2ggb_object(node))
+				open_nodes[0].remove(node)
+			elif depth == 0:
+				if not root_started:
+					open_nodes.append(node)
+					root_started = start_root()
+				# default children, as in create_xml_class
+				for (name, child_class) in ggb_root.child_classes.items():
+					if child_class not in present_classes:
+						write_root_child(getattr(ggb_root, name))
+				ggb_root.write_end_tag(sink, indent=0, compact=compact)
@@ -1,4 +1,7 @@
 from .curated_ggb_classes import *
+import json
+from .profiling import no_profiler
+from .document_index import DocumentIndex
 
 # # # # # # # # # # # #
 # ROOT CLASS GEOGEBRA #
@@ -27,13 +30,14 @@ class GeoGebra(create_ggb_class('GeoGebra',
 )):
 	def __init__(self, *args, **kwargs):
 		super().__init__(*args, **kwargs)
-		if type(self.format) == int:
-		# correct misparsed version number ('5.0' not 5)
-			self.format = str(float(self.format))
-		self.elements = [c for c in self.construction if c.tag == 'element']
+		self.index = DocumentIndex(self)
 		self.layout = JSONObject()
 		self.colors = {}
 
+	# after changing labels, types or axis ids in place
+	def reindex(self):
+		self.index.rebuild()
+
 	def attr_repr(self):
 		attrs_with_ns = self.xml_attrs.copy()
 		attrs_with_ns['xmlns:xsi'] = 'http://www.w3.org/2001/XMLSchema-instance'
@@ -41,99 +45,135 @@ class GeoGebra(create_ggb_class('GeoGebra',
 		del attrs_with_ns['{http://www.w3.org/2001/XMLSchema-instance}noNamespaceSchemaLocation']
 		return GeoGebra.attr_repr_of(attrs_with_ns)
 
+	# queries through the document index (see document_index.py)
+	@property
+	def elements(self):
+		return self.index.elements()
+
+	def elements_of_type(self, element_type):
+		return self.index.elements(element_type)
+
+	def element(self, label):
+		return self.index.element(label)
+
 	@property
 	def euclidianViews(self):
-		return [c for c in self if c.__class__.__name__.startswith('EuclidianView')]
+		index = self.index
+		return [
+			view for tag in ('euclidianView', 'euclidianView3D')
+			for view in index.nodes(tag) if index.parent(view) is self
+		]
 
-	def apply_layout(self, filename):
-		self.layout = JSONObject(filename=filename)
-		self.colors = self.layout.color_palette.__dict__
-		self.set_bg_color(self.parse_color(self.layout.background_color))
-		self.set_caption_style()
-		self.set_hidden_line_style()
-		self.set_axes_style()
+	@staticmethod
+	def is_view(node):
+		return node.__class__.__name__.startswith('EuclidianView')
+
+	# apply a layout, given as a JSON file, as a dict or as a LayoutPlan
+	# (see compile_layout); a plan can be reused for any number of documents.
+	# With a Profiler (see profiling.py), each rule is recorded as a phase.
+	def apply_layout(self, filename=None, layout=None, profiler=no_profiler):
+		if not isinstance(layout, LayoutPlan):
+			layout = compile_layout(layout or filename)
+		self.layout = layout
+		self.colors = layout.colors
+		for rule in self.layout_rules():
+			with profiler.phase(rule.__name__):
+				rule()
+
+	def layout_rules(self):
+		return [
+			self.set_bg_color,
+			self.set_caption_style,
+			self.set_hidden_line_style,
+			self.set_axes_style
+		]
 
 	def parse_color(self, rgb_or_name):
 		if type(rgb_or_name) == str:
-			return Color(self.colors[rgb_or_name])
+			return Color(*self.colors[rgb_or_name])
 		else:
 			return Color(rgb_or_name)
 
+	# The rules apply the layout node by node (style_view and
+	# style_construction_child below), so that they can also be applied
+	# to the nodes of a document that is streamed (see streaming.py).
+
 	def set_bg_color(self, views=None):
-		views = views or self.euclidianViews # if no views specified, iterate over all EVs
-		bg_color = BGColor(self.parse_color(self.layout.background_color))
+		views = views or self.euclidianViews # if no views specified, iterate over all EVs
 		for child in views:
-			child.bgColor = bg_color
-		self.euclidianView3D.bgColor = bg_color
+			self.set_view_bg_color(child)
+		self.set_view_bg_color(self.euclidianView3D)
 
 	def set_caption_style(self):
-		use_tex = self.layout.default_caption_style.tex
-		use_bold = self.layout.default_caption_style.bold
 		for el in self.elements:
-			try:
-				caption = el.caption
-			except AttributeError:
-				caption = Caption(xml_attrs={'val': '%n'})
-				el.caption = caption
-			caption_text = GeoGebra.strip_tex(caption.val)
-			if use_tex:
-				if use_bold:
-					caption_text = r'\boldsymbol{%s}' % caption_text
-				caption_text = '$%s$' % caption_text
-			el.caption.val = caption_text
+			self.set_element_caption_style(el)
 
 	def set_hidden_line_style(self):
-		style_string = self.layout.line_style.hidden_style
-		if style_string == 'invisible':
-			style_int = 0
-		elif style_string == 'dotted':
-			style_int = 1
-		elif style_string == 'unchanged':
-			style_int = 2
-		else:
-			style_int = 2
-		# invisible, dotted or unchanged
 		for el in self.construction:
-			try:
-				el.lineStyle.typeHidden = style_int
-			except:
-				continue
+			self.set_element_hidden_line_style(el)
 
 	def set_axes_style(self):
-		# show toggle does not work properly bc of GeoGebra
 		for ev in self.euclidianViews:
-			ev.settings.axes = self.layout.axes.show
-			if ev is not self.euclidianView3D:
-				ev.axesColor = AxesColor(self.parse_color(self.layout.axes.color))
-			axes = [c for c in ev if isinstance(c, Axis)]
-			for axis in axes:
-				axis.show = self.layout.axes.show
-				if not self.layout.axes.show_ticks:
-					axis.tickStyle = 0
-				axis.showNumbers = self.layout.axes.show_numbers
-				axis.positiveAxisOnly = self.layout.axes.positive_axis_only
+			self.set_view_axes_style(ev)
+
+	def style_view(self, ev):
+		self.set_view_bg_color(ev)
+		self.set_view_axes_style(ev)
+
+	def style_construction_child(self, el):
+		if el.tag == 'element':
+			self.set_element_caption_style(el)
+		self.set_element_hidden_line_style(el)
+
+	def set_view_bg_color(self, ev):
+		ev.bgColor = self.layout.new_bg_color()
+
+	def set_element_caption_style(self, el):
+		try:
+			caption = el.caption
+		except AttributeError:
+			caption = Caption(xml_attrs={'val': '%n'})
+			el.caption = caption
+		el.caption.val = self.layout.caption_format % GeoGebra.strip_tex(caption.val)
+
+	def set_element_hidden_line_style(self, el):
+		# invisible, dotted or unchanged
+		if 'lineStyle' in el.child_classes and el.lineStyle is not None:
+			el.lineStyle.typeHidden = self.layout.hidden_line_style
+
+	def set_view_axes_style(self, ev):
+		# show toggle does not work properly bc of GeoGebra
+		layout = self.layout
+		ev.settings.axes = layout.axes_show
+		if not isinstance(ev, EuclidianView3D):
+			ev.axesColor = layout.new_axes_color()
+		for axis in ev.axes:
+			axis.show = layout.axes_show
+			if layout.axes_tick_style is not None:
+				axis.tickStyle = layout.axes_tick_style
+			axis.showNumbers = layout.axes_show_numbers
+			axis.positiveAxisOnly = layout.axes_positive_axis_only
 
 
 
 	@staticmethod
 	def strip_tex_cmd(string, tag):
-		if tag not in string:
-			return string
-		start_index = string.find('\\' + tag + '{')
-		index_behind_tag = start_index + len(tag) + 2
-		string = string[index_behind_tag:]
-		brace_count = 0
-		close_brace_index = 0
-		for (i, char) in enumerate(string):
-			if char == '{':
-				brace_count += 1
-			elif char == '}':
-				brace_count -= 1
-			if brace_count == -1:
-				close_brace_index = i
-				break
-		string = string[:close_brace_index] + string[close_brace_index + 1:]
-		return GeoGebra.strip_tex_cmd(string, tag)
+		while tag in string:
+			start_index = string.find('\\' + tag + '{')
+			index_behind_tag = start_index + len(tag) + 2
+			string = string[index_behind_tag:]
+			brace_count = 0
+			close_brace_index = 0
+			for (i, char) in enumerate(string):
+				if char == '{':
+					brace_count += 1
+				elif char == '}':
+					brace_count -= 1
+				if brace_count == -1:
+					close_brace_index = i
+					break
+			string = string[:close_brace_index] + string[close_brace_index + 1:]
+		return string
 
 	@staticmethod
 	def strip_tex(string):
@@ -141,4 +181,130 @@ class GeoGebra(create_ggb_class('GeoGebra',
 			string = string[1:-1]
 			return GeoGebra.strip_tex_cmd(string, 'boldsymbol')
 		else:
-			return string
\ No newline at end of file
+			return string
+
+
+
+# Layout keys read by the style rules above (None: no required sub-keys)
+layout_keys = {
+	'color_palette': None,
+	'background_color': None,
+	'default_caption_style': ['tex', 'bold'],
+	'line_style': ['hidden_style'],
+	'axes': ['color', 'show', 'show_ticks', 'show_numbers', 'positive_axis_only']
+}
+
+def validate_layout(layout):
+	for key, sub_keys in layout_keys.items():
+		if not hasattr(layout, key):
+			raise ValueError("layout is missing '{}'".format(key))
+		for sub_key in sub_keys or []:
+			if not hasattr(getattr(layout, key), sub_key):
+				raise ValueError("layout is missing '{}.{}'".format(key, sub_key))
+	colors = layout.color_palette.__dict__
+	for color in [layout.background_color, layout.axes.color]:
+		if type(color) == str:
+			if color not in colors.keys():
+				raise ValueError("color '{}' is not in the color palette".format(color))
+		elif type(color) != list or len(color) != 3:
+			raise ValueError('list of color values must contain 3 values')
+
+hidden_line_styles = {
+	'invisible': 0,
+	'dotted': 1,
+	'unchanged': 2
+}
+
+# A layout compiled once into the values the style rules apply:
+# colors are resolved against the palette into (r, g, b) tuples, the
+# hidden line style is mapped to its int and the caption format is fixed.
+# A plan is immutable and can be applied to any number of documents, also
+# from several threads: it only holds plain values, and every document
+# gets nodes of its own (new_bg_color, new_axes_color). It pickles as its
+# source layout, which is compiled again on unpickling.
+class LayoutPlan:
+
+	__slots__ = (
+		'source',
+		'colors',
+		'bg_color',
+		'axes_color',
+		'caption_format',
+		'hidden_line_style',
+		'axes_show',
+		'axes_tick_style',
+		'axes_show_numbers',
+		'axes_positive_axis_only'
+	)
+
+	def __init__(self, source):
+		layout = JSONObject(attr_dict=source)
+		validate_layout(layout)
+		# (the palette's __dict__ also holds its source dict, see JSONObject)
+		colors = {name: tuple(rgb) for (name, rgb) in layout.color_palette.__dict__.items() if type(rgb) == list}
+		def resolve(rgb_or_name):
+			if type(rgb_or_name) == str:
+				return colors[rgb_or_name]
+			else:
+				return tuple(rgb_or_name)
+
+		caption_format = '%s'
+		if layout.default_caption_style.tex:
+			if layout.default_caption_style.bold:
+				caption_format = r'\boldsymbol{%s}' % caption_format
+			caption_format = '$%s$' % caption_format
+
+		values = {
+			'source': source,
+			'colors': colors,
+			'bg_color': resolve(layout.background_color),
+			'axes_color': resolve(layout.axes.color),
+			'caption_format': caption_format,
+			'hidden_line_style': hidden_line_styles.get(layout.line_style.hidden_style, 2),
+			'axes_show': layout.axes.show,
+			'axes_tick_style': None if layout.axes.show_ticks else 0,
+			'axes_show_numbers': layout.axes.show_numbers,
+			'axes_positive_axis_only': layout.axes.positive_axis_only
+		}
+		for (name, value) in values.items():
+			object.__setattr__(self, name, value)
+
+	def __setattr__(self, name, value):
+		raise AttributeError('LayoutPlan is immutable')
+
+	def __delattr__(self, name):
+		raise AttributeError('LayoutPlan is immutable')
+
+	def __reduce__(self):
+		return (LayoutPlan, (self.source,))
+
+	# a new node for each view the color is set in
+	def new_bg_color(self):
+		return BGColor(*self.bg_color)
+
+	def new_axes_color(self):
+		return AxesColor(*self.axes_color)
+
+	# names of the style rules that apply differently with the plan other
+	# (see layout_rule_fields)
+	def changed_rules(self, other):
+		return [
+			rule for (rule, fields) in layout_rule_fields.items()
+			if any(getattr(self, field) != getattr(other, field) for field in fields)
+		]
+
+# the fields of a LayoutPlan that each style rule reads (see
+# GeoGebra.layout_rules)
+layout_rule_fields = {
+	'set_bg_color': ['bg_color'],
+	'set_caption_style': ['caption_format'],
+	'set_hidden_line_style': ['hidden_line_style'],
+	'set_axes_style': ['axes_show', 'axes_color', 'axes_tick_style', 'axes_show_numbers', 'axes_positive_axis_only']
+}
+
+# layout is the path to a layout file (JSON) or the layout as a dict
+def compile_layout(layout):
+	if type(layout) == str:
+		with open(layout, 'r') as file:
+			layout = json.load(file)
+	return LayoutPlan(layout)
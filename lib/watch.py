@@ -0,0 +1,201 @@
+import os, io, time
+import xml.etree.cElementTree as ET
+from zipfile import ZipFile
+from lib.batch import find_ggb_files, is_layouted
+from lib.ggb_archive import GGB_XML, layouted_name, write_ggb_file
+from lib.splicing import parse_with_offsets, SourceXML
+from lib.styling_logic import GeoGebra, compile_layout
+
+
+# Watch mode: layout a folder of GGB files, then keep the GeoGebra trees
+# and the compiled layout in memory and layout again whatever changes:
+# - a GGB file that is added or changed is read, layouted and written
+# - when the layout file changes, only the style rules that read changed
+#   values (see LayoutPlan.changed_rules) are applied again, to the trees
+#   in memory, and the documents written; a change that affects no rule
+#   writes nothing
+# The files are polled (every poll_interval seconds, with the standard
+# library only), and a burst of changes (an editor saving, a folder being
+# copied) is handled once it has settled for debounce seconds.
+# With splice, the outputs are copies of the inputs in which only what the
+# layouts have changed so far is written anew (see splicing.py).
+
+class WatchedDocument:
+
+	def __init__(self, ggb_file, stat, ggb_bytes, layout, splice=False):
+		self.ggb_file = ggb_file
+		self.stat = stat
+		self.ggb_bytes = ggb_bytes
+		self.source = None
+		with self.source_archive() as archive:
+			xml_bytes = archive.read(GGB_XML)
+		if splice:
+			root, offsets = parse_with_offsets(xml_bytes)
+			self.ggb_root = GeoGebra(node=root)
+			self.source = SourceXML(xml_bytes, root, offsets, self.ggb_root)
+		else:
+			self.ggb_root = GeoGebra(node=ET.fromstring(xml_bytes))
+		# The axes rule keeps the tick style of the applet (with
+		# show_ticks), which an earlier layout may have replaced: the
+		# attributes of the axes are kept as they are in the source, and
+		# restored before the rule is applied again.
+		self.axis_attrs = [
+			(axis, dict(axis.xml_attrs))
+			for view in self.ggb_root.euclidianViews for axis in view.axes
+		]
+		self.ggb_root.apply_layout(layout=layout)
+
+	# a fresh ZipFile for every write (writing a member changes the ZipInfo
+	# it was read with)
+	def source_archive(self):
+		return ZipFile(io.BytesIO(self.ggb_bytes), 'r')
+
+	def reapply(self, layout, rules):
+		self.ggb_root.layout = layout
+		self.ggb_root.colors = layout.colors
+		if 'set_axes_style' in rules:
+			for (axis, attrs) in self.axis_attrs:
+				axis.xml_attrs = dict(attrs)
+		for rule in rules:
+			getattr(self.ggb_root, rule)()
+
+	def write(self, compact=False):
+		xml = self.ggb_root if self.source is None else self.source.spliced_xml()
+		with self.source_archive() as archive:
+			write_ggb_file(layouted_name(self.ggb_file), xml, archive, compact=compact)
+
+
+class Watcher:
+
+	# on_update is called with a summary (dict) of every round of changes
+	def __init__(self, layout_file, paths, compact=False, splice=False, poll_interval=0.1, debounce=0.2, on_update=None):
+		self.layout_file = layout_file
+		self.paths = paths
+		self.compact = compact
+		self.splice = splice
+		self.poll_interval = poll_interval
+		self.debounce = debounce
+		self.on_update = on_update or (lambda summary: None)
+		self.layout = None
+		self.layout_stat = None
+		# GGB file -> WatchedDocument, and GGB file -> stat of the files
+		# that could not be layouted
+		self.documents = {}
+		self.failed = {}
+		self.running = False
+
+	@staticmethod
+	def file_stat(path):
+		try:
+			stat = os.stat(path)
+		except FileNotFoundError:
+			return None
+		return (stat.st_mtime_ns, stat.st_size)
+
+	# the state of the watched files: (layout file stat, GGB file -> stat)
+	def scan(self):
+		ggb_stats = {}
+		for ggb_file in find_ggb_files(self.paths):
+			# the outputs are never watched (in any kind of path), or they
+			# would be layouted again and again
+			if is_layouted(ggb_file):
+				continue
+			stat = Watcher.file_stat(ggb_file)
+			if stat is not None:
+				ggb_stats[ggb_file] = stat
+		return (Watcher.file_stat(self.layout_file), ggb_stats)
+
+	def known_stat(self, ggb_file):
+		if ggb_file in self.documents:
+			return self.documents[ggb_file].stat
+		return self.failed.get(ggb_file)
+
+	def has_changes(self, state):
+		layout_stat, ggb_stats = state
+		if layout_stat != self.layout_stat or len(ggb_stats) != len(self.documents) + len(self.failed):
+			return True
+		return any(self.known_stat(ggb_file) != stat for (ggb_file, stat) in ggb_stats.items())
+
+	# handle the changes between the documents in memory and state
+	def update(self, state):
+		start = time.perf_counter()
+		layout_stat, ggb_stats = state
+		summary = {'layouted': [], 'failed': {}, 'removed': [], 'rules': [], 'rewritten': 0}
+		if layout_stat != self.layout_stat:
+			self.layout_stat = layout_stat
+			try:
+				layout = compile_layout(self.layout_file)
+			except Exception as err:
+				summary['failed'][self.layout_file] = '{}: {}'.format(type(err).__name__, err)
+				layout = self.layout
+			if self.layout is not None and layout is not self.layout:
+				summary['rules'] = self.layout.changed_rules(layout)
+				for (ggb_file, document) in list(self.documents.items()):
+					if len(summary['rules']) == 0 or ggb_stats.get(ggb_file) != document.stat:
+						continue
+					try:
+						document.reapply(layout, summary['rules'])
+						document.write(self.compact)
+					except Exception as err:
+						summary['failed'][ggb_file] = '{}: {}'.format(type(err).__name__, err)
+						continue
+					summary['rewritten'] += 1
+			self.layout = layout
+		for ggb_file in list(self.documents) + list(self.failed):
+			if ggb_file not in ggb_stats:
+				self.documents.pop(ggb_file, None)
+				self.failed.pop(ggb_file, None)
+				summary['removed'].append(ggb_file)
+		if self.layout is not None:
+			for (ggb_file, stat) in ggb_stats.items():
+				if self.known_stat(ggb_file) == stat:
+					continue
+				try:
+					with open(ggb_file, 'rb') as file:
+						ggb_bytes = file.read()
+					document = WatchedDocument(ggb_file, stat, ggb_bytes, self.layout, self.splice)
+					document.write(self.compact)
+				except Exception as err:
+					# e.g. a file that is still being copied: kept as
+					# failed until it changes again
+					self.documents.pop(ggb_file, None)
+					self.failed[ggb_file] = stat
+					summary['failed'][ggb_file] = '{}: {}'.format(type(err).__name__, err)
+					continue
+				self.failed.pop(ggb_file, None)
+				self.documents[ggb_file] = document
+				summary['layouted'].append(ggb_file)
+		summary['seconds'] = time.perf_counter() - start
+		self.on_update(summary)
+		return summary
+
+	# poll until stop() is called (from another thread or on_update)
+	def run(self):
+		self.running = True
+		self.update(self.scan())
+		while self.running:
+			time.sleep(self.poll_interval)
+			state = self.scan()
+			if not self.has_changes(state):
+				continue
+			# debounce: wait until nothing has changed for a while
+			settled_since = time.perf_counter()
+			while self.running and time.perf_counter() - settled_since < self.debounce:
+				time.sleep(self.poll_interval)
+				new_state = self.scan()
+				if new_state != state:
+					state = new_state
+					settled_since = time.perf_counter()
+			self.update(state)
+
+	def stop(self):
+		self.running = False
+
+def watch_summary(summary):
+	lines = ['layouted {} -> {}'.format(ggb_file, layouted_name(ggb_file)) for ggb_file in summary['layouted']]
+	lines += ['FAILED   {}: {}'.format(path, error) for (path, error) in summary['failed'].items()]
+	lines += ['removed  {}'.format(ggb_file) for ggb_file in summary['removed']]
+	if len(summary['rules']) > 0:
+		lines.append('layout changed: {} applied again to {} files'.format(', '.join(summary['rules']), summary['rewritten']))
+	lines.append('({:.3f} s)'.format(summary['seconds']))
+	return '\n'.join(lines)
@@ -1,22 +1,246 @@
 # Extract classes from the XSD description of the GGB file format
-# (instead of reverse-engineering from a GGB file as is being done currently)
-# This is not yet working.
+# (ggb.xsd), ahead of time: the classes for all the tags the XSD declares
+# are generated into one module, xsd_ggb_classes.py, which is shipped
+# with the package. Its classes are declared for all tags that have no
+# curated class (see the end of curated_ggb_classes.py), so that no
+# reverse engineering (--extract_classes) is needed for them. The module
+# only holds the declarations; a class is built on the first lookup of
+# its tag.
+#
+# The module records the hash of the XSD it was generated from, and is
+# only regenerated when the XSD has changed:
+#   python -m lib.xsd_class_extractor [--check]
 
 import xml.etree.cElementTree as ET
-from lib import XMLObject
+from lib.ggb_class_extractor import class_order
+import os, sys, hashlib, argparse
 
-et = ET.parse('ggb.xsd')
-root = et.getroot()
+xs = '{http://www.w3.org/2001/XMLSchema}'
+lib_dir = os.path.dirname(os.path.abspath(__file__))
+xsd_file = os.path.join(lib_dir, 'ggb.xsd')
+module_file = os.path.join(lib_dir, 'xsd_ggb_classes.py')
 
-xs = '{http://www.w3.org/2001/XMLSchema}:'
+# Python types of the simple types. Besides the built-in ones, ggb.xsd
+# uses the types of common.xsd (which is not shipped); the enumerations
+# of GeoGebra constants (axisIds, tickStyles, ...) are numbered.
+simple_types = {
+	'xs:boolean': bool,
+	'xs:double': float,
+	'xs:int': int,
+	'xs:integer': int,
+	'xs:string': str,
+	'nonNegInt': int,
+	'positiveInt': int,
+	'javaDouble': float,
+	'axisIds': int,
+	'axisTypes': int,
+	'tickStyles': int,
+	'lineTypes': int,
+	'gridTypes': int,
+	'pointStyles': int,
+	'pointCapturings': int,
+	'rightAngleStyles': int,
+	'algebraStyles': int,
+	'angleUnits': str
+}
 
-def class_from_element(element):
-	if element.tag != xs + 'element':
-		print('Cannot create class from this tag (not an element)')
-		return
+# attributes of the complex types of common.xsd
+common_complex_types = {
+	'rgbColor': {'r': int, 'g': int, 'b': int},
+	'intVal': {'val': int},
+	'boolVal': {'val': bool},
+	'stringVal': {'val': str}
+}
 
-	class A(XMLObject):
+unbounded = float('inf')
+
+def xsd_hash(xsd_bytes):
+	return hashlib.sha256(xsd_bytes).hexdigest()
+
+
+# The schema declared by the XSD, by tag: attribute -> (type, default)
+# and child tag -> (min, max) occurrences. A tag that is declared in
+# several places (e.g. <coordSystem> in 2D and 3D views) gets the union
+# of the declarations, as there is one class per tag.
+class XSDSchema:
+
+	def __init__(self, root):
+		self.root = root
+		self.named_complex_types = {
+			complex_type.get('name'): complex_type
+			for complex_type in root.findall(xs + 'complexType')
+		}
+		self.simple_types = dict(simple_types)
+		for simple_type in root.findall(xs + 'simpleType'):
+			restriction = simple_type.find(xs + 'restriction')
+			base = restriction.get('base') if restriction is not None else 'xs:string'
+			self.simple_types[simple_type.get('name')] = simple_types.get(base, str)
+		self.attrs = {}
+		self.children = {}
+		# every declaration (global or local) is read once, without recursion
+		declarations = list(root.findall(xs + 'element'))
+		while len(declarations) > 0:
+			declarations.extend(self.read_declaration(declarations.pop(0)))
+
+	# reads a declaration <xs:element name="..."> and returns the local
+	# declarations in its content
+	def read_declaration(self, element):
+		tag = element.get('name')
+		attrs = self.attrs.setdefault(tag, {})
+		children = self.children.setdefault(tag, {})
+		type_name = element.get('type')
+		if type_name in common_complex_types:
+			for (name, attr_type) in common_complex_types[type_name].items():
+				attrs.setdefault(name, (attr_type, None))
+			return []
+		if type_name in self.named_complex_types:
+			complex_type = self.named_complex_types[type_name]
+		else:
+			complex_type = element.find(xs + 'complexType')
+		if complex_type is None:
+			return []
+		for attribute in complex_type.findall(xs + 'attribute'):
+			attrs.setdefault(attribute.get('name'), self.attribute_type_and_default(attribute))
+		local_declarations = []
+		for (child, min_occurs, max_occurs) in self.particles(complex_type):
+			child_tag = child.get('name') or child.get('ref')
+			if child.get('name') is not None:
+				local_declarations.append(child)
+			if child_tag in children:
+				known_min, known_max = children[child_tag]
+				children[child_tag] = (min(known_min, min_occurs), max(known_max, max_occurs))
+			else:
+				children[child_tag] = (min_occurs, max_occurs)
+		return local_declarations
+
+	def attribute_type_and_default(self, attribute):
+		attr_type = self.simple_types.get(attribute.get('type'), str)
+		default = attribute.get('default', attribute.get('fixed'))
+		if default is not None and attr_type is bool:
+			default = (default == 'true')
+		elif default is not None and attr_type is not str:
+			default = attr_type(default)
+		return (attr_type, default)
+
+	# the child elements of a complex type, with their occurrences: inside
+	# an optional group or a choice, every child is optional, and inside
+	# a repeated group, every child can be repeated
+	def particles(self, complex_type):
+		particles = []
+		groups = [(group, 1, 1) for group in complex_type if group.tag in [xs + 'sequence', xs + 'choice', xs + 'all']]
+		while len(groups) > 0:
+			group, group_min, group_max = groups.pop(0)
+			if group.tag == xs + 'choice':
+				group_min = 0
+			group_min *= XSDSchema.occurs(group.get('minOccurs', '1'))
+			group_max *= XSDSchema.occurs(group.get('maxOccurs', '1'))
+			for child in group:
+				if child.tag == xs + 'element':
+					min_occurs = group_min * XSDSchema.occurs(child.get('minOccurs', '1'))
+					max_occurs = group_max * XSDSchema.occurs(child.get('maxOccurs', '1'))
+					particles.append((child, min_occurs, max_occurs))
+				elif child.tag in [xs + 'sequence', xs + 'choice', xs + 'all']:
+					groups.append((child, group_min, group_max))
+		return particles
+
+	@staticmethod
+	def occurs(value):
+		return unbounded if value == 'unbounded' else int(value)
+
+	# child tags that become child classes: those that are declared and
+	# occur exactly once (these are default children, see create_xml_class)
+	def child_class_tags(self, tag):
+		return [
+			child_tag for (child_tag, (min_occurs, max_occurs)) in self.children[tag].items()
+			if child_tag in self.attrs and min_occurs == 1 and max_occurs == 1
+		]
+
+
+def class_name(tag):
+	return tag[0].upper() + tag[1:]
+
+def generate_module(xsd_bytes):
+	schema = XSDSchema(ET.fromstring(xsd_bytes))
+	tag_children_dict = {tag: schema.child_class_tags(tag) for tag in schema.attrs}
+	ordered_tags, dropped_child_tags = class_order(schema.attrs, tag_children_dict)
+	code = [
+		'# Generated by xsd_class_extractor.py from ggb.xsd, do not edit.\n',
+		'# xsd sha256: {}\n'.format(xsd_hash(xsd_bytes)),
+		'from lib.curated_ggb_classes import create_ggb_class, ggb_classes, declared_names\n',
+		'\n',
+		'# tag -> (class name, attrs, attr types, child tags)\n',
+		'xsd_declarations = {\n'
+	]
+	declarations = []
+	for tag in ordered_tags:
+		attrs = schema.attrs[tag]
+		attrs_string = '{' + ''.join(
+			"\n\t\t\t'{}': {!r},".format(name, default) for (name, (attr_type, default)) in attrs.items()
+		).rstrip(',') + ('\n\t\t}' if len(attrs) > 0 else '}')
+		typed_attrs = [(name, attr_type) for (name, (attr_type, default)) in attrs.items() if attr_type is not str]
+		attr_types_string = '{' + ''.join(
+			"\n\t\t\t'{}': {},".format(name, attr_type.__name__) for (name, attr_type) in typed_attrs
+		).rstrip(',') + ('\n\t\t}' if len(typed_attrs) > 0 else '}')
+		child_tags = [child_tag for child_tag in tag_children_dict[tag] if child_tag not in dropped_child_tags.get(tag, ())]
+		declarations.append("\t'{}': (\n\t\t'{}',\n\t\t{},\n\t\t{},\n\t\t{!r}\n\t)".format(
+			tag, class_name(tag), attrs_string, attr_types_string, child_tags))
+	code.append(',\n'.join(declarations) + '\n}\n\n')
+	code.extend([
+		'# a child is an instance of the class registered for its tag\n',
+		'def build_xsd_class(tag):\n',
+		'\tname, attrs, attr_types, child_tags = xsd_declarations[tag]\n',
+		'\treturn create_ggb_class(name,\n',
+		'\t\ttag=tag,\n',
+		'\t\tattrs=attrs,\n',
+		'\t\tattr_types=attr_types,\n',
+		'\t\tchild_classes={child_tag: ggb_classes[child_tag] for child_tag in child_tags},\n',
+		'\t\tregister=False\n',
+		'\t)\n',
+		'\n',
+		'# only declared for the tags without a curated class, and only built\n',
+		'# on the first lookup of the tag (see class_registry.py)\n',
+		'for (tag, (name, attrs, attr_types, child_tags)) in xsd_declarations.items():\n',
+		'\tif tag not in ggb_classes:\n',
+		'\t\tggb_classes.declare(tag, lambda tag=tag: build_xsd_class(tag))\n',
+		'\t\tdeclared_names.setdefault(name, (ggb_classes, tag))\n'
+	])
+	return ''.join(code)
+
+# hash of the XSD the module was generated from, or None
+def module_xsd_hash(path=module_file):
+	try:
+		with open(path, 'r') as file:
+			for line in file:
+				if line.startswith('# xsd sha256: '):
+					return line[len('# xsd sha256: '):].strip()
+	except FileNotFoundError:
 		pass
+	return None
+
+def compile_xsd(xsd_path=xsd_file, module_path=module_file, force=False):
+	with open(xsd_path, 'rb') as file:
+		xsd_bytes = file.read()
+	if not force and module_xsd_hash(module_path) == xsd_hash(xsd_bytes):
+		return False
+	source = generate_module(xsd_bytes)
+	temp_path = '{}.{}.tmp'.format(module_path, os.getpid())
+	with open(temp_path, 'w') as file:
+		file.write(source)
+	os.replace(temp_path, module_path)
+	return True
+
 
-	A.__name__ = element.attribs['name']
-	return A
\ No newline at end of file
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--check', action='store_true', help='only check that the module is up to date')
+	parser.add_argument('--force', action='store_true', help='regenerate the module even if the XSD is unchanged')
+	args = parser.parse_args()
+	if args.check:
+		with open(xsd_file, 'rb') as file:
+			up_to_date = module_xsd_hash() == xsd_hash(file.read())
+		print('xsd_ggb_classes.py is up to date' if up_to_date else 'xsd_ggb_classes.py is out of date')
+		sys.exit(0 if up_to_date else 1)
+	if compile_xsd(force=args.force):
+		print('generated xsd_ggb_classes.py')
+	else:
+		print('xsd_ggb_classes.py is up to date')
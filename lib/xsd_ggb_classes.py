@@ -0,0 +1,845 @@
+# Generated by xsd_class_extractor.py from ggb.xsd, do not edit.
+# xsd sha256: 528550706e52a80888ff6f56bb3f25ba976ccc11db52f097d57dda89917d489f
+from lib.curated_ggb_classes import create_ggb_class, ggb_classes, declared_names
+
+# tag -> (class name, attrs, attr types, child tags)
+xsd_declarations = {
+	'keyboard': (
+		'Keyboard',
+		{
+			'language': None,
+			'width': None,
+			'height': None,
+			'opacity': None,
+			'show': None
+		},
+		{
+			'width': int,
+			'height': int,
+			'opacity': float,
+			'show': bool
+		},
+		[]
+	),
+	'scripting': (
+		'Scripting',
+		{
+			'language': None,
+			'disabled': None,
+			'blocked': None
+		},
+		{
+			'disabled': bool,
+			'blocked': bool
+		},
+		[]
+	),
+	'gui': (
+		'Gui',
+		{},
+		{},
+		[]
+	),
+	'variable': (
+		'Variable',
+		{},
+		{},
+		[]
+	),
+	'show': (
+		'Show',
+		{
+			'algebraView': None,
+			'spreadsheetView': None,
+			'auxiliaryObjects': None,
+			'algebraInput': None,
+			'cmdList': None,
+			'axes': None,
+			'grid': None
+		},
+		{
+			'algebraView': bool,
+			'spreadsheetView': bool,
+			'auxiliaryObjects': bool,
+			'algebraInput': bool,
+			'cmdList': bool,
+			'axes': bool,
+			'grid': bool
+		},
+		[]
+	),
+	'splitDivider': (
+		'SplitDivider',
+		{
+			'loc': None,
+			'locVertical': None,
+			'loc2': None,
+			'locVertical2': None,
+			'horizontal': None
+		},
+		{
+			'loc': int,
+			'locVertical': int,
+			'loc2': int,
+			'locVertical2': int,
+			'horizontal': bool
+		},
+		[]
+	),
+	'toolbar': (
+		'Toolbar',
+		{
+			'str': None,
+			'help': None,
+			'show': None,
+			'items': None,
+			'position': None
+		},
+		{
+			'help': bool,
+			'show': bool,
+			'position': int
+		},
+		[]
+	),
+	'pane': (
+		'Pane',
+		{
+			'location': None,
+			'divider': None,
+			'orientation': None
+		},
+		{
+			'divider': float,
+			'orientation': int
+		},
+		[]
+	),
+	'view': (
+		'View',
+		{
+			'id': None,
+			'toolbar': None,
+			'visible': None,
+			'inframe': None,
+			'stylebar': None,
+			'location': None,
+			'size': None,
+			'window': None
+		},
+		{
+			'id': int,
+			'visible': bool,
+			'inframe': bool,
+			'stylebar': bool,
+			'size': int
+		},
+		[]
+	),
+	'size': (
+		'Size',
+		{
+			'width': None,
+			'height': None
+		},
+		{
+			'width': int,
+			'height': int
+		},
+		[]
+	),
+	'algebraView': (
+		'AlgebraView',
+		{},
+		{},
+		[]
+	),
+	'spreadsheetView': (
+		'SpreadsheetView',
+		{},
+		{},
+		[]
+	),
+	'axis': (
+		'Axis',
+		{
+			'id': None,
+			'show': None,
+			'label': None,
+			'unitLabel': None,
+			'tickStyle': None,
+			'tickDistance': None,
+			'axisCross': None,
+			'positiveAxis': None,
+			'showNumbers': None
+		},
+		{
+			'id': int,
+			'show': bool,
+			'tickStyle': int,
+			'tickDistance': float,
+			'axisCross': float,
+			'positiveAxis': bool,
+			'showNumbers': bool
+		},
+		[]
+	),
+	'kernel': (
+		'Kernel',
+		{},
+		{},
+		[]
+	),
+	'tableview': (
+		'Tableview',
+		{
+			'min': None,
+			'max': None,
+			'step': None
+		},
+		{
+			'min': float,
+			'max': float,
+			'step': float
+		},
+		[]
+	),
+	'window': (
+		'Window',
+		{
+			'width': None,
+			'height': None
+		},
+		{
+			'width': int,
+			'height': int
+		},
+		[]
+	),
+	'perspectives': (
+		'Perspectives',
+		{},
+		{},
+		[]
+	),
+	'settings': (
+		'Settings',
+		{
+			'ignoreDocument': None,
+			'showTitleBar': None,
+			'allowStyleBar': None
+		},
+		{
+			'ignoreDocument': bool,
+			'showTitleBar': bool,
+			'allowStyleBar': bool
+		},
+		[]
+	),
+	'labelingStyle': (
+		'LabelingStyle',
+		{
+			'val': None
+		},
+		{
+			'val': int
+		},
+		[]
+	),
+	'mouse': (
+		'Mouse',
+		{
+			'reverseWheel': None
+		},
+		{
+			'reverseWheel': bool
+		},
+		[]
+	),
+	'consProtColumns': (
+		'ConsProtColumns',
+		{
+			'col0': None,
+			'col1': None,
+			'col2': None,
+			'col3': None,
+			'col4': None,
+			'col5': None,
+			'col6': None,
+			'col7': None
+		},
+		{
+			'col0': bool,
+			'col1': bool,
+			'col2': bool,
+			'col3': bool,
+			'col4': bool,
+			'col5': bool,
+			'col6': bool,
+			'col7': bool
+		},
+		[]
+	),
+	'consProtocol': (
+		'ConsProtocol',
+		{
+			'useColors': None,
+			'addIcons': None,
+			'showOnlyBreakpoints': None
+		},
+		{
+			'useColors': bool,
+			'addIcons': bool,
+			'showOnlyBreakpoints': bool
+		},
+		[]
+	),
+	'consProtNavigationBar': (
+		'ConsProtNavigationBar',
+		{
+			'show': None,
+			'playButton': None,
+			'playDelay': None,
+			'protButton': None,
+			'consStep': None
+		},
+		{
+			'show': bool,
+			'playButton': bool,
+			'playDelay': float,
+			'protButton': bool,
+			'consStep': int
+		},
+		[]
+	),
+	'font': (
+		'Font',
+		{
+			'size': None
+		},
+		{
+			'size': int
+		},
+		[]
+	),
+	'menuFont': (
+		'MenuFont',
+		{
+			'size': None
+		},
+		{
+			'size': int
+		},
+		[]
+	),
+	'tooltipSettings': (
+		'TooltipSettings',
+		{
+			'timeout': None,
+			'language': None
+		},
+		{
+			'timeout': int
+		},
+		[]
+	),
+	'graphicsSettings': (
+		'GraphicsSettings',
+		{
+			'javaLatexFonts': None
+		},
+		{
+			'javaLatexFonts': bool
+		},
+		[]
+	),
+	'item': (
+		'Item',
+		{
+			'ranges': None
+		},
+		{},
+		[]
+	),
+	'panes': (
+		'Panes',
+		{},
+		{},
+		[]
+	),
+	'views': (
+		'Views',
+		{},
+		{},
+		[]
+	),
+	'input': (
+		'Input',
+		{
+			'show': None,
+			'cmd': None,
+			'top': None
+		},
+		{
+			'show': bool,
+			'cmd': bool
+		},
+		[]
+	),
+	'dockBar': (
+		'DockBar',
+		{
+			'show': None,
+			'east': None
+		},
+		{
+			'show': bool,
+			'east': bool
+		},
+		[]
+	),
+	'auxiliary': (
+		'Auxiliary',
+		{
+			'show': None
+		},
+		{
+			'show': bool
+		},
+		[]
+	),
+	'collapsed': (
+		'Collapsed',
+		{
+			'val': None
+		},
+		{},
+		[]
+	),
+	'mode': (
+		'Mode',
+		{
+			'val': None
+		},
+		{
+			'val': int
+		},
+		[]
+	),
+	'prefCellSize': (
+		'PrefCellSize',
+		{
+			'width': None,
+			'height': None
+		},
+		{
+			'width': int,
+			'height': int
+		},
+		[]
+	),
+	'spreadsheetColumn': (
+		'SpreadsheetColumn',
+		{
+			'id': None,
+			'width': None
+		},
+		{
+			'id': int,
+			'width': int
+		},
+		[]
+	),
+	'selection': (
+		'Selection',
+		{
+			'hScroll': None,
+			'vScroll': None,
+			'column': None,
+			'row': None
+		},
+		{
+			'hScroll': int,
+			'vScroll': int,
+			'column': int,
+			'row': int
+		},
+		[]
+	),
+	'layout': (
+		'Layout',
+		{
+			'showGrid': None,
+			'showFormulaBar': None,
+			'showHScrollBar': None,
+			'showVScrollBar': None,
+			'showBrowserPanel': None,
+			'showColumnHeader': None,
+			'showRowHeader': None,
+			'allowSpecialEditor': None,
+			'allowToolTips': None,
+			'equalsRequired': None
+		},
+		{
+			'showGrid': bool,
+			'showFormulaBar': bool,
+			'showHScrollBar': bool,
+			'showVScrollBar': bool,
+			'showBrowserPanel': bool,
+			'showColumnHeader': bool,
+			'showRowHeader': bool,
+			'allowSpecialEditor': bool,
+			'allowToolTips': bool,
+			'equalsRequired': bool
+		},
+		[]
+	),
+	'spreadsheetCellFormat': (
+		'SpreadsheetCellFormat',
+		{
+			'formatMap': None
+		},
+		{},
+		[]
+	),
+	'viewNumber': (
+		'ViewNumber',
+		{
+			'viewNo': None
+		},
+		{
+			'viewNo': int
+		},
+		[]
+	),
+	'coordSystem': (
+		'CoordSystem',
+		{
+			'xZero': None,
+			'yZero': None,
+			'scale': None,
+			'xscale': None,
+			'yscale': None,
+			'zZero': None,
+			'xAngle': None,
+			'zAngle': None
+		},
+		{
+			'xZero': float,
+			'yZero': float,
+			'scale': float,
+			'xscale': float,
+			'yscale': float,
+			'zZero': float,
+			'xAngle': float,
+			'zAngle': float
+		},
+		[]
+	),
+	'evSettings': (
+		'EvSettings',
+		{
+			'axes': None,
+			'grid': None,
+			'gridIsBold': None,
+			'pointCapturing': None,
+			'pointStyle': None,
+			'rightAngleStyle': None,
+			'checkboxSize': None,
+			'gridType': None
+		},
+		{
+			'axes': bool,
+			'grid': bool,
+			'gridIsBold': bool,
+			'pointCapturing': int,
+			'pointStyle': int,
+			'rightAngleStyle': int,
+			'checkboxSize': int,
+			'gridType': int
+		},
+		[]
+	),
+	'bgColor': (
+		'BgColor',
+		{
+			'r': None,
+			'g': None,
+			'b': None
+		},
+		{
+			'r': int,
+			'g': int,
+			'b': int
+		},
+		[]
+	),
+	'axesColor': (
+		'AxesColor',
+		{
+			'r': None,
+			'g': None,
+			'b': None
+		},
+		{
+			'r': int,
+			'g': int,
+			'b': int
+		},
+		[]
+	),
+	'gridColor': (
+		'GridColor',
+		{
+			'r': None,
+			'g': None,
+			'b': None
+		},
+		{
+			'r': int,
+			'g': int,
+			'b': int
+		},
+		[]
+	),
+	'lineStyle': (
+		'LineStyle',
+		{
+			'axes': None,
+			'grid': None
+		},
+		{
+			'axes': int,
+			'grid': int
+		},
+		[]
+	),
+	'grid': (
+		'Grid',
+		{
+			'distX': None,
+			'distY': None,
+			'distTheta': None,
+			'show': None
+		},
+		{
+			'distX': float,
+			'distY': float,
+			'distTheta': float,
+			'show': bool
+		},
+		[]
+	),
+	'plate': (
+		'Plate',
+		{
+			'show': None
+		},
+		{
+			'show': bool
+		},
+		[]
+	),
+	'clipping': (
+		'Clipping',
+		{
+			'use': None,
+			'show': None,
+			'size': None
+		},
+		{
+			'use': bool,
+			'show': bool,
+			'size': int
+		},
+		[]
+	),
+	'projection': (
+		'Projection',
+		{
+			'type': None,
+			'distance': None,
+			'separation': None,
+			'obliqueAngle': None,
+			'obliqueFactor': None
+		},
+		{
+			'type': int,
+			'distance': int,
+			'separation': int,
+			'obliqueAngle': float,
+			'obliqueFactor': float
+		},
+		[]
+	),
+	'uses3D': (
+		'Uses3D',
+		{
+			'val': None
+		},
+		{
+			'val': bool
+		},
+		[]
+	),
+	'continuous': (
+		'Continuous',
+		{
+			'val': None
+		},
+		{
+			'val': bool
+		},
+		[]
+	),
+	'usePathAndRegionParameters': (
+		'UsePathAndRegionParameters',
+		{
+			'val': None
+		},
+		{},
+		[]
+	),
+	'decimals': (
+		'Decimals',
+		{
+			'val': None
+		},
+		{
+			'val': int
+		},
+		[]
+	),
+	'significantFigures': (
+		'SignificantFigures',
+		{
+			'val': None
+		},
+		{
+			'val': int
+		},
+		[]
+	),
+	'angleUnit': (
+		'AngleUnit',
+		{
+			'val': None
+		},
+		{},
+		[]
+	),
+	'algebraStyle': (
+		'AlgebraStyle',
+		{
+			'val': None,
+			'spreadsheet': None
+		},
+		{
+			'val': int,
+			'spreadsheet': int
+		},
+		[]
+	),
+	'coordStyle': (
+		'CoordStyle',
+		{
+			'val': None
+		},
+		{
+			'val': int
+		},
+		[]
+	),
+	'startAnimation': (
+		'StartAnimation',
+		{
+			'val': None
+		},
+		{
+			'val': bool
+		},
+		[]
+	),
+	'angleFromInvTrig': (
+		'AngleFromInvTrig',
+		{
+			'val': None
+		},
+		{
+			'val': bool
+		},
+		[]
+	),
+	'localization': (
+		'Localization',
+		{
+			'digits': None,
+			'labels': None
+		},
+		{
+			'digits': bool,
+			'labels': bool
+		},
+		[]
+	),
+	'casSettings': (
+		'CasSettings',
+		{
+			'timeout': None,
+			'expRoots': None
+		},
+		{
+			'timeout': float,
+			'expRoots': bool
+		},
+		[]
+	),
+	'dataAnalysis': (
+		'DataAnalysis',
+		{
+			'mode': None
+		},
+		{
+			'mode': int
+		},
+		['variable']
+	),
+	'perspective': (
+		'Perspective',
+		{
+			'id': None
+		},
+		{},
+		['panes', 'views', 'toolbar', 'input']
+	),
+	'euclidianView': (
+		'EuclidianView',
+		{},
+		{},
+		['coordSystem', 'evSettings', 'bgColor', 'axesColor', 'gridColor', 'lineStyle']
+	),
+	'euclidianView3D': (
+		'EuclidianView3D',
+		{},
+		{},
+		['coordSystem', 'plate', 'bgColor', 'clipping', 'projection']
+	)
+}
+
+# a child is an instance of the class registered for its tag
+def build_xsd_class(tag):
+	name, attrs, attr_types, child_tags = xsd_declarations[tag]
+	return create_ggb_class(name,
+		tag=tag,
+		attrs=attrs,
+		attr_types=attr_types,
+		child_classes={child_tag: ggb_classes[child_tag] for child_tag in child_tags},
+		register=False
+	)
+
+# only declared for the tags without a curated class, and only built
+# on the first lookup of the tag (see class_registry.py)
+for (tag, (name, attrs, attr_types, child_tags)) in xsd_declarations.items():
+	if tag not in ggb_classes:
+		ggb_classes.declare(tag, lambda tag=tag: build_xsd_class(tag))
+		declared_names.setdefault(name, (ggb_classes, tag))